@@ -0,0 +1,175 @@
+"""
+认证缓存
+
+- 令牌缓存：以令牌的 SHA-256 摘要为键保存已验证的 claims，直到令牌的 exp，
+  命中时跳过 JWT 解码与签名校验
+- 用户缓存：按用户名保存用户信息（不保存 ORM 实例）
+- 用户表发生写入（注册、改密码、改名、删除）时，该用户的用户缓存和令牌 claims 一起失效，
+  令牌下次使用时重新校验；多进程部署时其他进程的写入不会通知到本进程，
+  由 USER_CACHE_TTL 限定用户缓存的最大陈旧时间
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..middleware.cache_engine import TTLLRUCache
+from ..services.metrics import register_collector, render_metric
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1000"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+
+# 会话 info 中记录待失效用户名的键
+_PENDING_KEY = "invalidated_usernames"
+
+
+class _CountingCache:
+    """带命中统计的 TTLLRUCache 包装"""
+
+    def __init__(self, name: str, max_entries: int, default_ttl: float):
+        self.name = name
+        self.cache = TTLLRUCache(max_entries=max_entries, default_ttl=default_ttl)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.cache.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.cache),
+            "max_entries": self.cache.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+token_cache = _CountingCache("token", TOKEN_CACHE_SIZE, default_ttl=3600)
+user_cache = _CountingCache("user", USER_CACHE_SIZE, default_ttl=USER_CACHE_TTL)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_cached_claims(token: str) -> Optional[Dict[str, Any]]:
+    """已验证且未过期的令牌 claims，未命中返回 None"""
+    claims = token_cache.get(_token_key(token))
+    return dict(claims) if claims is not None else None
+
+
+def cache_claims(token: str, claims: Dict[str, Any]) -> None:
+    """缓存已验证的 claims，有效期到令牌的 exp 为止（没有 exp 的令牌不缓存）"""
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)):
+        return
+    ttl = exp - time.time()
+    if ttl > 0:
+        token_cache.cache.set(_token_key(token), dict(claims), ttl=ttl)
+
+
+def get_cached_user(username: str) -> Optional[Dict[str, Any]]:
+    """缓存的用户信息（id、username、created_at）"""
+    return user_cache.get(username)
+
+
+def cache_user(user) -> None:
+    user_cache.cache.set(user.username, {
+        "id": user.id,
+        "username": user.username,
+        "created_at": user.created_at,
+    })
+
+
+def invalidate_user(*usernames: str) -> None:
+    """失效用户缓存，以及 sub 为这些用户名的令牌 claims"""
+    for username in usernames:
+        user_cache.cache.delete(username)
+    # 用户写入很少，按条目扫描令牌缓存即可，不单独维护用户名到令牌的索引
+    for key, entry in token_cache.cache.entries():
+        if entry.value.get("sub") in usernames:
+            token_cache.cache.delete(key)
+
+
+def _usernames_of(obj) -> List[str]:
+    """对象当前与修改前的用户名"""
+    names = [obj.username]
+    history = getattr(obj, "_sa_instance_state").attrs.username.history
+    names.extend(history.deleted or ())
+    return [name for name in names if name]
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    """用户写入后立即失效，并在提交后再失效一次（防止提交前被其他请求以旧数据回填）"""
+    from ..models.user import User
+
+    changed = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.update(_usernames_of(obj))
+    if changed:
+        invalidate_user(*changed)
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+def _after_commit(session: Session) -> None:
+    usernames = session.info.pop(_PENDING_KEY, None)
+    if usernames:
+        invalidate_user(*usernames)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+_installed = False
+
+
+def track_user_writes() -> None:
+    """为所有会话安装用户缓存失效（重复调用无副作用）"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _installed = True
+
+
+def auth_cache_stats() -> Dict[str, Any]:
+    return {"token_cache": token_cache.stats(), "user_cache": user_cache.stats()}
+
+
+def _collect() -> List[str]:
+    caches = (token_cache, user_cache)
+    lines = render_metric(
+        "api_auth_cache_hits_total", "counter", "Auth cache hits",
+        [({"cache": cache.name}, cache.hits) for cache in caches]
+    )
+    lines += render_metric(
+        "api_auth_cache_misses_total", "counter", "Auth cache misses",
+        [({"cache": cache.name}, cache.misses) for cache in caches]
+    )
+    lines += render_metric(
+        "api_auth_cache_entries", "gauge", "Auth cache entries",
+        [({"cache": cache.name}, len(cache.cache)) for cache in caches]
+    )
+    return lines
+
+
+register_collector("auth_cache", _collect)
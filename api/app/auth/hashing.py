@@ -0,0 +1,135 @@
+"""
+密码哈希工作池
+
+bcrypt 每次计算需要上百毫秒 CPU，不能在事件循环上执行。这里使用固定大小的线程池
+（bcrypt 计算期间释放 GIL，多个线程可以真正并行），并限制排队数量：
+工作线程和队列都满时直接返回 503，避免登录高峰把请求无限堆积。
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from .utils import pwd_context
+from ..services.metrics import Histogram, register_collector, render_histogram, render_metric
+
+# 工作线程数，默认不超过 CPU 核数
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 等待中的任务上限（不含正在执行的）
+HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+
+class PasswordHashPool:
+    """有界的密码哈希线程池"""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0   # 已提交未完成的任务（执行中 + 排队中）
+        self.rejected = 0
+        self.completed = 0
+        self.queue_wait = Histogram()
+        self.run_time = Histogram()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def queued(self) -> int:
+        return max(self._pending - self.workers, 0)
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """在工作池中执行 fn，池已满时抛出 503"""
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="服务繁忙，请稍后重试",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            self.queue_wait.observe(started - submitted)
+            try:
+                return fn(*args)
+            finally:
+                self.run_time.observe(time.perf_counter() - started)
+
+        try:
+            return await asyncio.wrap_future(self._executor.submit(task))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.snapshot(),
+            "run_time": self.run_time.snapshot(),
+        }
+
+    def prometheus_lines(self) -> List[str]:
+        lines = render_metric(
+            "api_password_hash_queue_depth", "gauge", "Password hashing jobs waiting for a worker",
+            [({}, self.queued)]
+        )
+        lines += render_metric(
+            "api_password_hash_in_flight", "gauge", "Password hashing jobs submitted and not finished",
+            [({}, self.pending)]
+        )
+        lines += render_metric(
+            "api_password_hash_rejected_total", "counter", "Password hashing jobs rejected with 503",
+            [({}, self.rejected)]
+        )
+        lines += render_histogram(
+            "api_password_hash_queue_wait_seconds", "Time password hashing jobs spent queued",
+            [({}, self.queue_wait)]
+        )
+        lines += render_histogram(
+            "api_password_hash_run_seconds", "Time spent computing password hashes",
+            [({}, self.run_time)]
+        )
+        return lines
+
+
+# 全局密码哈希工作池
+password_pool = PasswordHashPool(HASH_WORKERS, HASH_QUEUE_SIZE)
+register_collector("password_hash", password_pool.prometheus_lines)
+
+
+async def hash_password(password: str) -> str:
+    """在工作池中计算密码哈希"""
+    return await password_pool.run(pwd_context.hash, password)
+
+
+async def verify_and_update_password(
+    password: str,
+    hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    在工作池中验证密码
+
+    Returns:
+        (是否匹配, 新哈希)；哈希参数（如 bcrypt 轮数）与当前配置不一致时返回新哈希，
+        调用方应保存以完成升级，否则为 None
+    """
+    return await password_pool.run(pwd_context.verify_and_update, password, hashed_password)
@@ -5,20 +5,19 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, status
 import os
 
+from .cache import cache_claims, get_cached_claims
+
 # 安全配置
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30天
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt 轮数；修改后旧哈希会在用户下次登录时自动升级
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-def get_password_hash(password: str) -> str:
-    """获取密码哈希"""
-    return pwd_context.hash(password)
+# 只在有界工作池中使用（见 auth/hashing.py 的 hash_password / verify_and_update_password），
+# 不要在事件循环上直接调用
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
@@ -33,7 +32,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(token: str) -> dict:
-    """验证令牌"""
+    """验证令牌（已验证过的令牌直接从缓存返回 claims）"""
+    cached = get_cached_claims(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -43,6 +45,7 @@ def verify_token(token: str) -> dict:
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        cache_claims(token, payload)
         return payload
     except JWTError:
         raise HTTPException(
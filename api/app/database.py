@@ -1,6 +1,15 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.sql.elements import TextClause
+from fastapi.concurrency import run_in_threadpool
 import os
-from typing import Generator
+import re
+from typing import AsyncGenerator
+
+from app.db_pool import pool_options, register_pool_collector
 
 # 导入所有模型以确保它们被注册到SQLModel.metadata中
 from app.models import (
@@ -23,20 +32,249 @@ DATABASE_URL = (
 # 是否输出 SQL（生产建议关闭）
 SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
 
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_SQLITE_FILE = IS_SQLITE and ":memory:" not in DATABASE_URL and DATABASE_URL.rstrip("/") != "sqlite:"
+
+# SQLite 性能配置（对每个新连接执行），可通过环境变量调整
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # 负数表示 KiB
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# SQLite 读写分离：读请求走只读连接池，写请求走专用写连接
+SQLITE_READ_WRITE_SPLIT = IS_SQLITE_FILE and os.getenv("SQLITE_READ_WRITE_SPLIT", "true").lower() == "true"
+
+
+def _sqlite_pragma_listener(read_only: bool):
+    """生成 connect 事件回调；只读连接不修改数据库级设置（journal_mode）"""
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in SQLITE_PRAGMAS.items():
+                if name == "journal_mode" and read_only:
+                    continue
+                cursor.execute(f"PRAGMA {name}={value}")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+    return apply_pragmas
+
+
+def _create_sqlite_engine(role: str, read_only: bool = False, **overrides):
+    sqlite_engine = create_engine(
         DATABASE_URL,
         echo=SQL_ECHO,
         connect_args={"check_same_thread": False},
+        **pool_options(DATABASE_URL, role=role, **overrides),
+    )
+    if IS_SQLITE_FILE:
+        event.listen(sqlite_engine, "connect", _sqlite_pragma_listener(read_only))
+    return sqlite_engine
+
+
+if SQLITE_READ_WRITE_SPLIT:
+    # SQLite 同一时刻只允许一个写事务，写连接池保持很小，并发写入由 busy_timeout 排队；
+    # WAL 模式下读连接不被写事务阻塞
+    engine = _create_sqlite_engine(
+        "writer",
+        pool_size=int(os.getenv("SQLITE_WRITER_POOL_SIZE", "1")),
+        max_overflow=int(os.getenv("SQLITE_WRITER_MAX_OVERFLOW", "4")),
+    )
+    read_engine = _create_sqlite_engine(
+        "reader",
+        read_only=True,
+        pool_size=int(os.getenv("SQLITE_READER_POOL_SIZE", "8")),
+    )
+elif IS_SQLITE:
+    engine = read_engine = _create_sqlite_engine("primary")
+else:
+    engine = read_engine = create_engine(DATABASE_URL, echo=SQL_ECHO, **pool_options(DATABASE_URL))
+
+# 连接池等待时间与使用情况指标
+if read_engine is engine:
+    register_pool_collector(engine)
+else:
+    register_pool_collector(engine, role="writer")
+    register_pool_collector(read_engine, role="reader")
+
+# 判断原生 SQL 是否为写语句
+_WRITE_SQL_PATTERN = re.compile(
+    r"^\s*(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b", re.IGNORECASE
+)
+
+
+class RoutingSession(Session):
+    """
+    读写分离会话
+    
+    查询使用只读引擎；flush 和写语句（包括原生 SQL 写语句）使用写引擎。
+    事务中第一次写入后固定使用写引擎，保证同一事务内的读取能看到未提交的写入；
+    提交或回滚后写连接随事务归还，之后的读取（如 refresh）回到只读引擎，
+    WAL 模式下新的读事务能看到已提交的数据。
+    """
+    
+    writer_bind = engine
+    reader_bind = read_engine
+    
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind, **kwargs)
+        self._use_writer = False
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if not self._use_writer and (self._flushing or self._is_write(clause)):
+            self._use_writer = True
+        return self.writer_bind if self._use_writer else self.reader_bind
+    
+    def commit(self) -> None:
+        super().commit()
+        self._use_writer = False
+    
+    def rollback(self) -> None:
+        super().rollback()
+        self._use_writer = False
+    
+    @staticmethod
+    def _is_write(clause) -> bool:
+        if clause is None:
+            return False
+        if isinstance(clause, TextClause):
+            return bool(_WRITE_SQL_PATTERN.match(clause.text))
+        return bool(getattr(clause, "is_dml", False) or getattr(clause, "is_ddl", False))
+
+
+def create_session() -> Session:
+    """创建会话；SQLite 读写分离时返回 RoutingSession"""
+    if read_engine is engine:
+        return Session(engine)
+    return RoutingSession()
+
+
+# 通过 pgbouncer / Neon pooler 连接时需关闭 asyncpg 的语句缓存
+DB_PGBOUNCER = os.getenv(
+    "DB_PGBOUNCER", "true" if "-pooler" in DATABASE_URL else "false"
+).lower() == "true"
+
+
+def to_async_url(database_url: str) -> str:
+    """
+    把同步数据库 URL 转换为异步驱动 URL
+    
+    - sqlite → sqlite+aiosqlite
+    - postgres / postgresql[+psycopg2] → postgresql+asyncpg，libpq 专有的查询参数
+      （sslmode、connect_timeout 等）转换为 asyncpg 的对应参数或丢弃
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend not in ("postgres", "postgresql"):
+        raise ValueError(f"不支持的异步数据库: {backend}")
+    
+    query = dict(url.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    if "connect_timeout" in query:
+        query["timeout"] = query.pop("connect_timeout")
+    for unsupported in ("channel_binding", "options", "target_session_attrs", "gssencmode"):
+        query.pop(unsupported, None)
+    if DB_PGBOUNCER:
+        # pgbouncer 事务模式不支持跨事务复用服务端预编译语句
+        query["prepared_statement_cache_size"] = "0"
+    return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+
+def _create_async_engine(role: str, read_only: bool = False, **overrides):
+    connect_args = {}
+    if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg") and DB_PGBOUNCER:
+        connect_args["statement_cache_size"] = 0
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=SQL_ECHO,
+        connect_args=connect_args,
+        **pool_options(DATABASE_URL, role=role, async_engine=True, **overrides),
     )
+    if IS_SQLITE_FILE:
+        event.listen(async_engine.sync_engine, "connect", _sqlite_pragma_listener(read_only))
+    return async_engine
+
+
+# 异步引擎，与同步引擎共用连接池配置与 SQLite 读写分离策略
+if SQLITE_READ_WRITE_SPLIT:
+    async_engine = _create_async_engine(
+        "async_writer",
+        pool_size=int(os.getenv("SQLITE_WRITER_POOL_SIZE", "1")),
+        max_overflow=int(os.getenv("SQLITE_WRITER_MAX_OVERFLOW", "4")),
+    )
+    async_read_engine = _create_async_engine(
+        "async_reader",
+        read_only=True,
+        pool_size=int(os.getenv("SQLITE_READER_POOL_SIZE", "8")),
+    )
+    register_pool_collector(async_engine.sync_engine, role="async_writer")
+    register_pool_collector(async_read_engine.sync_engine, role="async_reader")
 else:
-    engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
+    async_engine = async_read_engine = _create_async_engine("async")
+    register_pool_collector(async_engine.sync_engine, role="async")
+
+
+class AsyncRoutingSession(RoutingSession):
+    """异步会话内部使用的读写分离同步会话"""
+    
+    writer_bind = async_engine.sync_engine
+    reader_bind = async_read_engine.sync_engine
+
+
+def create_async_session() -> AsyncSession:
+    """
+    创建异步会话
+    
+    提交后不过期对象属性：异步会话中访问过期属性会触发隐式 IO 而报错
+    """
+    if async_read_engine is async_engine:
+        return AsyncSession(async_engine, expire_on_commit=False)
+    return AsyncSession(sync_session_class=AsyncRoutingSession, expire_on_commit=False)
+
 
 def create_db_and_tables():
-    """创建数据库表"""
+    """创建数据库表，并补建已有表上缺少的索引（create_all 只为新建的表创建索引）"""
     SQLModel.metadata.create_all(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+async def get_session() -> AsyncGenerator[Session, None]:
+    """
+    获取数据库会话
+    
+    会话在第一次执行查询时才从连接池检出连接，缓存命中等没有用到数据库的请求
+    不会占用连接。依赖本身是异步的，创建和关闭未使用的会话不需要切换到线程池；
+    仍持有连接时（例如只读查询后未提交），在线程池中关闭以归还连接。
+    """
+    session = create_session()
+    try:
+        yield session
+    finally:
+        if session.in_transaction():
+            await run_in_threadpool(session.close)
+        else:
+            session.close()
 
-def get_session() -> Generator[Session, None, None]:
-    """获取数据库会话"""
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    获取异步数据库会话
+    
+    查询通过 await 执行，等待数据库期间事件循环可以处理其他请求
+    """
+    async with create_async_session() as session:
+        yield session
@@ -0,0 +1,179 @@
+"""
+数据库连接池配置与遥测
+
+连接池参数从环境变量读取：
+- DB_POOL_MODE: queue（默认）或 null（每次检出新建连接，适合 Serverless 与
+  pgbouncer / Neon pooler 这类外部连接池）；设置了 VERCEL 时默认为 null
+- DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT: 常驻连接数、溢出连接数、检出等待超时（秒）
+- DB_POOL_RECYCLE: 连接最长复用时间（秒），-1 表示不回收
+- DB_POOL_PRE_PING: 检出前探活，丢弃被服务端断开的连接
+- DB_POOL_LIFO: 优先复用最近归还的连接，空闲连接可以自然超时关闭
+
+遥测包括检出等待时间直方图、检出超时次数，以及使用中 / 空闲 / 溢出连接数。
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Type
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+from .services.metrics import Histogram, register_collector, render_histogram, render_metric
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+class PoolTelemetry:
+    """单个连接池的检出统计"""
+
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+class _TimedCheckoutMixin:
+    """记录从连接池取得连接（含等待与新建连接）耗费的时间"""
+
+    _telemetry: PoolTelemetry
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self._telemetry.record_timeout()
+            raise
+        finally:
+            self._telemetry.checkout_wait.observe(time.perf_counter() - started)
+
+
+def _instrumented_pool_class(base: Type[Pool], telemetry: PoolTelemetry) -> Type[Pool]:
+    """
+    生成带检出计时的连接池类
+
+    遥测对象挂在类上，dispose / recreate 重建连接池后继续累计
+    """
+    return type(f"Instrumented{base.__name__}", (_TimedCheckoutMixin, base), {"_telemetry": telemetry})
+
+
+# 各角色（primary / reader / writer）连接池的遥测
+_telemetry: Dict[str, PoolTelemetry] = {}
+
+
+def pool_options(
+    database_url: str,
+    role: str = "primary",
+    async_engine: bool = False,
+    **overrides: Any
+) -> Dict[str, Any]:
+    """
+    根据数据库 URL 与环境变量生成 create_engine 的连接池参数
+
+    内存 SQLite 数据库需要单连接，保持 SQLAlchemy 的默认连接池
+
+    Args:
+        database_url: 数据库 URL
+        role: 连接池角色，用于区分指标
+        async_engine: 是否用于 create_async_engine（需要 asyncio 适配的连接池）
+        overrides: 覆盖环境变量的参数（如写连接池固定大小）
+    """
+    is_sqlite = database_url.startswith("sqlite")
+    if is_sqlite and (":memory:" in database_url or database_url.rstrip("/") == "sqlite:"):
+        return {}
+
+    mode = os.getenv("DB_POOL_MODE", "null" if os.getenv("VERCEL") else "queue").lower()
+    options: Dict[str, Any] = {
+        # 远程数据库的连接可能被服务端或中间代理静默断开
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", not is_sqlite),
+    }
+    telemetry = _telemetry.setdefault(role, PoolTelemetry())
+    if mode == "null":
+        options["poolclass"] = _instrumented_pool_class(NullPool, telemetry)
+        return options
+    if mode != "queue":
+        raise ValueError(f"不支持的连接池模式: {mode}")
+
+    options.update(
+        poolclass=_instrumented_pool_class(
+            AsyncAdaptedQueuePool if async_engine else QueuePool, telemetry
+        ),
+        pool_size=_env_int("DB_POOL_SIZE", 5),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+        pool_recycle=_env_int("DB_POOL_RECYCLE", -1 if is_sqlite else 1800),
+        pool_use_lifo=_env_bool("DB_POOL_LIFO", True),
+    )
+    options.update(overrides)
+    return options
+
+
+def pool_status(pool: Pool) -> Dict[str, Any]:
+    """连接池当前状态与检出等待统计"""
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            in_use=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    telemetry = getattr(pool, "_telemetry", None)
+    if telemetry is not None:
+        status["checkout_timeouts"] = telemetry.timeouts
+        status["checkout_wait"] = telemetry.checkout_wait.snapshot()
+    return status
+
+
+# 需要导出指标的引擎，键为角色
+_engines: Dict[str, Engine] = {}
+
+
+def all_pool_status() -> Dict[str, Dict[str, Any]]:
+    """所有已注册引擎的连接池状态"""
+    return {role: pool_status(engine.pool) for role, engine in _engines.items()}
+
+
+def _collect() -> List[str]:
+    pools = [(role, engine.pool) for role, engine in _engines.items()]
+    lines: List[str] = []
+    for field in ("size", "in_use", "idle", "overflow"):
+        lines += render_metric(
+            f"api_db_pool_{field}", "gauge", f"Connection pool {field.replace('_', ' ')} connections",
+            [({"role": role}, status[field])
+             for role, status in ((role, pool_status(pool)) for role, pool in pools)
+             if field in status]
+        )
+    instrumented = [(role, pool._telemetry) for role, pool in pools if hasattr(pool, "_telemetry")]
+    lines += render_metric(
+        "api_db_pool_checkout_timeouts_total", "counter", "Pool checkouts that timed out",
+        [({"role": role}, telemetry.timeouts) for role, telemetry in instrumented]
+    )
+    lines += render_histogram(
+        "api_db_pool_checkout_seconds", "Time spent obtaining a pooled connection",
+        [({"role": role}, telemetry.checkout_wait) for role, telemetry in instrumented]
+    )
+    return lines
+
+
+def register_pool_collector(engine: Engine, role: str = "primary") -> None:
+    """把引擎连接池指标注册到 /admin/metrics（dispose 重建连接池后仍读取当前连接池）"""
+    _engines[role] = engine
+    register_collector("db_pool", _collect)
@@ -5,8 +5,19 @@ import os
 import logging
 from dotenv import load_dotenv
 
-from app.database import create_db_and_tables
-from app.routers import todos, notes, pomodoro, flashcards, auth, tools, commands
+from app.database import (
+    async_engine, async_read_engine, create_db_and_tables, create_session, engine, read_engine
+)
+from app.middleware import (
+    CacheMiddleware, DBUsageMiddleware, api_cache, track_connection_usage, track_table_writes
+)
+from app.auth.cache import track_user_writes
+from app.services.flashcard_counters import ensure_counters, track_flashcard_counters
+from app.services.loop_monitor import loop_monitor
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services.search import ensure_search_index, install_search_schema, track_search_documents
+from app.services.tags import ensure_tag_index, track_entity_tags
+from app.routers import todos, notes, pomodoro, flashcards, auth, tools, commands, admin, search, tags
 
 # 加载环境变量
 load_dotenv()
@@ -15,6 +26,9 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 是否启用事件循环阻塞监控（阈值见 LOOP_LAG_THRESHOLD_MS）
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR", "true").lower() == "true"
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时创建数据库表
@@ -22,10 +36,23 @@ async def lifespan(app: FastAPI):
         logger.info("正在创建数据库表...")
         create_db_and_tables()
         logger.info("数据库表创建完成")
+        install_search_schema(engine)
+        with create_session() as session:
+            ensure_counters(session)
+            ensure_search_index(session)
+            ensure_tag_index(session)
     except Exception as e:
         logger.error(f"数据库表创建失败: {e}")
         # 不阻止应用启动，让 API 至少能响应
+    # 事件循环阻塞监控
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
     yield
+    await loop_monitor.stop()
+    # 关闭异步连接池，避免事件循环结束后仍有未关闭的连接
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 app = FastAPI(
     title="个人仪表盘 API",
@@ -34,6 +61,34 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 记录每个事务写入的表，提交后递增数据版本号（用于 ETag）
+track_table_writes()
+track_user_writes()
+# 卡片创建、修改、复习、删除时增量维护卡片计数表
+track_flashcard_counters()
+# 笔记、卡片、工具、命令写入时同步全文搜索文档
+track_search_documents()
+# 标签索引随实体 tags 字段的写入同步
+track_entity_tags()
+
+# HTTP 条件请求缓存（ETag / 304 / Cache-Control）
+# 版本号只在进程内时，多实例的 Serverless 环境默认关闭 ETag，避免返回过期的 304
+ETAG_ENABLED = os.getenv(
+    "HTTP_ETAG",
+    "false" if os.getenv("VERCEL") and api_cache.backend.name == "memory" else "true"
+).lower() == "true"
+app.add_middleware(CacheMiddleware, enable_etag=ETAG_ENABLED)
+
+# 按请求统计连接池检出次数（X-DB-Checkouts 响应头与 /admin/db）
+track_connection_usage(engine)
+track_connection_usage(read_engine)
+track_connection_usage(async_engine.sync_engine)
+track_connection_usage(async_read_engine.sync_engine)
+app.add_middleware(
+    DBUsageMiddleware,
+    expose_header=os.getenv("DB_USAGE_HEADER", "true").lower() == "true"
+)
+
 # 配置 CORS
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +101,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 列表接口通过响应头返回下一页游标
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # 添加请求日志中间件
@@ -67,6 +124,9 @@ app.include_router(pomodoro.router, prefix="/pomodoro", tags=["pomodoro"])
 app.include_router(flashcards.router)
 app.include_router(tools.router, prefix="/tools", tags=["tools"])
 app.include_router(commands.router, prefix="/commands", tags=["commands"])
+app.include_router(search.router, prefix="/search", tags=["search"])
+app.include_router(tags.router, prefix="/tags", tags=["tags"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
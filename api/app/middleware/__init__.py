@@ -4,11 +4,21 @@
 包含应用程序的中间件组件
 """
 
-from .cache import api_cache, cache_response, invalidate_cache_pattern, CacheMiddleware
+from .cache import (
+    api_cache, cache_response, invalidate_cache_pattern, invalidate_cache_tags, CacheMiddleware
+)
+from .data_versions import track_table_writes, bump_versions
+from .db_usage import DBUsageMiddleware, db_usage, track_connection_usage
 
 __all__ = [
     'api_cache',
     'cache_response', 
     'invalidate_cache_pattern',
-    'CacheMiddleware'
+    'invalidate_cache_tags',
+    'CacheMiddleware',
+    'track_table_writes',
+    'bump_versions',
+    'DBUsageMiddleware',
+    'db_usage',
+    'track_connection_usage'
 ]
\ No newline at end of file
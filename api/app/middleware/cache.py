@@ -1,154 +1,337 @@
 """
 API响应缓存中间件
 
-提供基于内存的缓存功能，优化API响应性能
+提供可插拔后端（进程内 / 共享 SQLite）的缓存功能，优化API响应性能
 """
 
 from functools import wraps
-from typing import Dict, Any, Optional, Callable
-from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, Iterable, List, NamedTuple
+import asyncio
+import inspect
 import json
 import hashlib
+import logging
+import threading
+import time
 from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .cache_backends import CacheBackend, MemoryCacheBackend, create_backend_from_env
+from .cache_metrics import CacheMetrics, cache_metrics
+from .single_flight import SingleFlight
+from ..services.metrics import register_collector, render_metric
 
 
 class APICache:
     """API缓存管理器"""
     
-    def __init__(self, default_ttl: int = 300):
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        default_ttl: int = 300,
+        metrics: Optional[CacheMetrics] = None
+    ):
         """
         初始化缓存管理器
         
         Args:
+            backend: 缓存后端，默认为进程内后端
             default_ttl: 默认缓存时间（秒）
+            metrics: 指标收集器，应与后端使用同一个实例
         """
-        self._cache: Dict[str, Dict[str, Any]] = {}
         self.default_ttl = default_ttl
-        self._access_times: Dict[str, datetime] = {}
-        self.max_cache_size = 1000  # 最大缓存条目数
+        self.metrics = metrics or CacheMetrics()
+        self.backend = backend or MemoryCacheBackend(default_ttl=default_ttl, metrics=self.metrics)
+        # 合并同一键的并发未命中
+        self.single_flight = SingleFlight(
+            on_coalesce=lambda key: self.metrics.incr(key, "coalesced")
+        )
+        # 标签失效代数（进程内）：计算开始后标签被失效过，结果可能是写入前的数据，不能写入缓存
+        self._generations: Dict[str, int] = {}
+        self._cleared = 0
+        self._generations_lock = threading.Lock()
+    
+    @property
+    def max_cache_size(self) -> int:
+        return self.backend.max_entries
+    
+    @property
+    def max_cache_bytes(self) -> Optional[int]:
+        return self.backend.max_bytes
     
     def _generate_key(self, request: Request, additional_params: Optional[Dict] = None) -> str:
-        """生成缓存键"""
-        # 基于URL、查询参数和额外参数生成唯一键
-        base_string = f"{request.method}:{request.url}"
+        """
+        生成缓存键
         
-        if additional_params:
-            base_string += f":{json.dumps(additional_params, sort_keys=True)}"
+        格式为 "方法:路径[:摘要]"，路径保持可读以便按前缀统计和匹配，
+        查询参数和额外参数压缩为摘要
+        """
+        base_string = f"{request.method}:{request.url.path}"
         
-        return hashlib.md5(base_string.encode()).hexdigest()
-    
-    def _cleanup_expired(self):
-        """清理过期的缓存条目"""
-        now = datetime.now()
-        expired_keys = []
+        variant = request.url.query
+        if additional_params:
+            variant += f":{json.dumps(additional_params, sort_keys=True, default=str)}"
         
-        for key, cache_data in self._cache.items():
-            if now > cache_data['expires_at']:
-                expired_keys.append(key)
+        if variant:
+            base_string += ":" + hashlib.md5(variant.encode()).hexdigest()
         
-        for key in expired_keys:
-            del self._cache[key]
-            if key in self._access_times:
-                del self._access_times[key]
-    
-    def _evict_lru(self):
-        """使用LRU策略驱逐缓存"""
-        if len(self._cache) >= self.max_cache_size:
-            # 找到最近最少使用的键
-            lru_key = min(self._access_times.items(), key=lambda x: x[1])[0]
-            del self._cache[lru_key]
-            del self._access_times[lru_key]
+        return base_string
     
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
-        self._cleanup_expired()
-        
-        if key in self._cache:
-            cache_data = self._cache[key]
-            if datetime.now() <= cache_data['expires_at']:
-                self._access_times[key] = datetime.now()
-                return cache_data['value']
-            else:
-                # 过期缓存
-                del self._cache[key]
-                if key in self._access_times:
-                    del self._access_times[key]
-        
-        return None
+        return self.backend.get(key)
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
-        """设置缓存值"""
-        self._cleanup_expired()
-        self._evict_lru()
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> None:
+        """
+        设置缓存值
         
-        expires_at = datetime.now() + timedelta(seconds=ttl or self.default_ttl)
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 缓存时间（秒）
+            tags: 依赖标签（如表名），用于按标签失效
+        """
+        self.backend.set(key, value, self.default_ttl if ttl is None else ttl, tags=tags)
+    
+    def tag_generation(self, tags: Optional[Iterable[str]] = None) -> int:
+        """标签的失效代数之和，任一标签失效（或清空缓存）后增大"""
+        with self._generations_lock:
+            return self._cleared + sum(self._generations.get(tag, 0) for tag in tags or ())
+    
+    def invalidate_tags(self, *tags: str) -> int:
+        """
+        删除依赖任一标签的所有缓存条目
         
-        self._cache[key] = {
-            'value': value,
-            'expires_at': expires_at,
-            'created_at': datetime.now()
-        }
-        self._access_times[key] = datetime.now()
+        Returns:
+            删除的缓存条目数量
+        """
+        with self._generations_lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+        return self.backend.invalidate_tags(*tags)
     
     def delete(self, key: str) -> bool:
         """删除缓存值"""
-        if key in self._cache:
-            del self._cache[key]
-            if key in self._access_times:
-                del self._access_times[key]
-            return True
-        return False
+        return self.backend.delete(key)
+    
+    def keys(self) -> list:
+        """获取当前所有缓存键"""
+        return self.backend.keys()
     
     def clear(self) -> None:
         """清空所有缓存"""
-        self._cache.clear()
-        self._access_times.clear()
+        with self._generations_lock:
+            self._cleared += 1
+        self.backend.clear()
     
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        self._cleanup_expired()
-        
-        return {
-            'total_entries': len(self._cache),
-            'max_cache_size': self.max_cache_size,
-            'default_ttl': self.default_ttl,
-            'memory_usage_mb': len(str(self._cache)) / 1024 / 1024,  # 粗略估算
-            'oldest_entry': min(
-                (data['created_at'] for data in self._cache.values()), 
-                default=None
-            ),
-            'newest_entry': max(
-                (data['created_at'] for data in self._cache.values()), 
-                default=None
+        stats = self.backend.stats()
+        stats['default_ttl'] = self.default_ttl
+        stats['memory_usage_mb'] = stats['total_bytes'] / 1024 / 1024
+        stats['single_flight'] = self.single_flight.stats()
+        return stats
+    
+    def prometheus_lines(self) -> List[str]:
+        """后端总量与按前缀统计的 Prometheus 文本行"""
+        stats = self.backend.stats()
+        lines = render_metric(
+            "api_cache_backend_entries", "gauge", "Entries held by the cache backend",
+            [({"backend": stats['backend']}, stats['total_entries'])]
+        )
+        lines += render_metric(
+            "api_cache_backend_bytes", "gauge", "Bytes held by the cache backend",
+            [({"backend": stats['backend']}, stats['total_bytes'])]
+        )
+        lines += render_metric(
+            "api_cache_in_flight", "gauge", "Cache computations currently in flight",
+            [({}, self.single_flight.in_flight())]
+        )
+        return lines + self.metrics.prometheus_lines()
+
+
+# 全局缓存实例，后端由 API_CACHE_BACKEND 环境变量选择
+api_cache = APICache(
+    backend=create_backend_from_env(default_ttl=300, metrics=cache_metrics),
+    default_ttl=300,  # 默认5分钟缓存
+    metrics=cache_metrics
+)
+register_collector("cache", api_cache.prometheus_lines)
+
+
+logger = logging.getLogger(__name__)
+
+# 自动注入的 Request 参数名
+_REQUEST_PARAM = "_cache_request"
+
+# 请求结果对应的计数器
+_OUTCOME_COUNTERS = {"hit": "hits", "stale": "stale_hits", "miss": "misses"}
+
+
+# 后台刷新任务的强引用，避免任务在执行中被回收
+_background_tasks: set = set()
+
+
+def _spawn_background(coro) -> None:
+    """调度后台任务，结束后丢弃引用并读取异常（异常已在任务内记录日志）"""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    
+    def _done(finished: asyncio.Task) -> None:
+        _background_tasks.discard(finished)
+        if not finished.cancelled():
+            finished.exception()
+    
+    task.add_done_callback(_done)
+
+
+class _SWREntry(NamedTuple):
+    """stale-while-revalidate 缓存条目，fresh_until 为墙钟时间以便跨进程共享"""
+    value: Any
+    fresh_until: float
+
+
+class _EncodedResponse(NamedTuple):
+    """已编码的响应：命中时直接回放字节，无需校验和 JSON 序列化"""
+    body: bytes
+    status_code: int
+    media_type: str
+    headers: tuple = ()
+
+
+def _encode_response(result: Any, adapter: Optional[TypeAdapter]) -> _EncodedResponse:
+    """
+    将路由返回值编码为最终响应字节
+    
+    指定 response_model 时按模型校验并序列化（与 FastAPI 的 response_model 行为一致），
+    否则与 JSONResponse 的编码方式一致
+    """
+    if isinstance(result, Response):
+        headers = tuple(
+            (name, value) for name, value in result.raw_headers
+            if name not in (b"content-length", b"content-type")
+        )
+        return _EncodedResponse(
+            bytes(result.body), result.status_code,
+            result.media_type or "application/json", headers
+        )
+    if adapter is not None:
+        body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+    else:
+        body = json.dumps(
+            jsonable_encoder(result),
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+        ).encode("utf-8")
+    return _EncodedResponse(body, 200, "application/json")
+
+
+def _replay_response(encoded: _EncodedResponse) -> Response:
+    """每个请求构造独立的 Response 对象，共享底层字节"""
+    response = Response(
+        content=encoded.body,
+        status_code=encoded.status_code,
+        media_type=encoded.media_type
+    )
+    response.raw_headers.extend(encoded.headers)
+    return response
+
+
+def _with_fresh_sessions(kwargs: dict) -> tuple:
+    """
+    为合并计算和后台刷新复制参数，数据库会话替换为新会话
+    
+    请求结束后原会话会被关闭，且不能与其他请求并发使用
+    
+    Returns:
+        (新参数字典, 需要关闭的新会话列表)
+    """
+    new_kwargs = dict(kwargs)
+    opened = []
+    for name, value in kwargs.items():
+        if isinstance(value, Session):
+            fresh = type(value)(bind=value.bind)
+        elif isinstance(value, AsyncSession):
+            fresh = type(value)(
+                bind=value.bind,
+                sync_session_class=value.sync_session_class,
+                expire_on_commit=value.sync_session.expire_on_commit
             )
-        }
+        else:
+            continue
+        new_kwargs[name] = fresh
+        opened.append(fresh)
+    return new_kwargs, opened
 
 
-# 全局缓存实例
-api_cache = APICache(default_ttl=300)  # 默认5分钟缓存
+def _find_request(args: tuple, kwargs: dict) -> Optional[Request]:
+    """从调用参数中查找 Request 对象"""
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, Request):
+            return value
+    return None
 
 
-def cache_response(ttl: int = 300, key_params: Optional[list] = None):
+def cache_response(
+    ttl: int = 300,
+    key_params: Optional[list] = None,
+    tags: Optional[List[str]] = None,
+    coalesce: bool = True,
+    stale_ttl: int = 0,
+    encoded: bool = False,
+    response_model: Any = None
+):
     """
     API响应缓存装饰器
     
+    同时支持 async 与同步路由，同步路由在线程池中执行。
+    被装饰函数不需要声明 Request 参数，装饰器会自动向 FastAPI 请求注入。
+    
     Args:
         ttl: 缓存时间（秒）
         key_params: 额外的键参数列表
+        tags: 依赖标签（通常为表名），写操作通过 invalidate_cache_tags 精确失效
+        coalesce: 是否合并同一键的并发未命中，只执行一次计算
+        stale_ttl: stale-while-revalidate 窗口（秒）。条目过期后的该时间内
+            直接返回旧值，同时在后台重新计算，过期不会阻塞用户请求
+        encoded: 缓存最终编码后的响应字节而不是 Python 对象，命中时直接返回
+            Response，跳过响应校验和 JSON 编码，也不会在内存中持有 ORM 实例
+        response_model: encoded 模式下用于校验和序列化的模型，与路由的
+            response_model 保持一致；不指定时按 jsonable_encoder 编码
     """
+    adapter = TypeAdapter(response_model) if encoded and response_model is not None else None
+    
     def decorator(func: Callable):
+        is_coroutine = asyncio.iscoroutinefunction(func)
+        signature = inspect.signature(func)
+        inject_request = not any(
+            param.annotation is Request for param in signature.parameters.values()
+        )
+        
+        async def call_func(args, kwargs):
+            if is_coroutine:
+                return await func(*args, **kwargs)
+            return await run_in_threadpool(func, *args, **kwargs)
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # 尝试从kwargs中获取Request对象
-            request = None
-            for arg in args:
-                if isinstance(arg, Request):
-                    request = arg
-                    break
+            request = kwargs.pop(_REQUEST_PARAM) if inject_request else _find_request(args, kwargs)
             
             if not request:
                 # 如果没有Request对象，直接执行函数
-                return await func(*args, **kwargs) if asyncio.iscoroutinefunction(func) else func(*args, **kwargs)
+                return await call_func(args, kwargs)
             
             # 生成缓存键
             additional_params = {}
@@ -159,27 +342,99 @@ def cache_response(ttl: int = 300, key_params: Optional[list] = None):
             
             cache_key = api_cache._generate_key(request, additional_params)
             
-            # 尝试从缓存获取
-            cached_result = api_cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
+            async def compute(call_kwargs=kwargs):
+                # 执行函数并存储到缓存
+                generation = api_cache.tag_generation(tags)
+                result = await call_func(args, call_kwargs)
+                if encoded:
+                    result = _encode_response(result, adapter)
+                if api_cache.tag_generation(tags) != generation:
+                    # 计算期间有写入失效了依赖的标签，结果可能是写入前的数据，只返回不缓存
+                    return result
+                if stale_ttl:
+                    api_cache.set(
+                        cache_key, _SWREntry(result, time.time() + ttl),
+                        ttl + stale_ttl, tags=tags
+                    )
+                else:
+                    api_cache.set(cache_key, result, ttl, tags=tags)
+                return result
             
-            # 执行函数
-            import asyncio
-            if asyncio.iscoroutinefunction(func):
-                result = await func(*args, **kwargs)
-            else:
-                result = func(*args, **kwargs)
+            async def compute_detached():
+                # 合并的计算和后台刷新在独立任务中运行，可能比发起请求活得更久（发起者被取消
+                # 或先返回后其会话即被关闭），使用独立的数据库会话
+                detached_kwargs, sessions = _with_fresh_sessions(kwargs)
+                try:
+                    return await compute(detached_kwargs)
+                finally:
+                    for db_session in sessions:
+                        if isinstance(db_session, AsyncSession):
+                            await db_session.close()
+                        else:
+                            db_session.close()
             
-            # 存储到缓存
-            api_cache.set(cache_key, result, ttl)
+            async def refresh():
+                api_cache.metrics.incr(cache_key, "refreshes")
+                try:
+                    return await compute_detached()
+                except Exception:
+                    logger.exception(f"后台刷新缓存失败: {cache_key}")
+                    raise
             
-            return result
+            # 尝试从缓存获取
+            started = time.perf_counter()
+            outcome = "hit"
+            result = api_cache.get(cache_key)
+            if result is not None and stale_ttl:
+                if time.time() >= result.fresh_until:
+                    outcome = "stale"
+                    if not api_cache.single_flight.is_in_flight(cache_key):
+                        # 已过期但仍在 stale 窗口内：返回旧值并后台刷新
+                        _spawn_background(api_cache.single_flight.do(cache_key, refresh))
+                result = result.value
+            
+            if result is None:
+                outcome = "miss"
+                if coalesce:
+                    result = await api_cache.single_flight.do(cache_key, compute_detached)
+                else:
+                    result = await compute()
+            
+            response = _replay_response(result) if encoded else result
+            api_cache.metrics.incr(cache_key, _OUTCOME_COUNTERS[outcome])
+            api_cache.metrics.observe_latency(cache_key, outcome, time.perf_counter() - started)
+            return response
+        
+        if inject_request:
+            # 追加一个 Request 参数，让 FastAPI 注入请求对象
+            wrapper.__signature__ = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(
+                    _REQUEST_PARAM,
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=Request
+                )
+            ])
         
         return wrapper
     return decorator
 
 
+def invalidate_cache_tags(*tags: str) -> int:
+    """
+    按依赖标签删除缓存
+    
+    通过倒排索引定位键，开销与该标签下的键数量成正比
+    
+    Args:
+        tags: 依赖标签（通常为表名）
+    
+    Returns:
+        删除的缓存条目数量
+    """
+    return api_cache.invalidate_tags(*tags)
+
+
 def invalidate_cache_pattern(pattern: str) -> int:
     """
     根据模式删除缓存
@@ -190,10 +445,8 @@ def invalidate_cache_pattern(pattern: str) -> int:
     Returns:
         删除的缓存条目数量
     """
-    api_cache._cleanup_expired()
-    
     keys_to_delete = []
-    for key in api_cache._cache.keys():
+    for key in api_cache.keys():
         if pattern in key:
             keys_to_delete.append(key)
     
@@ -203,16 +456,124 @@ def invalidate_cache_pattern(pattern: str) -> int:
     return len(keys_to_delete)
 
 
+class RouteCacheRule(NamedTuple):
+    """HTTP 缓存规则"""
+    prefix: str                # 路径前缀
+    tables: tuple              # 响应依赖的表，任一表写入都会改变 ETag
+    cache_control: str         # Cache-Control 头
+    time_bucket: int = 0       # 响应随时间变化（如到期卡片）时，ETag 按该秒数分桶
+    etag: bool = True          # 响应依赖数据库表以外的状态时关闭条件请求，每次都执行路由
+
+
+# 按前缀匹配，更具体的前缀放在前面
+ROUTE_CACHE_RULES: List[RouteCacheRule] = [
+    RouteCacheRule("/tools/types", (), "public, max-age=86400"),
+    RouteCacheRule("/commands/categories", (), "public, max-age=86400"),
+    RouteCacheRule("/todos", ("todos",), "private, no-cache"),
+    RouteCacheRule("/notes", ("notes",), "private, no-cache"),
+    RouteCacheRule(
+        "/pomodoro", ("pomodoro_sessions", "focus_stats"), "private, no-cache", time_bucket=60
+    ),
+    # 学习队列保存在缓存后端中、导入任务进度保存在进程内存中，都不随数据版本号变化
+    RouteCacheRule("/flashcards/study-sessions", (), "no-store", etag=False),
+    RouteCacheRule("/flashcards/imports", (), "no-store", etag=False),
+    RouteCacheRule(
+        "/flashcards", ("flashcards", "review_records", "study_stats"), "private, no-cache",
+        time_bucket=60
+    ),
+    RouteCacheRule("/tools", ("tools",), "private, no-cache"),
+    RouteCacheRule("/commands", ("commands",), "private, no-cache"),
+]
+
+
+def _match_rule(path: str) -> Optional[RouteCacheRule]:
+    for rule in ROUTE_CACHE_RULES:
+        if path == rule.prefix or path.startswith(rule.prefix + "/"):
+            return rule
+    return None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
 class CacheMiddleware:
-    """缓存中间件类"""
+    """
+    HTTP 条件请求缓存中间件
+    
+    - 根据路由依赖表的数据版本号计算强 ETag，无需执行路由或访问数据库
+    - If-None-Match 命中时直接返回 304
+    - 为匹配的 GET 响应添加 ETag 与按路由配置的 Cache-Control
     
-    def __init__(self, app):
+    版本号保存在缓存后端中。多 worker / 多实例部署时需使用共享后端
+    （API_CACHE_BACKEND=sqlite），否则其他进程的写入不会改变本进程的 ETag。
+    """
+    
+    def __init__(self, app, enable_etag: bool = True):
         self.app = app
+        self.enable_etag = enable_etag
+    
+    def _compute_etag(self, scope, rule: RouteCacheRule, headers: Dict[bytes, bytes]) -> str:
+        versions = api_cache.backend.get_versions(rule.tables)
+        parts = [
+            api_cache.backend.epoch,
+            scope["path"],
+            scope.get("query_string", b"").decode("latin-1"),
+            # 不同用户的响应不能共享 ETag
+            hashlib.md5(headers.get(b"authorization", b"")).hexdigest(),
+            ",".join(f"{table}={versions[table]}" for table in rule.tables),
+        ]
+        if rule.time_bucket:
+            parts.append(str(int(time.time() // rule.time_bucket)))
+        digest = hashlib.sha1("|".join(parts).encode()).hexdigest()
+        return f'"{digest[:32]}"'
     
     async def __call__(self, scope, receive, send):
-        if scope["type"] == "http":
-            # 在这里可以添加全局缓存逻辑
-            # 目前主要通过装饰器处理缓存
-            pass
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        
+        rule = _match_rule(scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        
+        etag = None
+        if self.enable_etag and rule.etag:
+            headers = dict(scope["headers"])
+            # 在执行路由之前读取版本号：期间发生的写入只会让 ETag 偏旧，不会误判新鲜
+            etag = self._compute_etag(scope, rule, headers)
+            if_none_match = headers.get(b"if-none-match")
+            if if_none_match and _etag_matches(if_none_match.decode("latin-1"), etag):
+                await send({
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [
+                        (b"etag", etag.encode()),
+                        (b"cache-control", rule.cache_control.encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+        
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = list(message.get("headers", []))
+                names = {name.lower() for name, _ in response_headers}
+                if etag and b"etag" not in names:
+                    response_headers.append((b"etag", etag.encode()))
+                if b"cache-control" not in names:
+                    response_headers.append((b"cache-control", rule.cache_control.encode()))
+                message = {**message, "headers": response_headers}
+            await send(message)
         
-        await self.app(scope, receive, send)
\ No newline at end of file
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,462 @@
+"""
+缓存后端
+
+APICache 通过后端接口存取数据：
+- MemoryCacheBackend: 进程内缓存，基于 TTLLRUCache，速度最快
+- SQLiteCacheBackend: 基于共享 SQLite 文件，同一主机上的多个 worker / 容器
+  （挂载同一卷）共享缓存内容与失效操作
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache_engine import TTLLRUCache, estimate_size
+from .cache_metrics import CacheMetrics
+
+
+class CacheBackend(ABC):
+    """缓存后端接口"""
+
+    name = "abstract"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，未命中返回 None"""
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> None:
+        """设置缓存值并登记依赖标签"""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """删除缓存值"""
+
+    @abstractmethod
+    def invalidate_tags(self, *tags: str) -> int:
+        """删除依赖任一标签的所有条目，返回删除数量"""
+
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """返回当前所有键"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """清空缓存"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """返回后端统计信息"""
+
+    # 数据版本号：每张表一个计数器，写入时递增，供 ETag 使用。
+    # epoch 标识计数器的生命周期，计数器重置时随之改变，避免旧 ETag 误匹配
+
+    epoch: str = ""
+
+    @abstractmethod
+    def get_versions(self, names: Iterable[str]) -> Dict[str, int]:
+        """读取数据版本号，不存在的视为 0"""
+
+    @abstractmethod
+    def bump_versions(self, names: Iterable[str]) -> None:
+        """递增数据版本号"""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """进程内缓存后端"""
+
+    name = "memory"
+
+    def __init__(
+        self,
+        default_ttl: float = 300,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        metrics: Optional[CacheMetrics] = None
+    ):
+        self.metrics = metrics
+        self._engine = TTLLRUCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            default_ttl=default_ttl,
+            on_remove=self._on_remove
+        )
+        # 标签 -> 键 的倒排索引，以及 键 -> 标签
+        self._tag_index: Dict[str, Set[str]] = {}
+        self._key_tags: Dict[str, Tuple[str, ...]] = {}
+        # 进程内版本号随进程重启清零，epoch 每次启动重新生成
+        self.epoch = uuid.uuid4().hex[:12]
+        self._versions: Dict[str, int] = {}
+        self._versions_lock = threading.Lock()
+
+    @property
+    def max_entries(self) -> int:
+        return self._engine.max_entries
+
+    @property
+    def max_bytes(self) -> Optional[int]:
+        return self._engine.max_bytes
+
+    def _on_remove(self, key: str, reason: str, size: int) -> None:
+        """引擎移除条目时同步清理标签索引并记录指标（在引擎锁内调用）"""
+        if self.metrics is not None:
+            self.metrics.record_remove(key, size, reason)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._engine.get(key)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> None:
+        # 序列化估算放在锁外
+        size = estimate_size(value)
+        with self._engine.lock:
+            if not self._engine.set(key, value, ttl, size=size):
+                return
+            if self.metrics is not None:
+                self.metrics.record_store(key, size)
+            if tags:
+                tag_tuple = tuple(tags)
+                self._key_tags[key] = tag_tuple
+                for tag in tag_tuple:
+                    self._tag_index.setdefault(tag, set()).add(key)
+
+    def delete(self, key: str) -> bool:
+        return self._engine.delete(key)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        removed = 0
+        with self._engine.lock:
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    if self._engine.delete(key):
+                        removed += 1
+        return removed
+
+    def keys(self) -> List[str]:
+        return self._engine.keys()
+
+    def clear(self) -> None:
+        self._engine.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        # 字节数在写入和移除时增量维护，这里不遍历缓存内容
+        self._engine.purge_expired()
+
+        return {
+            'backend': self.name,
+            'total_entries': len(self._engine),
+            'total_bytes': self._engine.total_bytes,
+            'max_cache_size': self.max_entries,
+            'max_cache_bytes': self.max_bytes,
+            'total_tags': len(self._tag_index),
+        }
+
+    def get_versions(self, names: Iterable[str]) -> Dict[str, int]:
+        return {name: self._versions.get(name, 0) for name in names}
+
+    def bump_versions(self, names: Iterable[str]) -> None:
+        with self._versions_lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    共享 SQLite 文件缓存后端
+
+    - 每个线程一个连接，WAL 模式下读不阻塞写
+    - 过期时间使用墙钟时间，保证跨进程一致
+    - 命中时不回写访问时间，超出上限时按创建时间淘汰最旧条目
+    - 过期条目在读取时忽略，并每隔若干次写入批量清理
+    """
+
+    name = "sqlite"
+
+    # 每多少次写入执行一次过期清理和容量检查
+    MAINTENANCE_INTERVAL = 200
+
+    def __init__(
+        self,
+        path: str,
+        default_ttl: float = 300,
+        max_entries: int = 10000,
+        max_bytes: Optional[int] = None,
+        metrics: Optional[CacheMetrics] = None
+    ):
+        self.path = path
+        self.metrics = metrics
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries (expires_at);
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_created ON cache_entries (created_at);
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key);
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        # epoch 随缓存文件创建一次，文件被删除重建后自动变化
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('__epoch__', ?)",
+                (uuid.uuid4().int & 0x7FFFFFFFFFFF,)
+            )
+        self.epoch = format(conn.execute(
+            "SELECT version FROM data_versions WHERE name = '__epoch__'"
+        ).fetchone()[0], "x")
+
+    def _conn(self) -> sqlite3.Connection:
+        """获取当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            if self.metrics is not None:
+                self.metrics.incr(key, "expirations")
+            return None
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            self.delete(key)
+            return None
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> None:
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # 无法序列化的值不进入共享缓存
+            return
+        if self.max_bytes is not None and len(blob) > self.max_bytes:
+            return
+
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), expires_at, now)
+            )
+            if tags:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)",
+                    [(tag, key) for tag in set(tags)]
+                )
+
+        with self._writes_lock:
+            self._writes += 1
+            run_maintenance = self._writes % self.MAINTENANCE_INTERVAL == 0
+        if run_maintenance:
+            self._maintenance()
+
+    def delete(self, key: str) -> bool:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+            cursor = conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def invalidate_tags(self, *tags: str) -> int:
+        if not tags:
+            return 0
+        placeholders = ",".join("?" * len(tags))
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                f"DELETE FROM cache_entries WHERE key IN "
+                f"(SELECT key FROM cache_tags WHERE tag IN ({placeholders}))",
+                tags
+            )
+            conn.execute(
+                f"DELETE FROM cache_tags WHERE key IN "
+                f"(SELECT key FROM cache_tags WHERE tag IN ({placeholders}))",
+                tags
+            )
+        return cursor.rowcount
+
+    def keys(self) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT key FROM cache_entries WHERE expires_at > ?", (time.time(),)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_tags")
+            conn.execute("DELETE FROM cache_entries")
+
+    def _maintenance(self) -> None:
+        """清理过期条目，并按创建时间淘汰超出上限的条目"""
+        conn = self._conn()
+        evicted = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+            evicted += conn.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                "SELECT key FROM cache_entries ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            if self.max_bytes is not None:
+                # 从最新条目开始累计，超出字节上限的旧条目全部淘汰
+                evicted += conn.execute(
+                    "DELETE FROM cache_entries WHERE key IN ("
+                    "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY created_at DESC) AS total "
+                    "FROM cache_entries) WHERE total > ?)",
+                    (self.max_bytes,)
+                ).rowcount
+            conn.execute(
+                "DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)"
+            )
+        if evicted and self.metrics is not None:
+            # 共享后端批量淘汰，无法区分前缀
+            self.metrics.incr("*", "evictions", evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        self._maintenance()
+        row = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created_at), MAX(created_at) "
+            "FROM cache_entries"
+        ).fetchone()
+        total_tags = self._conn().execute(
+            "SELECT COUNT(DISTINCT tag) FROM cache_tags"
+        ).fetchone()[0]
+
+        return {
+            'backend': self.name,
+            'path': self.path,
+            'total_entries': row[0],
+            'total_bytes': row[1],
+            'max_cache_size': self.max_entries,
+            'max_cache_bytes': self.max_bytes,
+            'total_tags': total_tags,
+            'oldest_entry': datetime.fromtimestamp(row[2]) if row[2] else None,
+            'newest_entry': datetime.fromtimestamp(row[3]) if row[3] else None
+        }
+
+    def get_versions(self, names: Iterable[str]) -> Dict[str, int]:
+        names = list(names)
+        versions = dict.fromkeys(names, 0)
+        if names:
+            placeholders = ",".join("?" * len(names))
+            rows = self._conn().execute(
+                f"SELECT name, version FROM data_versions WHERE name IN ({placeholders})",
+                names
+            ).fetchall()
+            versions.update(rows)
+        return versions
+
+    def bump_versions(self, names: Iterable[str]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO data_versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                [(name,) for name in set(names)]
+            )
+
+
+def create_backend_from_env(
+    default_ttl: float = 300,
+    metrics: Optional[CacheMetrics] = None
+) -> CacheBackend:
+    """
+    根据环境变量创建缓存后端
+
+    API_CACHE_BACKEND: memory（默认）或 sqlite
+    API_CACHE_SQLITE_PATH: sqlite 后端的文件路径
+    API_CACHE_MAX_ENTRIES / API_CACHE_MAX_BYTES: 容量上限
+    """
+    backend = os.getenv("API_CACHE_BACKEND", "memory").lower()
+    max_entries = int(os.getenv("API_CACHE_MAX_ENTRIES", "1000"))
+    max_bytes = int(os.getenv("API_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    if backend == "sqlite":
+        return SQLiteCacheBackend(
+            path=os.getenv("API_CACHE_SQLITE_PATH", "./api_cache.db"),
+            default_ttl=default_ttl,
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            metrics=metrics
+        )
+    if backend != "memory":
+        raise ValueError(f"未知的缓存后端: {backend}")
+
+    return MemoryCacheBackend(
+        default_ttl=default_ttl,
+        max_entries=max_entries,
+        max_bytes=max_bytes,
+        metrics=metrics
+    )
@@ -0,0 +1,201 @@
+"""
+缓存引擎
+
+提供常数时间的 TTL + LRU 缓存实现：
+- OrderedDict 维护 LRU 顺序，get/set/delete 均为 O(1)
+- 过期时间放入最小堆，惰性清理，只处理真正到期的条目
+- 使用单调时钟，不受系统时间调整影响
+- 同时支持条目数上限和字节数上限
+"""
+
+import heapq
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class _Entry:
+    """缓存条目"""
+
+    __slots__ = ("value", "expires_at", "size", "seq", "created_at")
+
+    def __init__(self, value: Any, expires_at: float, size: int, seq: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.seq = seq
+        self.created_at = time.time()
+
+
+class TTLLRUCache:
+    """带 TTL 的 LRU 缓存引擎（线程安全）"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        default_ttl: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+        on_remove: Optional[Callable[[str, str, int], None]] = None,
+    ):
+        """
+        初始化缓存引擎
+
+        Args:
+            max_entries: 最大缓存条目数
+            max_bytes: 最大缓存字节数，None 表示不限制
+            default_ttl: 默认缓存时间（秒）
+            clock: 时钟函数，默认为单调时钟
+            on_remove: 条目被移除时的回调 (key, reason, size)，reason 为
+                "expired" / "evicted" / "deleted" / "replaced"，在持锁状态下调用
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._on_remove = on_remove
+        # 公开的可重入锁，上层可借此把多步操作组合成原子操作
+        self.lock = threading.RLock()
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """获取缓存值，命中时刷新 LRU 位置"""
+        with self.lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry.expires_at <= self._clock():
+                self._remove(key, "expired")
+                return default
+            self._data.move_to_end(key)
+            return entry.value
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        size: Optional[int] = None,
+    ) -> bool:
+        """
+        设置缓存值
+
+        Returns:
+            是否成功写入（单个值超过字节上限时不会写入）
+        """
+        if size is None:
+            size = estimate_size(value)
+
+        with self.lock:
+            now = self._clock()
+            self._purge_expired(now)
+
+            if key in self._data:
+                self._remove(key, "replaced")
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                return False
+
+            self._seq += 1
+            expires_at = now + (self.default_ttl if ttl is None else ttl)
+            self._data[key] = _Entry(value, expires_at, size, self._seq)
+            self.total_bytes += size
+            heapq.heappush(self._heap, (expires_at, self._seq, key))
+
+            self._evict_overflow()
+            self._maybe_compact_heap()
+            return True
+
+    def delete(self, key: str) -> bool:
+        """删除缓存值"""
+        with self.lock:
+            if key in self._data:
+                self._remove(key, "deleted")
+                return True
+            return False
+
+    def clear(self) -> None:
+        """清空所有缓存"""
+        with self.lock:
+            if self._on_remove is not None:
+                for key, entry in self._data.items():
+                    self._on_remove(key, "deleted", entry.size)
+            self._data.clear()
+            self._heap.clear()
+            self.total_bytes = 0
+
+    def purge_expired(self) -> int:
+        """清理所有已过期条目，返回清理数量"""
+        with self.lock:
+            return self._purge_expired(self._clock())
+
+    def keys(self) -> List[str]:
+        """返回当前所有键的快照（按 LRU 顺序，最久未使用在前）"""
+        with self.lock:
+            return list(self._data.keys())
+
+    def entries(self) -> Iterator[Tuple[str, _Entry]]:
+        """返回条目快照，供统计使用"""
+        with self.lock:
+            return iter(list(self._data.items()))
+
+    def _remove(self, key: str, reason: str) -> None:
+        entry = self._data.pop(key)
+        self.total_bytes -= entry.size
+        if self._on_remove is not None:
+            self._on_remove(key, reason, entry.size)
+
+    def _purge_expired(self, now: float) -> int:
+        """从过期堆顶弹出到期条目，跳过已失效的堆记录"""
+        removed = 0
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expires_at, seq, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            if entry is not None and entry.seq == seq:
+                self._remove(key, "expired")
+                removed += 1
+        return removed
+
+    def _evict_overflow(self) -> None:
+        """按 LRU 顺序驱逐，直到满足条目数和字节数上限"""
+        while len(self._data) > self.max_entries or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._data)), "evicted")
+
+    def _maybe_compact_heap(self) -> None:
+        """堆中失效记录过多时重建，保证内存与条目数同阶"""
+        if len(self._heap) > 2 * len(self._data) + 64:
+            self._heap = [
+                (entry.expires_at, entry.seq, key)
+                for key, entry in self._data.items()
+            ]
+            heapq.heapify(self._heap)
+
@@ -0,0 +1,117 @@
+"""
+缓存指标
+
+按键前缀（"方法:路径"，即路由）统计命中、未命中、stale 命中、驱逐、过期、
+合并等待者，增量维护各前缀的字节数，并分别记录命中与未命中的延迟直方图
+"""
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from ..services.metrics import Histogram, render_histogram, render_metric
+
+# 计数器名称
+COUNTERS = ("hits", "misses", "stale_hits", "evictions", "expirations", "coalesced", "refreshes")
+
+
+def key_prefix(key: str) -> str:
+    """缓存键 "方法:路径[:摘要]" 的前缀为 "方法:路径" """
+    return ":".join(key.split(":", 2)[:2])
+
+
+class CacheMetrics:
+    """缓存指标收集器（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        self._bytes: Dict[str, int] = defaultdict(int)
+        self._entries: Dict[str, int] = defaultdict(int)
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+
+    def incr(self, key: str, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[key_prefix(key)][counter] += amount
+
+    def record_store(self, key: str, size: int) -> None:
+        """新条目写入"""
+        prefix = key_prefix(key)
+        with self._lock:
+            self._bytes[prefix] += size
+            self._entries[prefix] += 1
+
+    def record_remove(self, key: str, size: int, reason: str) -> None:
+        """条目被移除，reason 为 expired / evicted / deleted / replaced"""
+        prefix = key_prefix(key)
+        with self._lock:
+            self._bytes[prefix] -= size
+            self._entries[prefix] -= 1
+            if reason == "expired":
+                self._counters[prefix]["expirations"] += 1
+            elif reason == "evicted":
+                self._counters[prefix]["evictions"] += 1
+
+    def observe_latency(self, key: str, outcome: str, seconds: float) -> None:
+        """记录一次请求延迟，outcome 为 hit / miss / stale"""
+        label = (key_prefix(key), outcome)
+        histogram = self._latency.get(label)
+        if histogram is None:
+            with self._lock:
+                histogram = self._latency.setdefault(label, Histogram())
+        histogram.observe(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """按前缀汇总的指标快照"""
+        with self._lock:
+            prefixes = set(self._counters) | set(self._bytes)
+            result = {}
+            for prefix in sorted(prefixes):
+                counters = dict(self._counters.get(prefix) or dict.fromkeys(COUNTERS, 0))
+                lookups = counters["hits"] + counters["stale_hits"] + counters["misses"]
+                result[prefix] = {
+                    **counters,
+                    "hit_ratio": round(
+                        (counters["hits"] + counters["stale_hits"]) / lookups, 4
+                    ) if lookups else None,
+                    "entries": self._entries.get(prefix, 0),
+                    "bytes": self._bytes.get(prefix, 0),
+                    "latency": {
+                        outcome: histogram.snapshot()
+                        for (p, outcome), histogram in self._latency.items()
+                        if p == prefix
+                    },
+                }
+        return result
+
+    def prometheus_lines(self) -> List[str]:
+        with self._lock:
+            counters = {prefix: dict(values) for prefix, values in self._counters.items()}
+            sizes = dict(self._bytes)
+            entries = dict(self._entries)
+            latency = list(self._latency.items())
+
+        lines: List[str] = []
+        for counter in COUNTERS:
+            lines += render_metric(
+                f"api_cache_{counter}_total", "counter", f"Cache {counter} by key prefix",
+                [({"prefix": prefix}, values[counter]) for prefix, values in counters.items()]
+            )
+        lines += render_metric(
+            "api_cache_bytes", "gauge", "Tracked cache bytes by key prefix",
+            [({"prefix": prefix}, size) for prefix, size in sizes.items()]
+        )
+        lines += render_metric(
+            "api_cache_entries", "gauge", "Cache entries by key prefix",
+            [({"prefix": prefix}, count) for prefix, count in entries.items()]
+        )
+        lines += render_histogram(
+            "api_cache_request_seconds", "Cached endpoint latency by outcome",
+            [({"prefix": prefix, "outcome": outcome}, histogram)
+             for (prefix, outcome), histogram in latency]
+        )
+        return lines
+
+
+# 全局缓存指标
+cache_metrics = CacheMetrics()
@@ -0,0 +1,89 @@
+"""
+数据版本追踪
+
+监听 SQLAlchemy 会话，记录每个事务写入的表，提交成功后递增这些表的数据版本号。
+ORM 写入（add/delete/修改）和通过 session.exec 执行的 Core / 原生 SQL 写语句都会被捕获。
+版本号保存在缓存后端中，使用共享后端时所有 worker 看到同一份版本号。
+"""
+
+import re
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, ORMExecuteState
+from sqlalchemy.sql.elements import TextClause
+
+from .cache import api_cache
+
+# 会话 info 中记录待提交写入表的键
+_PENDING_KEY = "written_tables"
+
+# 从原生 SQL 中提取被写入的表名
+_WRITE_SQL_PATTERN = re.compile(
+    r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+[\"`]?(\w+)",
+    re.IGNORECASE
+)
+
+_installed = False
+
+
+def get_versions(tables: Iterable[str]) -> Dict[str, int]:
+    """读取数据版本号"""
+    return api_cache.backend.get_versions(tables)
+
+
+def bump_versions(*tables: str) -> None:
+    """手动递增数据版本号（用于绕过会话的写入）"""
+    if tables:
+        api_cache.backend.bump_versions(tables)
+
+
+def _pending(session: Session) -> Set[str]:
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    """记录本次 flush 中 ORM 对象涉及的表"""
+    pending = _pending(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            pending.add(table)
+
+
+def _do_orm_execute(state: ORMExecuteState) -> None:
+    """记录 session.exec 执行的写语句涉及的表"""
+    if state.is_select:
+        return
+    statement = state.statement
+    if isinstance(statement, TextClause):
+        match = _WRITE_SQL_PATTERN.match(statement.text)
+        if match:
+            _pending(state.session).add(match.group(1))
+    elif state.is_insert or state.is_update or state.is_delete:
+        table = getattr(statement, "table", None)
+        if table is not None:
+            _pending(state.session).add(table.name)
+
+
+def _after_commit(session: Session) -> None:
+    """提交成功后递增版本号"""
+    tables = session.info.pop(_PENDING_KEY, None)
+    if tables:
+        api_cache.backend.bump_versions(tables)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def track_table_writes() -> None:
+    """为所有会话安装写入追踪（重复调用无副作用）"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _installed = True
@@ -0,0 +1,112 @@
+"""
+数据库连接使用统计
+
+按请求统计从连接池检出连接的次数：中间件为每个请求建立计数器，
+连接池 checkout 事件在请求上下文中累加。结果按路由汇总，
+并通过 X-DB-Checkouts 响应头返回，便于确认缓存命中和静态接口没有访问连接池。
+"""
+
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..services.metrics import register_collector, render_metric
+
+
+class _RequestUsage:
+    """单个请求的连接使用情况"""
+
+    __slots__ = ("checkouts",)
+
+    def __init__(self):
+        self.checkouts = 0
+
+
+# 当前请求的计数器；线程池中执行的同步代码会复制上下文，共享同一个对象
+_current_usage: ContextVar[Optional[_RequestUsage]] = ContextVar("db_request_usage", default=None)
+
+
+class DBUsageStats:
+    """按路由汇总的连接使用统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, checkouts: int) -> None:
+        with self._lock:
+            stats = self._routes.setdefault(
+                route, {"requests": 0, "requests_with_db": 0, "checkouts": 0}
+            )
+            stats["requests"] += 1
+            stats["checkouts"] += checkouts
+            if checkouts:
+                stats["requests_with_db"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {route: dict(stats) for route, stats in sorted(self._routes.items())}
+
+    def prometheus_lines(self) -> List[str]:
+        routes = self.snapshot()
+        lines = render_metric(
+            "api_db_requests_total", "counter", "Requests by route and whether a DB connection was used",
+            [({"route": route, "db": "used"}, stats["requests_with_db"]) for route, stats in routes.items()]
+            + [({"route": route, "db": "unused"}, stats["requests"] - stats["requests_with_db"])
+               for route, stats in routes.items()]
+        )
+        lines += render_metric(
+            "api_db_request_checkouts_total", "counter", "Pool checkouts made while serving each route",
+            [({"route": route}, stats["checkouts"]) for route, stats in routes.items()]
+        )
+        return lines
+
+
+# 全局连接使用统计
+db_usage = DBUsageStats()
+register_collector("db_usage", db_usage.prometheus_lines)
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.checkouts += 1
+
+
+def track_connection_usage(engine: Engine) -> None:
+    """为引擎的连接池安装检出计数（重复调用无副作用）"""
+    if not event.contains(engine, "checkout", _on_checkout):
+        event.listen(engine, "checkout", _on_checkout)
+
+
+class DBUsageMiddleware:
+    """为每个 HTTP 请求统计连接池检出次数"""
+
+    def __init__(self, app, expose_header: bool = True):
+        self.app = app
+        self.expose_header = expose_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        usage = _RequestUsage()
+        token = _current_usage.set(usage)
+
+        async def send_with_header(message: Dict[str, Any]):
+            if message["type"] == "http.response.start" and self.expose_header:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-checkouts", str(usage.checkouts).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _current_usage.reset(token)
+            route = scope.get("route")
+            db_usage.record(getattr(route, "path", "<unmatched>"), usage.checkouts)
@@ -0,0 +1,71 @@
+"""
+请求合并（single-flight）
+
+同一个键的并发未命中只执行一次计算，其余等待者共享结果或异常
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """按键合并并发计算"""
+
+    def __init__(self, on_coalesce: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            on_coalesce: 有等待者被合并时的回调，参数为合并键
+        """
+        self._on_coalesce = on_coalesce
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executions = 0  # 实际执行的计算次数
+        self.coalesced = 0   # 被合并、直接复用结果的等待者数量
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入同键的进行中计算
+
+        计算在独立任务中运行，发起者断开连接被取消时不会影响其他等待者；
+        因此 fn 不能使用只属于发起请求的资源（如请求的数据库会话），它们可能先于计算被释放
+
+        Args:
+            key: 合并键
+            fn: 返回协程的计算函数
+
+        Returns:
+            计算结果
+        """
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+            if self._on_coalesce is not None:
+                self._on_coalesce(key)
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        self.executions += 1
+        task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 标记异常已被读取，避免无人等待时输出警告
+            task.exception()
+
+    def is_in_flight(self, key: str) -> bool:
+        """指定键是否有进行中的计算"""
+        return key in self._inflight
+
+    def in_flight(self) -> int:
+        """当前进行中的计算数量"""
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight(),
+            "executions": self.executions,
+            "coalesced_waiters": self.coalesced,
+        }
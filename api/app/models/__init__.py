@@ -6,11 +6,17 @@ from .pomodoro import (
 )
 from .flashcard import (
     Flashcard, FlashcardCreate, FlashcardUpdate, FlashcardResponse,
-    FlashcardDifficulty, FlashcardStatus, LeitnerBox,
+    FlashcardDifficulty, FlashcardStatus, LeitnerBox, FlashcardCounter,
     ReviewRecord, ReviewRecordCreate, ReviewRecordResponse,
+    BatchReviewItem, BatchReviewRequest, BatchReviewResult, BatchReviewResponse,
+    AnswerPreview, StudyCard, StudySessionCreate, StudySessionResponse, StudyQueueResponse, StudyAnswer,
+    ForecastDay, ForecastResponse,
+    ImportFormat, ImportStatus, ImportRowError, ImportJobResponse,
     StudyStats, StudyStatsResponse
 )
 from .user import User, UserCreate, UserLogin, UserResponse
+from .search import SearchDocument, SearchResult, SearchResponse
+from .tag import Tag, EntityTag, TagCount, TagCountResponse
 from .tool import Tool, ToolCreate, ToolUpdate, ToolResponse, ToolType
 from .command import (
     Command, CommandCreate, CommandUpdate, CommandResponse, CommandCategory,
@@ -23,10 +29,16 @@ __all__ = [
     "PomodoroSession", "PomodoroSessionCreate", "PomodoroSessionUpdate", "PomodoroSessionResponse",
     "FocusStats", "FocusStatsResponse", "PomodoroStatus",
     "Flashcard", "FlashcardCreate", "FlashcardUpdate", "FlashcardResponse",
-    "FlashcardDifficulty", "FlashcardStatus", "LeitnerBox",
+    "FlashcardDifficulty", "FlashcardStatus", "LeitnerBox", "FlashcardCounter",
     "ReviewRecord", "ReviewRecordCreate", "ReviewRecordResponse",
+    "BatchReviewItem", "BatchReviewRequest", "BatchReviewResult", "BatchReviewResponse",
+    "AnswerPreview", "StudyCard", "StudySessionCreate", "StudySessionResponse", "StudyQueueResponse",
+    "StudyAnswer", "ForecastDay", "ForecastResponse",
+    "ImportFormat", "ImportStatus", "ImportRowError", "ImportJobResponse",
     "StudyStats", "StudyStatsResponse",
     "User", "UserCreate", "UserLogin", "UserResponse",
+    "SearchDocument", "SearchResult", "SearchResponse",
+    "Tag", "EntityTag", "TagCount", "TagCountResponse",
     "Tool", "ToolCreate", "ToolUpdate", "ToolResponse", "ToolType",
     "Command", "CommandCreate", "CommandUpdate", "CommandResponse", "CommandCategory",
     "CommandUseRequest", "CommandStats"
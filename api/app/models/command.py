@@ -1,4 +1,4 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
 from datetime import datetime
 from typing import Optional, List
 from enum import Enum
@@ -36,6 +36,13 @@ class Command(CommandBase, table=True):
     updated_at: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
     last_used_at: Optional[datetime] = Field(default=None, description="最后使用时间")
 
+    # 列表分页（游标）使用的排序索引
+    __table_args__ = (
+        Index("idx_command_updated_id", "updated_at", "id"),
+        Index("idx_command_use_count_id", "use_count", "id"),
+        Index("idx_command_name_id", "name", "id"),
+    )
+
 class CommandCreate(CommandBase):
     """创建命令请求模型"""
     pass
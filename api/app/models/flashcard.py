@@ -1,6 +1,6 @@
 from sqlmodel import SQLModel, Field, Index
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 
@@ -82,6 +82,25 @@ class Flashcard(FlashcardBase, table=True):
     )
 
 
+class FlashcardCounter(SQLModel, table=True):
+    """
+    卡片计数表
+
+    按维度维护卡片数量，随卡片的创建、修改、复习和删除增量更新，统计接口不再扫描全表。
+    dimension/value 取值：
+    - total/all: 卡片总数
+    - status/<状态>: 各状态的卡片数
+    - leitner_box/<盒子>: 各 Leitner 盒子的卡片数
+    - retention/reviewed: 复习过的卡片数，amount 为这些卡片记忆保持率（百分比）之和
+    """
+    __tablename__ = "flashcard_counters"
+
+    dimension: str = Field(primary_key=True, description="计数维度")
+    value: str = Field(primary_key=True, description="维度取值")
+    count: int = Field(default=0, description="卡片数量")
+    amount: float = Field(default=0.0, description="累加值")
+
+
 class FlashcardCreate(FlashcardBase):
     """创建记忆卡片的请求模型"""
     pass
@@ -108,6 +127,45 @@ class FlashcardResponse(FlashcardBase):
     updated_at: datetime
 
 
+class AnswerPreview(SQLModel):
+    """选择某个答案后的复习安排"""
+    interval: int = Field(description="下次复习间隔（天）")
+    leitner_box: LeitnerBox
+
+
+class StudyCard(SQLModel):
+    """学习队列中的卡片"""
+    flashcard: FlashcardResponse
+    previews: Dict[str, AnswerPreview] = Field(description="各答案（again/hard/good/easy）对应的复习安排")
+
+
+class StudySessionCreate(SQLModel):
+    """创建学习会话的请求模型"""
+    max_new: int = Field(default=20, ge=0, le=500, description="最多新卡片数量")
+    max_review: int = Field(default=100, ge=0, le=1000, description="最多复习卡片数量")
+
+
+class StudySessionResponse(SQLModel):
+    """学习会话响应模型"""
+    session_id: str
+    new_cards: int
+    review_cards: int
+    remaining: int
+
+
+class StudyQueueResponse(SQLModel):
+    """学习队列中接下来的卡片"""
+    remaining: int
+    cards: List[StudyCard]
+
+
+class StudyAnswer(SQLModel):
+    """学习会话中提交的答案"""
+    flashcard_id: int
+    difficulty: FlashcardDifficulty
+    response_time: int
+
+
 class ReviewRecord(SQLModel, table=True):
     """复习记录表"""
     __tablename__ = "review_records"
@@ -149,6 +207,19 @@ class ReviewRecordCreate(SQLModel):
     response_time: int
 
 
+class BatchReviewItem(SQLModel):
+    """批量复习中的一次复习"""
+    flashcard_id: int
+    difficulty: FlashcardDifficulty
+    response_time: int
+    reviewed_at: Optional[datetime] = Field(default=None, description="复习时间（离线复习时由客户端记录），默认为提交时间")
+
+
+class BatchReviewRequest(SQLModel):
+    """批量复习请求模型，按复习发生的顺序排列"""
+    reviews: List[BatchReviewItem] = Field(min_length=1, max_length=1000)
+
+
 class ReviewRecordResponse(SQLModel):
     """复习记录响应模型"""
     id: int
@@ -167,6 +238,68 @@ class ReviewRecordResponse(SQLModel):
     next_due_date: datetime
 
 
+class BatchReviewResult(SQLModel):
+    """批量复习中单次复习的结果"""
+    review_record: ReviewRecordResponse
+    next_due_date: datetime
+    retention_rate: float
+
+
+class BatchReviewResponse(SQLModel):
+    """批量复习响应模型，结果与请求中的复习一一对应"""
+    results: List[BatchReviewResult]
+
+
+class ForecastDay(SQLModel):
+    """某一天的预计复习负载"""
+    date: str = Field(description="日期 (YYYY-MM-DD，UTC)")
+    reviews: float = Field(description="预计复习卡片数")
+    new_cards: float = Field(description="其中的新卡片数")
+    minutes: float = Field(description="预计用时（分钟）")
+
+
+class ForecastResponse(SQLModel):
+    """复习负载预测响应模型"""
+    new_per_day: int
+    runs: int
+    total_reviews: float
+    total_minutes: float
+    days: List[ForecastDay]
+
+
+class ImportFormat(str, Enum):
+    """流式导入的请求体格式"""
+    NDJSON = "ndjson"  # 每行一个 JSON 对象
+    CSV = "csv"        # 首行为表头
+
+
+class ImportStatus(str, Enum):
+    """导入任务状态"""
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ImportRowError(SQLModel):
+    """导入时校验失败的行"""
+    line: int = Field(description="行号（CSV 为该记录结束处的行号）")
+    error: str
+
+
+class ImportJobResponse(SQLModel):
+    """导入任务进度与结果"""
+    id: str
+    format: ImportFormat
+    status: ImportStatus
+    rows: int = Field(description="已读取的记录数")
+    imported: int = Field(description="已写入的卡片数")
+    failed: int = Field(description="校验失败的记录数")
+    errors: List[ImportRowError] = Field(description="校验失败的记录（只保留前若干条）")
+    message: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+
 class StudyStats(SQLModel, table=True):
     """学习统计表"""
     __tablename__ = "study_stats"
@@ -1,4 +1,4 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
 from datetime import datetime
 from typing import Optional, List
 
@@ -15,6 +15,11 @@ class Note(NoteBase, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
     updated_at: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
 
+    # 列表分页（游标）使用的排序索引
+    __table_args__ = (
+        Index("idx_note_updated_id", "updated_at", "id"),
+    )
+
 class NoteCreate(NoteBase):
     pass
 
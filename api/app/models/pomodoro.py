@@ -1,4 +1,4 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
 from datetime import datetime
 from typing import Optional
 from enum import Enum
@@ -27,6 +27,11 @@ class PomodoroSession(PomodoroSessionBase, table=True):
     updated_at: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
     completed_at: Optional[datetime] = Field(default=None, description="完成时间")
 
+    # 列表分页（游标）使用的排序索引
+    __table_args__ = (
+        Index("idx_pomodoro_started_id", "started_at", "id"),
+    )
+
 class PomodoroSessionCreate(PomodoroSessionBase):
     pass
 
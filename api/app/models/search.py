@@ -0,0 +1,41 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import List, Optional
+
+
+class SearchDocument(SQLModel, table=True):
+    """
+    全文搜索文档表
+
+    每条笔记、卡片、工具、命令对应一行，由 services/search.py 在写入时同步。
+    *_tokens 为分词后的文本（中日韩文字按相邻二字切分），供 SQLite FTS5 /
+    PostgreSQL tsvector 建索引；title/body 保存原文，用于生成摘要。
+    """
+    __tablename__ = "search_documents"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    entity_type: str = Field(description="实体类型（note/flashcard/tool/command）")
+    entity_id: int = Field(description="实体ID")
+    title: str = Field(default="", description="标题原文")
+    body: str = Field(default="", description="正文原文")
+    title_tokens: str = Field(default="", description="标题分词")
+    body_tokens: str = Field(default="", description="正文分词")
+
+    __table_args__ = (
+        Index("idx_search_entity", "entity_type", "entity_id", unique=True),
+    )
+
+
+class SearchResult(SQLModel):
+    """搜索结果"""
+    type: str
+    id: int
+    title: str
+    snippet: str = Field(description="匹配位置附近的正文片段，匹配词以 <mark> 标记（已做 HTML 转义）")
+    score: float = Field(description="相关度，越大越相关")
+
+
+class SearchResponse(SQLModel):
+    """搜索响应"""
+    query: str
+    results: List[SearchResult]
+    fallback: bool = Field(description="查询无法使用全文索引（如单个汉字），退回子串匹配")
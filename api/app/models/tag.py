@@ -0,0 +1,45 @@
+from sqlmodel import SQLModel, Field, Index
+from typing import Optional
+
+
+class Tag(SQLModel, table=True):
+    """
+    标签表
+
+    各实体的 tags 字段（逗号分隔）保持不变，由 services/tags.py 在写入时同步到
+    entity_tags 与 tag_counts，供精确的标签过滤和标签统计使用。
+    """
+    __tablename__ = "tags"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str = Field(unique=True, description="匹配用的标签（不区分大小写）")
+    name: str = Field(description="标签显示名称（首次出现时的写法）")
+
+
+class EntityTag(SQLModel, table=True):
+    """实体与标签的关联表"""
+    __tablename__ = "entity_tags"
+
+    entity_type: str = Field(primary_key=True, description="实体类型（note/flashcard/tool/command）")
+    entity_id: int = Field(primary_key=True, description="实体ID")
+    tag_id: int = Field(primary_key=True, foreign_key="tags.id", description="标签ID")
+
+    # 按标签查实体
+    __table_args__ = (
+        Index("idx_entity_tags_tag", "tag_id", "entity_type", "entity_id"),
+    )
+
+
+class TagCount(SQLModel, table=True):
+    """每种实体类型下各标签的使用次数（随写入增量维护）"""
+    __tablename__ = "tag_counts"
+
+    tag_id: int = Field(primary_key=True, foreign_key="tags.id", description="标签ID")
+    entity_type: str = Field(primary_key=True, description="实体类型")
+    count: int = Field(default=0, description="使用该标签的实体数量")
+
+
+class TagCountResponse(SQLModel):
+    """标签统计响应模型"""
+    name: str
+    count: int
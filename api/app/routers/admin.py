@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, Optional
+import hmac
+import os
+
+from app.db_pool import all_pool_status
+from app.auth.cache import auth_cache_stats
+from app.auth.hashing import password_pool
+from app.middleware import api_cache, db_usage
+from app.services.loop_monitor import loop_monitor
+from app.services.metrics import render_all
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    要求请求头 X-Admin-Token 与 ADMIN_TOKEN 匹配
+
+    未设置 ADMIN_TOKEN 时管理接口整体关闭（返回 404），不会默认公开连接池、堆栈等内部信息
+    """
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", expected):
+        raise HTTPException(status_code=403, detail="无效的管理令牌")
+
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/cache", summary="缓存统计")
+async def get_cache_stats() -> Dict[str, Any]:
+    """缓存后端总量、请求合并情况以及按键前缀的命中率、字节数与延迟"""
+    return {
+        "summary": api_cache.get_stats(),
+        "prefixes": api_cache.metrics.snapshot(),
+    }
+
+
+@router.get("/db", summary="数据库连接使用统计")
+async def get_db_usage() -> Dict[str, Any]:
+    """连接池状态，以及按路由统计的请求数、用到数据库连接的请求数和连接检出次数"""
+    return {"pools": all_pool_status(), "routes": db_usage.snapshot()}
+
+
+@router.get("/loop", summary="事件循环延迟")
+async def get_loop_lag(top: int = Query(20, ge=1, le=100, description="返回的阻塞位置数量")) -> Dict[str, Any]:
+    """事件循环延迟分位数，以及阻塞事件循环最严重的路由与调用栈"""
+    return loop_monitor.snapshot(top=top)
+
+
+@router.get("/auth", summary="认证统计")
+async def get_auth_stats() -> Dict[str, Any]:
+    """密码哈希工作池的排队、拒绝与耗时统计，以及令牌 / 用户缓存命中率"""
+    return {"password_hash": password_pool.stats(), **auth_cache_stats()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Prometheus 指标")
+async def get_metrics() -> PlainTextResponse:
+    """Prometheus 文本格式的指标"""
+    return PlainTextResponse(render_all(), media_type="text/plain; version=0.0.4")
@@ -1,16 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import timedelta
 
-from app.database import get_session
+from app.database import get_async_session
 from app.models.user import User, UserCreate, UserLogin, UserResponse
-from app.auth.utils import (
-    verify_password, 
-    get_password_hash, 
-    create_access_token,
-    verify_token
-)
+from app.auth.utils import create_access_token, verify_token
+from app.auth.cache import cache_user, get_cached_user
+from app.auth.hashing import hash_password, verify_and_update_password
 
 router = APIRouter()
 security = HTTPBearer()
@@ -23,13 +21,13 @@ async def test_auth_router():
 @router.post("/register", response_model=UserResponse, summary="用户注册")
 async def register(
     user_data: UserCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """用户注册"""
     # 检查用户名是否已存在
-    existing_user = session.exec(
+    existing_user = (await session.exec(
         select(User).where(User.username == user_data.username)
-    ).first()
+    )).first()
     
     if existing_user:
         raise HTTPException(
@@ -37,36 +35,56 @@ async def register(
             detail="用户名已存在"
         )
     
-    # 创建新用户
-    hashed_password = get_password_hash(user_data.password)
+    # 结束只读事务归还连接，计算哈希期间不占用连接池
+    await session.commit()
+    
+    # 创建新用户（哈希计算在工作池中执行）
+    hashed_password = await hash_password(user_data.password)
     user = User(
         username=user_data.username,
         password_hash=hashed_password
     )
     
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     
     return user
 
 @router.post("/login", summary="用户登录")
 async def login(
     user_data: UserLogin,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """用户登录"""
     # 查找用户
-    user = session.exec(
+    user = (await session.exec(
         select(User).where(User.username == user_data.username)
-    ).first()
+    )).first()
     
-    if not user or not verify_password(user_data.password, user.password_hash):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误"
         )
     
+    # 结束只读事务归还连接，验证密码期间不占用连接池（提交后不过期，user 仍可访问）
+    await session.commit()
+    
+    # 验证密码（在工作池中执行）
+    verified, new_hash = await verify_and_update_password(user_data.password, user.password_hash)
+    if not verified:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="用户名或密码错误"
+        )
+    
+    # 哈希参数已变更（如调整了 BCRYPT_ROUNDS），保存升级后的哈希
+    if new_hash:
+        user.password_hash = new_hash
+        session.add(user)
+        await session.commit()
+    
     # 创建访问令牌
     access_token_expires = timedelta(days=30)
     access_token = create_access_token(
@@ -83,16 +101,20 @@ async def login(
 @router.get("/me", response_model=UserResponse, summary="获取当前用户信息")
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """获取当前登录用户信息"""
     token = credentials.credentials
     payload = verify_token(token)
     username = payload.get("sub")
     
-    user = session.exec(
+    cached = get_cached_user(username)
+    if cached is not None:
+        return cached
+    
+    user = (await session.exec(
         select(User).where(User.username == username)
-    ).first()
+    )).first()
     
     if not user:
         raise HTTPException(
@@ -100,12 +122,12 @@ async def get_current_user(
             detail="用户不存在"
         )
     
+    cache_user(user)
     return user
 
 # 获取当前用户的依赖项
 async def get_current_user_id(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session)
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> int:
     """获取当前用户ID"""
     token = credentials.credentials
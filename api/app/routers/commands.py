@@ -1,52 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select, or_, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
-from app.database import get_session
+from app.database import get_async_session
 from app.models.command import (
     Command, CommandCreate, CommandUpdate, CommandResponse, CommandCategory,
     CommandUseRequest, CommandStats
 )
+from app.services.pagination import Keyset, set_next_cursor
+from app.services.search import search_filter
+from app.services.tags import TagMatch, tag_filter, tag_names_query
 
 router = APIRouter()
 
+# 支持游标分页的排序字段，id 作为最后一列保证顺序唯一
+_SORT_COLUMNS = {
+    "updated_at": Command.updated_at,
+    "use_count": Command.use_count,
+    "name": Command.name,
+}
+
 @router.post("/", response_model=CommandResponse, summary="创建新命令")
 async def create_command(
     command: CommandCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> CommandResponse:
     """创建新命令"""
     db_command = Command.model_validate(command)
     session.add(db_command)
-    session.commit()
-    session.refresh(db_command)
+    await session.commit()
+    await session.refresh(db_command)
     return CommandResponse.model_validate(db_command)
 
 @router.get("/", response_model=List[CommandResponse], summary="获取命令列表")
 async def get_commands(
+    response: Response,
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页响应头 X-Next-Cursor），提供时忽略 skip"),
     search: Optional[str] = Query(None, description="搜索关键词（名称、命令或描述）"),
     category: Optional[CommandCategory] = Query(None, description="分类过滤"),
     tags: Optional[str] = Query(None, description="标签过滤（逗号分隔）"),
+    tags_mode: TagMatch = Query(TagMatch.ALL, description="多个标签的匹配方式：all 全部包含，any 包含任一"),
     is_dangerous: Optional[bool] = Query(None, description="是否为危险命令"),
     sort_by: str = Query("updated_at", description="排序字段（updated_at、use_count、name）"),
     sort_desc: bool = Query(True, description="是否降序排列"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> List[CommandResponse]:
     """获取命令列表，支持搜索和过滤"""
     query = select(Command)
     
     # 搜索功能
     if search:
-        search_term = f"%{search}%"
         query = query.where(
-            or_(
-                Command.name.ilike(search_term),
-                Command.command.ilike(search_term),
-                Command.description.ilike(search_term)
-            )
+            search_filter("command", search, [Command.name, Command.command, Command.description])
         )
     
     # 分类过滤
@@ -54,35 +63,34 @@ async def get_commands(
         query = query.where(Command.category == category)
     
     # 标签过滤
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
-        for tag in tag_list:
-            query = query.where(Command.tags.ilike(f"%{tag}%"))
+    tag_condition = tag_filter("command", tags, match_all=tags_mode == TagMatch.ALL)
+    if tag_condition is not None:
+        query = query.where(tag_condition)
     
     # 危险命令过滤
     if is_dangerous is not None:
         query = query.where(Command.is_dangerous == is_dangerous)
     
-    # 排序
-    sort_column = getattr(Command, sort_by, Command.updated_at)
-    if sort_desc:
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column)
-    
-    # 应用分页
-    query = query.offset(skip).limit(limit)
-    
-    commands = session.exec(query).all()
+    # 排序并分页
+    cursor_supported = sort_by in _SORT_COLUMNS
+    if cursor and not cursor_supported:
+        raise HTTPException(status_code=400, detail="游标分页只支持按 updated_at、use_count、name 排序")
+    sort_column = _SORT_COLUMNS.get(sort_by) or getattr(Command, sort_by, Command.updated_at)
+    keyset = Keyset((sort_column, sort_desc), (Command.id, sort_desc))
+    query = keyset.apply(query, cursor=cursor, skip=skip, limit=limit)
+    
+    commands, next_cursor = keyset.page((await session.exec(query)).all(), limit)
+    if cursor_supported:
+        set_next_cursor(response, next_cursor)
     return [CommandResponse.model_validate(command) for command in commands]
 
 @router.get("/{command_id}", response_model=CommandResponse, summary="获取单个命令")
 async def get_command(
     command_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> CommandResponse:
     """根据ID获取单个命令"""
-    command = session.get(Command, command_id)
+    command = await session.get(Command, command_id)
     if not command:
         raise HTTPException(status_code=404, detail="命令不存在")
     return CommandResponse.model_validate(command)
@@ -91,10 +99,10 @@ async def get_command(
 async def update_command(
     command_id: int,
     command_update: CommandUpdate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> CommandResponse:
     """更新命令"""
-    db_command = session.get(Command, command_id)
+    db_command = await session.get(Command, command_id)
     if not db_command:
         raise HTTPException(status_code=404, detail="命令不存在")
     
@@ -107,33 +115,33 @@ async def update_command(
     db_command.updated_at = datetime.utcnow()
     
     session.add(db_command)
-    session.commit()
-    session.refresh(db_command)
+    await session.commit()
+    await session.refresh(db_command)
     
     return CommandResponse.model_validate(db_command)
 
 @router.delete("/{command_id}", summary="删除命令")
 async def delete_command(
     command_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> dict:
     """删除命令"""
-    command = session.get(Command, command_id)
+    command = await session.get(Command, command_id)
     if not command:
         raise HTTPException(status_code=404, detail="命令不存在")
     
-    session.delete(command)
-    session.commit()
+    await session.delete(command)
+    await session.commit()
     
     return {"message": "命令已删除"}
 
 @router.post("/{command_id}/use", summary="记录命令使用")
 async def use_command(
     command_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> dict:
     """记录命令使用，增加使用次数并更新最后使用时间"""
-    command = session.get(Command, command_id)
+    command = await session.get(Command, command_id)
     if not command:
         raise HTTPException(status_code=404, detail="命令不存在")
     
@@ -141,25 +149,25 @@ async def use_command(
     command.last_used_at = datetime.utcnow()
     
     session.add(command)
-    session.commit()
+    await session.commit()
     
     return {"message": "使用记录已更新", "use_count": command.use_count}
 
 @router.get("/stats/overview", response_model=CommandStats, summary="获取命令统计")
 async def get_command_stats(
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> CommandStats:
     """获取命令统计信息"""
     
     # 总命令数
-    total_commands = session.exec(select(func.count(Command.id))).first() or 0
+    total_commands = (await session.exec(select(func.count(Command.id)))).first() or 0
     
     # 分类统计
     category_stats = {}
     for category in CommandCategory:
-        count = session.exec(
+        count = (await session.exec(
             select(func.count(Command.id)).where(Command.category == category)
-        ).first() or 0
+        )).first() or 0
         if count > 0:
             category_stats[category.value] = count
     
@@ -167,19 +175,19 @@ async def get_command_stats(
     
     # 最常用命令
     most_used_command = None
-    most_used_result = session.exec(
+    most_used_result = (await session.exec(
         select(Command).where(Command.use_count > 0).order_by(Command.use_count.desc()).limit(1)
-    ).first()
+    )).first()
     if most_used_result:
         most_used_command = CommandResponse.model_validate(most_used_result)
     
     # 最近使用的命令（前10个）
-    recent_commands_result = session.exec(
+    recent_commands_result = (await session.exec(
         select(Command)
         .where(Command.last_used_at.is_not(None))
         .order_by(Command.last_used_at.desc())
         .limit(10)
-    ).all()
+    )).all()
     recent_commands = [CommandResponse.model_validate(cmd) for cmd in recent_commands_result]
     
     return CommandStats(
@@ -197,47 +205,37 @@ async def get_command_categories() -> List[str]:
 
 @router.get("/tags/", response_model=List[str], summary="获取所有标签")
 async def get_all_tags(
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> List[str]:
     """获取所有已使用的标签"""
-    commands = session.exec(select(Command.tags)).all()
-    tags = set()
-    
-    for command_tags in commands:
-        if command_tags:
-            for tag in command_tags.split(","):
-                tag = tag.strip()
-                if tag:
-                    tags.add(tag)
-    
-    return sorted(list(tags))
+    return list((await session.exec(tag_names_query("command"))).all())
 
 @router.get("/frequent/", response_model=List[CommandResponse], summary="获取常用命令")
 async def get_frequent_commands(
     limit: int = Query(20, ge=1, le=100, description="返回的记录数"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> List[CommandResponse]:
     """获取使用频率最高的命令"""
-    commands = session.exec(
+    commands = (await session.exec(
         select(Command)
         .where(Command.use_count > 0)
         .order_by(Command.use_count.desc())
         .limit(limit)
-    ).all()
+    )).all()
     
     return [CommandResponse.model_validate(command) for command in commands]
 
 @router.get("/recent/", response_model=List[CommandResponse], summary="获取最近使用的命令")
 async def get_recent_commands(
     limit: int = Query(20, ge=1, le=100, description="返回的记录数"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> List[CommandResponse]:
     """获取最近使用的命令"""
-    commands = session.exec(
+    commands = (await session.exec(
         select(Command)
         .where(Command.last_used_at.is_not(None))
         .order_by(Command.last_used_at.desc())
         .limit(limit)
-    ).all()
+    )).all()
     
     return [CommandResponse.model_validate(command) for command in commands]
\ No newline at end of file
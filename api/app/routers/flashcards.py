@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select, func, and_, or_, text
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import insert
+from sqlmodel import Session, select, func, and_, text
 from datetime import datetime, timezone, date
 from typing import List, Optional, Dict, Any
 from functools import lru_cache
@@ -9,23 +10,86 @@ from ..models.flashcard import (
     Flashcard, FlashcardCreate, FlashcardUpdate, FlashcardResponse,
     FlashcardDifficulty, FlashcardStatus, LeitnerBox,
     ReviewRecord, ReviewRecordCreate, ReviewRecordResponse,
+    BatchReviewRequest, BatchReviewResult, BatchReviewResponse,
+    StudyAnswer, StudySessionCreate, StudySessionResponse, StudyQueueResponse,
+    ForecastResponse, ImportFormat, ImportJobResponse,
     StudyStats, StudyStatsResponse
 )
 from ..services.spaced_repetition import SpacedRepetitionAlgorithm
-from ..middleware.cache import cache_response, invalidate_cache_pattern
+from ..services.forecast import (
+    FORECAST_MAX_RUNS, default_runs, forecast_days, load_forecast_inputs, simulate
+)
+from ..services.flashcard_import import (
+    IMPORT_CHUNK_SIZE, create_import_job, detect_import_format, get_import_job, import_stream, list_import_jobs
+)
+from ..services.flashcard_counters import RETENTION_KEY, TOTAL_KEY, read_counters
+from ..services.pagination import Keyset, TotalMode, planner_row_estimate
+from ..services.search import search_filter
+from ..services.study_queue import (
+    STUDY_SESSIONS_AVAILABLE, StudyQueue, create_study_queue, delete_study_queue, get_study_queue,
+    save_study_queue
+)
+from ..services.tags import TagMatch, tag_filter, tag_names_query
+from ..middleware.cache import cache_response, invalidate_cache_tags
 
 router = APIRouter(prefix="/flashcards", tags=["flashcards"])
 
+# 缓存依赖标签
+FLASHCARDS_TAG = "flashcards"                 # 卡片状态分布（统计接口）
+FLASHCARD_CATEGORY_TAG = "flashcards.category"  # 分类列表
+FLASHCARD_TAGS_TAG = "flashcards.tags"          # 标签列表
+FLASHCARD_SCHEDULE_TAG = "flashcards.schedule"  # 复习排程（负载预测）
+STUDY_STATS_TAG = "study_stats"
+
+# 卡片列表排序：到期时间、状态、创建时间（倒序），id 保证顺序唯一
+FLASHCARDS_KEYSET = Keyset(
+    (Flashcard.due_date, False),
+    (Flashcard.status, False),
+    (Flashcard.created_at, True),
+    (Flashcard.id, False),
+)
+
+# 影响统计接口结果的字段
+_STATS_FIELDS = {"status", "leitner_box", "due_date"}
+# 影响负载预测的字段
+_SCHEDULE_FIELDS = _STATS_FIELDS | {"ease_factor", "interval", "repetitions"}
+
+
+def _invalidate_flashcard_cache(changed_fields: Optional[set] = None) -> None:
+    """
+    按变更字段精确失效卡片相关缓存
+    
+    Args:
+        changed_fields: 被修改的字段集合，None 表示整行变化（创建/删除）
+    """
+    cache_tags = []
+    if changed_fields is None or changed_fields & _STATS_FIELDS:
+        cache_tags.append(FLASHCARDS_TAG)
+    if changed_fields is None or changed_fields & _SCHEDULE_FIELDS:
+        cache_tags.append(FLASHCARD_SCHEDULE_TAG)
+    if changed_fields is None or "category" in changed_fields:
+        cache_tags.append(FLASHCARD_CATEGORY_TAG)
+    if changed_fields is None or "tags" in changed_fields:
+        cache_tags.append(FLASHCARD_TAGS_TAG)
+    if cache_tags:
+        invalidate_cache_tags(*cache_tags)
+
 
 @router.get("/", response_model=Dict[str, Any])
 def get_flashcards(
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor），提供时忽略 skip"),
     status: Optional[FlashcardStatus] = Query(None, description="按状态过滤"),
     category: Optional[str] = Query(None, description="按分类过滤"),
-    tags: Optional[str] = Query(None, description="按标签过滤"),
+    tags: Optional[str] = Query(None, description="按标签过滤（逗号分隔）"),
+    tags_mode: TagMatch = Query(TagMatch.ALL, description="多个标签的匹配方式：all 全部包含，any 包含任一"),
     due_only: bool = Query(False, description="只显示到期需要复习的卡片"),
     search: Optional[str] = Query(None, description="搜索卡片内容"),
+    total: TotalMode = Query(
+        TotalMode.EXACT,
+        description="总数计算方式：exact 精确计数，estimate 估计值，none 不计算（无限滚动）"
+    ),
     session: Session = Depends(get_session)
 ):
     """获取记忆卡片列表（优化版本）"""
@@ -41,50 +105,54 @@ def get_flashcards(
     if category:
         conditions.append(Flashcard.category == category)
     
-    if tags:
-        # 使用全文搜索优化标签搜索
-        conditions.append(Flashcard.tags.contains(tags))
+    # 标签索引精确匹配
+    tag_condition = tag_filter("flashcard", tags, match_all=tags_mode == TagMatch.ALL)
+    if tag_condition is not None:
+        conditions.append(tag_condition)
     
     if due_only:
         now = datetime.now(timezone.utc)
         conditions.append(Flashcard.due_date <= now)
     
     if search:
-        # 优化搜索查询，使用索引
-        search_term = f"%{search}%"
-        search_condition = or_(
-            Flashcard.front.ilike(search_term),
-            Flashcard.back.ilike(search_term)
-        )
-        conditions.append(search_condition)
+        # 全文索引搜索（单个汉字等无法索引的查询退回 ILIKE）
+        conditions.append(search_filter("flashcard", search, [Flashcard.front, Flashcard.back]))
     
     # 应用所有条件
     if conditions:
         query = query.where(and_(*conditions))
     
     # 计算总数（对于分页）
-    count_query = select(func.count(Flashcard.id))
-    if conditions:
-        count_query = count_query.where(and_(*conditions))
-    
-    total_count = session.exec(count_query).one()
-    
-    # 执行主查询，优化排序
-    query = query.order_by(
-        Flashcard.due_date.asc(),
-        Flashcard.status.asc(),
-        Flashcard.created_at.desc()
-    )
-    query = query.offset(skip).limit(limit)
-    
-    flashcards = session.exec(query).all()
+    total_count = None
+    total_estimated = False
+    if total == TotalMode.ESTIMATE:
+        if len(conditions) == (1 if status else 0):
+            # 无过滤或只按状态过滤：直接读计数表
+            counters = read_counters(session)
+            key = ("status", status.value) if status else TOTAL_KEY
+            total_count = counters.get(key, (0, 0.0))[0]
+        else:
+            total_count = planner_row_estimate(session, query)
+            total_estimated = total_count is not None
+    if total_count is None and total != TotalMode.NONE:
+        count_query = select(func.count(Flashcard.id))
+        if conditions:
+            count_query = count_query.where(and_(*conditions))
+        total_count = session.exec(count_query).one()
+    
+    # 执行主查询：有游标时从游标位置继续，否则沿用 OFFSET
+    query = FLASHCARDS_KEYSET.apply(query, cursor=cursor, skip=skip, limit=limit)
+    
+    flashcards, next_cursor = FLASHCARDS_KEYSET.page(session.exec(query).all(), limit)
     
     return {
         "data": flashcards,
         "total": total_count,
+        "total_estimated": total_estimated,
         "skip": skip,
         "limit": limit,
-        "has_more": total_count > skip + limit
+        "has_more": next_cursor is not None,
+        "next_cursor": next_cursor
     }
 
 
@@ -117,61 +185,71 @@ def get_due_flashcards(
 
 
 @router.get("/stats", response_model=dict)
-@cache_response(ttl=120)  # 缓存2分钟
+@cache_response(ttl=120, stale_ttl=600, tags=[FLASHCARDS_TAG], encoded=True)  # 缓存2分钟，过期后10分钟内后台刷新
 def get_flashcard_stats(session: Session = Depends(get_session)):
-    """获取卡片统计信息（优化版本）"""
-    
-    # 使用单个查询获取大部分统计信息
-    stats_query = text("""
-        SELECT 
-            COUNT(*) as total_cards,
-            COUNT(CASE WHEN due_date <= :now THEN 1 END) as due_cards,
-            COUNT(CASE WHEN status = 'new' THEN 1 END) as new_cards,
-            COUNT(CASE WHEN status = 'learning' THEN 1 END) as learning_cards,
-            COUNT(CASE WHEN status = 'reviewing' THEN 1 END) as reviewing_cards,
-            COUNT(CASE WHEN status = 'relearning' THEN 1 END) as relearning_cards,
-            COUNT(CASE WHEN status = 'suspended' THEN 1 END) as suspended_cards,
-            COUNT(CASE WHEN status = 'buried' THEN 1 END) as buried_cards,
-            COUNT(CASE WHEN leitner_box = 'box_1' THEN 1 END) as box_1_count,
-            COUNT(CASE WHEN leitner_box = 'box_2' THEN 1 END) as box_2_count,
-            COUNT(CASE WHEN leitner_box = 'box_3' THEN 1 END) as box_3_count,
-            COUNT(CASE WHEN leitner_box = 'box_4' THEN 1 END) as box_4_count,
-            COUNT(CASE WHEN leitner_box = 'box_5' THEN 1 END) as box_5_count,
-            COUNT(CASE WHEN leitner_box = 'box_6' THEN 1 END) as box_6_count,
-            COUNT(CASE WHEN leitner_box = 'box_7' THEN 1 END) as box_7_count,
-            AVG(CASE WHEN total_reviews > 0 THEN (correct_reviews * 100.0 / total_reviews) END) as avg_retention
-        FROM flashcards
-    """)
+    """获取卡片统计信息（读取计数表，到期数量走 due_date 索引）"""
+    counters = read_counters(session)
     
-    result = session.exec(stats_query, {"now": datetime.now(timezone.utc)}).first()
+    def count(dimension: str, value: str) -> int:
+        return counters.get((dimension, value), (0, 0.0))[0]
+    
+    total_cards = count(*TOTAL_KEY)
+    due_cards = session.exec(
+        select(func.count()).select_from(Flashcard).where(
+            Flashcard.due_date <= datetime.now(timezone.utc)
+        )
+    ).one()
+    reviewed_cards, retention_sum = counters.get(RETENTION_KEY, (0, 0.0))
     
     return {
-        "total_cards": result.total_cards,
-        "due_cards": result.due_cards,
+        "total_cards": total_cards,
+        "due_cards": due_cards,
         "status_distribution": {
-            "new": result.new_cards,
-            "learning": result.learning_cards,
-            "reviewing": result.reviewing_cards,
-            "relearning": result.relearning_cards,
-            "suspended": result.suspended_cards,
-            "buried": result.buried_cards,
+            status.value: count("status", status.value) for status in FlashcardStatus
         },
         "leitner_distribution": {
-            "box_1": result.box_1_count,
-            "box_2": result.box_2_count,
-            "box_3": result.box_3_count,
-            "box_4": result.box_4_count,
-            "box_5": result.box_5_count,
-            "box_6": result.box_6_count,
-            "box_7": result.box_7_count,
+            box.value: count("leitner_box", box.value) for box in LeitnerBox
         },
-        "average_retention_rate": round(result.avg_retention or 0, 2),
-        "review_distribution": SpacedRepetitionAlgorithm.get_review_distribution(result.total_cards)
+        "average_retention_rate": round(retention_sum / reviewed_cards, 2) if reviewed_cards else 0,
+        "review_distribution": SpacedRepetitionAlgorithm.get_review_distribution(total_cards)
     }
 
 
+def _utc_today() -> date:
+    """当前 UTC 日期，作为按天变化的响应的缓存键"""
+    return datetime.now(timezone.utc).date()
+
+
+@router.get("/forecast", response_model=ForecastResponse)
+@cache_response(ttl=3600, key_params=["today"], tags=[FLASHCARD_SCHEDULE_TAG], encoded=True)  # 卡片排程变化前一直有效（最多1小时，跨天后重新计算）
+def get_review_forecast(
+    days: int = Query(30, ge=1, le=365, description="预测天数"),
+    new_per_day: Optional[int] = Query(None, ge=0, le=1000, description="每天引入的新卡片数，默认按复习分布建议"),
+    runs: Optional[int] = Query(None, ge=1, le=FORECAST_MAX_RUNS, description="模拟次数，结果取平均；默认按卡片数自动选择"),
+    today: date = Depends(_utc_today),
+    session: Session = Depends(get_session)
+):
+    """按卡片当前状态和历史答题情况模拟未来每天的复习数量与用时"""
+    if new_per_day is None:
+        total_cards = read_counters(session).get(TOTAL_KEY, (0, 0.0))[0]
+        new_per_day = SpacedRepetitionAlgorithm.get_review_distribution(total_cards)["max_new_cards"]
+    
+    inputs = load_forecast_inputs(session)
+    runs = runs or default_runs(len(inputs.states))
+    now = datetime.now(timezone.utc)
+    result = simulate(inputs, days, new_per_day, runs, now)
+    
+    return ForecastResponse(
+        new_per_day=new_per_day,
+        runs=runs,
+        total_reviews=round(float(result["reviews"].sum()), 2),
+        total_minutes=round(float(result["minutes"].sum()), 1),
+        days=forecast_days(result, now)
+    )
+
+
 @router.get("/categories", response_model=Dict[str, List[str]])
-@cache_response(ttl=600)  # 缓存10分钟
+@cache_response(ttl=600, stale_ttl=3600, tags=[FLASHCARD_CATEGORY_TAG], encoded=True)  # 缓存10分钟，过期后1小时内后台刷新
 def get_categories(session: Session = Depends(get_session)):
     """获取所有分类（缓存优化）"""
     
@@ -183,33 +261,17 @@ def get_categories(session: Session = Depends(get_session)):
         ORDER BY category
     """)
     
-    result = session.exec(categories_query).all()
+    result = session.exec(categories_query).scalars().all()
     categories = [cat for cat in result if cat]
     
     return {"data": categories}
 
 
 @router.get("/tags", response_model=Dict[str, List[str]])
-@cache_response(ttl=600)  # 缓存10分钟  
+@cache_response(ttl=600, stale_ttl=3600, tags=[FLASHCARD_TAGS_TAG], encoded=True)  # 缓存10分钟，过期后1小时内后台刷新
 def get_tags(session: Session = Depends(get_session)):
-    """获取所有标签（优化版本）"""
-    
-    # 优化标签提取查询
-    tags_query = text("""
-        SELECT tags 
-        FROM flashcards 
-        WHERE tags IS NOT NULL AND tags != ''
-    """)
-    
-    tags_result = session.exec(tags_query).all()
-    
-    all_tags = set()
-    for tags_str in tags_result:
-        if tags_str:
-            tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-            all_tags.update(tags)
-    
-    return {"data": sorted(list(all_tags))}
+    """获取所有标签（读取标签索引）"""
+    return {"data": list(session.exec(tag_names_query("flashcard")).all())}
 
 
 @router.post("/", response_model=FlashcardResponse)
@@ -227,13 +289,26 @@ def create_flashcard(
     session.refresh(flashcard)
     
     # 清理相关缓存
-    invalidate_cache_pattern("stats")
-    invalidate_cache_pattern("categories")
-    invalidate_cache_pattern("tags")
+    _invalidate_flashcard_cache()
     
     return flashcard
 
 
+@router.get("/imports", response_model=List[ImportJobResponse])
+def list_flashcard_imports():
+    """最近的导入任务（进行中的任务可查看进度）"""
+    return [job.to_response() for job in list_import_jobs()]
+
+
+@router.get("/imports/{job_id}", response_model=ImportJobResponse)
+def get_flashcard_import(job_id: str):
+    """查看导入任务进度"""
+    job = get_import_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="导入任务不存在或已过期")
+    return job.to_response()
+
+
 @router.get("/{flashcard_id}", response_model=FlashcardResponse)
 def get_flashcard(flashcard_id: int, session: Session = Depends(get_session)):
     """获取指定的记忆卡片"""
@@ -264,9 +339,7 @@ def update_flashcard(
     session.refresh(flashcard)
     
     # 清理相关缓存
-    invalidate_cache_pattern("stats")
-    invalidate_cache_pattern("categories") 
-    invalidate_cache_pattern("tags")
+    _invalidate_flashcard_cache(set(update_data))
     
     return flashcard
 
@@ -281,120 +354,327 @@ def delete_flashcard(flashcard_id: int, session: Session = Depends(get_session))
     # 使用批量删除优化相关记录删除
     session.exec(
         text("DELETE FROM review_records WHERE flashcard_id = :flashcard_id"),
-        {"flashcard_id": flashcard_id}
+        params={"flashcard_id": flashcard_id}
     )
     
     session.delete(flashcard)
     session.commit()
     
     # 清理相关缓存
-    invalidate_cache_pattern("stats")
-    invalidate_cache_pattern("categories")
-    invalidate_cache_pattern("tags")
+    _invalidate_flashcard_cache()
     
     return {"message": "卡片已删除"}
 
 
-@router.post("/{flashcard_id}/review", response_model=dict)
-def review_flashcard(
-    flashcard_id: int,
-    review_data: ReviewRecordCreate,
-    session: Session = Depends(get_session)
-):
-    """复习记忆卡片（优化版本）"""
-    flashcard = session.get(Flashcard, flashcard_id)
-    if not flashcard:
-        raise HTTPException(status_code=404, detail="卡片未找到")
-    
+# 今日学习统计 UPSERT（新卡片、复习、答对数量累加）
+_UPSERT_STUDY_STATS_SQL = text("""
+    INSERT INTO study_stats (
+        date, new_cards, reviewed_cards, correct_cards, study_time, average_response_time,
+        box_1_count, box_2_count, box_3_count, box_4_count, box_5_count, box_6_count, box_7_count,
+        created_at, updated_at
+    )
+    VALUES (
+        :date, :new_cards, :reviewed_cards, :correct_cards, 0, 0,
+        0, 0, 0, 0, 0, 0, 0,
+        :now, :now
+    )
+    ON CONFLICT (date) DO UPDATE SET
+        new_cards = study_stats.new_cards + :new_cards,
+        reviewed_cards = study_stats.reviewed_cards + :reviewed_cards,
+        correct_cards = study_stats.correct_cards + :correct_cards,
+        updated_at = :now
+""")
+
+# 从计数表同步Leitner盒子统计（主键查找，不扫描卡片表）
+_UPDATE_LEITNER_STATS_SQL = text("""
+    UPDATE study_stats SET
+        box_1_count = COALESCE((SELECT count FROM flashcard_counters WHERE dimension = 'leitner_box' AND value = 'box_1'), 0),
+        box_2_count = COALESCE((SELECT count FROM flashcard_counters WHERE dimension = 'leitner_box' AND value = 'box_2'), 0),
+        box_3_count = COALESCE((SELECT count FROM flashcard_counters WHERE dimension = 'leitner_box' AND value = 'box_3'), 0),
+        box_4_count = COALESCE((SELECT count FROM flashcard_counters WHERE dimension = 'leitner_box' AND value = 'box_4'), 0),
+        box_5_count = COALESCE((SELECT count FROM flashcard_counters WHERE dimension = 'leitner_box' AND value = 'box_5'), 0),
+        box_6_count = COALESCE((SELECT count FROM flashcard_counters WHERE dimension = 'leitner_box' AND value = 'box_6'), 0),
+        box_7_count = COALESCE((SELECT count FROM flashcard_counters WHERE dimension = 'leitner_box' AND value = 'box_7'), 0),
+        updated_at = :now
+    WHERE date = :date
+""")
+
+
+def _review_card(
+    flashcard: Flashcard,
+    difficulty: FlashcardDifficulty,
+    response_time: int,
+    reviewed_at: Optional[datetime] = None
+) -> ReviewRecord:
+    """按间隔重复算法更新卡片，返回对应的复习记录（均未写入数据库）"""
     # 保存复习前的状态
     old_ease_factor = flashcard.ease_factor
     old_interval = flashcard.interval
     old_repetitions = flashcard.repetitions
     old_leitner_box = flashcard.leitner_box
     
-    # 使用间隔重复算法更新卡片
-    updated_flashcard = SpacedRepetitionAlgorithm.update_flashcard_after_review(
-        flashcard, review_data.difficulty, review_data.response_time
+    SpacedRepetitionAlgorithm.update_flashcard_after_review(
+        flashcard, difficulty, response_time, reviewed_at
     )
     
-    # 创建复习记录
-    review_record = ReviewRecord(
-        flashcard_id=flashcard_id,
-        difficulty=review_data.difficulty,
-        response_time=review_data.response_time,
+    return ReviewRecord(
+        flashcard_id=flashcard.id,
+        difficulty=difficulty,
+        response_time=response_time,
         old_ease_factor=old_ease_factor,
         old_interval=old_interval,
         old_repetitions=old_repetitions,
         old_leitner_box=old_leitner_box,
-        new_ease_factor=updated_flashcard.ease_factor,
-        new_interval=updated_flashcard.interval,
-        new_repetitions=updated_flashcard.repetitions,
-        new_leitner_box=updated_flashcard.leitner_box,
-        next_due_date=updated_flashcard.due_date
+        new_ease_factor=flashcard.ease_factor,
+        new_interval=flashcard.interval,
+        new_repetitions=flashcard.repetitions,
+        new_leitner_box=flashcard.leitner_box,
+        reviewed_at=flashcard.last_review,
+        next_due_date=flashcard.due_date
     )
+
+
+def _study_stats_delta(record: ReviewRecord) -> Dict[str, int]:
+    """一次复习对当日学习统计的贡献"""
+    is_new_card = record.old_repetitions == 0
+    is_correct = record.difficulty != FlashcardDifficulty.AGAIN
+    return {
+        "new_cards": 1 if is_new_card else 0,
+        "reviewed_cards": 0 if is_new_card else 1,
+        "correct_cards": 1 if is_correct else 0,
+    }
+
+
+@router.post("/{flashcard_id}/review", response_model=dict)
+def review_flashcard(
+    flashcard_id: int,
+    review_data: ReviewRecordCreate,
+    session: Session = Depends(get_session)
+):
+    """复习记忆卡片（优化版本）"""
+    flashcard = session.get(Flashcard, flashcard_id)
+    if not flashcard:
+        raise HTTPException(status_code=404, detail="卡片未找到")
+    
+    # 使用间隔重复算法更新卡片并创建复习记录
+    review_record = _review_card(flashcard, review_data.difficulty, review_data.response_time)
     
     # 更新今日学习统计 - 使用 UPSERT 优化
     today_str = date.today().isoformat()
-    
-    # 使用原生SQL优化统计更新
-    upsert_stats_query = text("""
-        INSERT INTO study_stats (date, new_cards, reviewed_cards, correct_cards, created_at, updated_at)
-        VALUES (:date, :new_cards, :reviewed_cards, :correct_cards, :now, :now)
-        ON CONFLICT (date) DO UPDATE SET
-            new_cards = study_stats.new_cards + :new_cards,
-            reviewed_cards = study_stats.reviewed_cards + :reviewed_cards,
-            correct_cards = study_stats.correct_cards + :correct_cards,
-            updated_at = :now
-    """)
-    
-    is_new_card = updated_flashcard.status == FlashcardStatus.NEW or old_repetitions == 0
-    is_correct = review_data.difficulty != FlashcardDifficulty.AGAIN
     now = datetime.now(timezone.utc)
     
-    session.exec(upsert_stats_query, {
+    session.exec(_UPSERT_STUDY_STATS_SQL, params={
         "date": today_str,
-        "new_cards": 1 if is_new_card else 0,
-        "reviewed_cards": 0 if is_new_card else 1,
-        "correct_cards": 1 if is_correct else 0,
-        "now": now
+        "now": now,
+        **_study_stats_delta(review_record)
     })
     
-    # 批量更新Leitner盒子统计
-    update_leitner_stats_query = text("""
-        UPDATE study_stats SET
-            box_1_count = (SELECT COUNT(*) FROM flashcards WHERE leitner_box = 'box_1'),
-            box_2_count = (SELECT COUNT(*) FROM flashcards WHERE leitner_box = 'box_2'),
-            box_3_count = (SELECT COUNT(*) FROM flashcards WHERE leitner_box = 'box_3'),
-            box_4_count = (SELECT COUNT(*) FROM flashcards WHERE leitner_box = 'box_4'),
-            box_5_count = (SELECT COUNT(*) FROM flashcards WHERE leitner_box = 'box_5'),
-            box_6_count = (SELECT COUNT(*) FROM flashcards WHERE leitner_box = 'box_6'),
-            box_7_count = (SELECT COUNT(*) FROM flashcards WHERE leitner_box = 'box_7'),
-            updated_at = :now
-        WHERE date = :date
-    """)
+    # 先写入卡片变更，计数表随 flush 更新
+    session.add(flashcard)
+    session.add(review_record)
+    session.flush()
     
-    session.exec(update_leitner_stats_query, {
+    session.exec(_UPDATE_LEITNER_STATS_SQL, params={
         "date": today_str,
         "now": now
     })
     
-    session.add(updated_flashcard)
-    session.add(review_record)
     session.commit()
-    session.refresh(updated_flashcard)
+    session.refresh(flashcard)
     session.refresh(review_record)
     
+    invalidate_cache_tags(FLASHCARDS_TAG, FLASHCARD_SCHEDULE_TAG, STUDY_STATS_TAG)
+    
     return {
-        "flashcard": updated_flashcard,
+        "flashcard": flashcard,
         "review_record": review_record,
-        "next_due_date": updated_flashcard.due_date.isoformat(),
+        "next_due_date": flashcard.due_date.isoformat(),
         "retention_rate": SpacedRepetitionAlgorithm.calculate_retention_rate(
-            updated_flashcard.correct_reviews,
-            updated_flashcard.total_reviews
+            flashcard.correct_reviews,
+            flashcard.total_reviews
+        )
+    }
+
+
+@router.post("/reviews/batch", response_model=BatchReviewResponse)
+def review_flashcards_batch(
+    batch: BatchReviewRequest,
+    session: Session = Depends(get_session)
+):
+    """
+    批量提交复习（如离线复习后同步）
+    
+    按请求顺序在内存中回放每次复习（同一张卡片可复习多次），复习记录批量插入，
+    学习统计按日期汇总后一次写入，全部在同一事务中完成；任一卡片不存在，
+    或复习时间早于卡片当前的最后复习时间（含本批中之前的复习）时整批拒绝。
+    """
+    now = datetime.now(timezone.utc)
+    
+    card_ids = {review.flashcard_id for review in batch.reviews}
+    flashcards = {
+        card.id: card
+        for card in session.exec(select(Flashcard).where(Flashcard.id.in_(card_ids))).all()
+    }
+    missing = sorted(card_ids - flashcards.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"卡片未找到: {', '.join(map(str, missing))}")
+    
+    records = []
+    retention_rates = []
+    stats_deltas: Dict[str, Dict[str, int]] = {}
+    out_of_order = []
+    for position, review in enumerate(batch.reviews, start=1):
+        reviewed_at = review.reviewed_at or now
+        if reviewed_at.tzinfo is None:
+            reviewed_at = reviewed_at.replace(tzinfo=timezone.utc)
+        # 客户端时钟可能偏快，不接受未来时间
+        reviewed_at = min(reviewed_at, now)
+        
+        flashcard = flashcards[review.flashcard_id]
+        # 早于最后一次复习的离线记录会把排程回退到旧状态，不能按顺序回放
+        last_review = flashcard.last_review
+        if last_review is not None and last_review.tzinfo is None:
+            last_review = last_review.replace(tzinfo=timezone.utc)
+        if last_review is not None and reviewed_at < last_review:
+            out_of_order.append(f"第 {position} 条（卡片 {review.flashcard_id}）")
+            continue
+        
+        records.append(_review_card(flashcard, review.difficulty, review.response_time, reviewed_at))
+        retention_rates.append(SpacedRepetitionAlgorithm.calculate_retention_rate(
+            flashcard.correct_reviews,
+            flashcard.total_reviews
+        ))
+        
+        # 与单次复习一致，统计日期按服务器本地日期计算
+        day = stats_deltas.setdefault(reviewed_at.astimezone().date().isoformat(), {
+            "new_cards": 0, "reviewed_cards": 0, "correct_cards": 0
+        })
+        for field, delta in _study_stats_delta(records[-1]).items():
+            day[field] += delta
+    
+    if out_of_order:
+        raise HTTPException(
+            status_code=400,
+            detail=f"复习时间早于卡片最后复习时间: {', '.join(out_of_order)}"
+        )
+    
+    session.exec(_UPSERT_STUDY_STATS_SQL, params=[
+        {"date": day, "now": now, **delta} for day, delta in sorted(stats_deltas.items())
+    ])
+    
+    # 卡片更新在一次 flush 中批量执行，计数表随 flush 更新
+    session.add_all(flashcards.values())
+    session.flush()
+    
+    # 复习记录用多行 INSERT 批量写入；返回的ID按参数顺序排列，与记录一一对应
+    record_ids = session.execute(
+        insert(ReviewRecord).returning(ReviewRecord.id, sort_by_parameter_order=True),
+        [record.model_dump(exclude={"id"}) for record in records]
+    ).scalars().all()
+    for record, record_id in zip(records, record_ids):
+        record.id = record_id
+    
+    # 盒子分布是当前快照，只写入最近一天的统计
+    session.exec(_UPDATE_LEITNER_STATS_SQL, params={
+        "date": max(stats_deltas),
+        "now": now
+    })
+    
+    # 提交后卡片会过期，先生成响应
+    response = BatchReviewResponse(results=[
+        BatchReviewResult(
+            review_record=ReviewRecordResponse.model_validate(record),
+            next_due_date=record.next_due_date,
+            retention_rate=retention_rate
         )
+        for record, retention_rate in zip(records, retention_rates)
+    ])
+    
+    session.commit()
+    
+    invalidate_cache_tags(FLASHCARDS_TAG, FLASHCARD_SCHEDULE_TAG, STUDY_STATS_TAG)
+    
+    return response
+
+
+@router.post("/study-sessions", response_model=StudySessionResponse)
+def create_study_session(
+    options: StudySessionCreate,
+    session: Session = Depends(get_session)
+):
+    """创建学习会话：一次性取出今日要学习的卡片（复习卡片在前，新卡片在后）"""
+    _require_study_sessions()
+    queue = create_study_queue(session, options.max_new, options.max_review)
+    return StudySessionResponse(
+        session_id=queue.session_id,
+        new_cards=queue.new_cards,
+        review_cards=queue.review_cards,
+        remaining=queue.remaining
+    )
+
+
+def _require_study_sessions() -> None:
+    if not STUDY_SESSIONS_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="学习会话需要共享缓存后端（API_CACHE_BACKEND=sqlite），当前部署不可用"
+        )
+
+
+def _get_study_queue(session_id: str) -> StudyQueue:
+    _require_study_sessions()
+    queue = get_study_queue(session_id)
+    if queue is None:
+        raise HTTPException(status_code=404, detail="学习会话不存在或已过期")
+    return queue
+
+
+@router.get("/study-sessions/{session_id}/next", response_model=StudyQueueResponse)
+def get_study_session_next(
+    session_id: str,
+    count: int = Query(1, ge=1, le=50, description="返回的卡片数（用于预取）"),
+    session: Session = Depends(get_session)
+):
+    """学习会话中接下来的卡片，附带各答案对应的复习安排"""
+    queue = _get_study_queue(session_id)
+    cards = queue.peek(session, count)
+    save_study_queue(queue)
+    return StudyQueueResponse(remaining=queue.remaining, cards=cards)
+
+
+@router.post("/study-sessions/{session_id}/answer", response_model=dict)
+def answer_study_session(
+    session_id: str,
+    answer: StudyAnswer,
+    session: Session = Depends(get_session)
+):
+    """提交学习会话中一张卡片的答案，返回复习结果与下一张卡片"""
+    queue = _get_study_queue(session_id)
+    if answer.flashcard_id not in queue:
+        raise HTTPException(status_code=400, detail="卡片不在该学习会话的队列中")
+    result = review_flashcard(
+        answer.flashcard_id,
+        ReviewRecordCreate(**answer.model_dump()),
+        session
+    )
+    queue.discard(answer.flashcard_id)
+    next_cards = queue.peek(session, 1)
+    save_study_queue(queue)
+    return {
+        **result,
+        "remaining": queue.remaining,
+        "next_card": next_cards[0] if next_cards else None
     }
 
 
+@router.delete("/study-sessions/{session_id}")
+def delete_study_session(session_id: str):
+    """结束学习会话"""
+    if not delete_study_queue(session_id):
+        raise HTTPException(status_code=404, detail="学习会话不存在或已过期")
+    return {"message": "学习会话已结束"}
+
+
 @router.get("/{flashcard_id}/reviews", response_model=List[ReviewRecordResponse])
 def get_flashcard_reviews(
     flashcard_id: int,
@@ -480,8 +760,35 @@ def batch_import_flashcards(
     for card in created_cards:
         session.refresh(card)
     
+    _invalidate_flashcard_cache()
+    
     return {
         "message": f"成功导入 {len(created_cards)} 张卡片",
         "imported_count": len(created_cards),
         "cards": created_cards[:10]  # 只返回前10张卡片预览
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/import", response_model=ImportJobResponse)
+async def import_flashcards(
+    request: Request,
+    import_format: Optional[ImportFormat] = Query(None, alias="format", description="ndjson 或 csv，默认按 Content-Type 判断"),
+    chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=100, le=10000, description="每批写入的卡片数")
+):
+    """
+    流式导入记忆卡片（不限数量）
+    
+    请求体为 NDJSON（每行一个卡片对象）或带表头的 CSV（列名同卡片字段，至少包含 front、back），
+    边接收边解析，分批写入并提交。校验失败的行跳过并在结果中列出；
+    导入过程中可通过 GET /flashcards/imports 查看进度。
+    """
+    import_format = import_format or detect_import_format(request.headers.get("content-type"))
+    if import_format is None:
+        raise HTTPException(
+            status_code=415,
+            detail="请通过 format 参数或 Content-Type（application/x-ndjson、text/csv）指定格式"
+        )
+    
+    job = create_import_job(import_format)
+    await import_stream(job, request.stream(), chunk_size, on_commit=_invalidate_flashcard_cache)
+    return job.to_response()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlmodel import Session, select, func, and_
 from typing import List, Optional
 from datetime import datetime, date
@@ -8,9 +8,13 @@ from ..models.pomodoro import (
     PomodoroSession, PomodoroSessionCreate, PomodoroSessionUpdate, PomodoroSessionResponse,
     FocusStats, FocusStatsResponse, PomodoroStatus
 )
+from ..services.pagination import Keyset, set_next_cursor
 
 router = APIRouter(tags=["Pomodoro"])
 
+# 会话列表排序：开始时间倒序，id 保证顺序唯一
+SESSIONS_KEYSET = Keyset((PomodoroSession.started_at, True), (PomodoroSession.id, True))
+
 @router.post("/sessions/", response_model=PomodoroSessionResponse)
 def create_session(
     session_data: PomodoroSessionCreate,
@@ -25,8 +29,10 @@ def create_session(
 
 @router.get("/sessions/", response_model=List[PomodoroSessionResponse])
 def get_sessions(
+    response: Response,
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页响应头 X-Next-Cursor），提供时忽略 skip"),
     date_filter: Optional[str] = Query(None, description="按日期过滤 (YYYY-MM-DD)"),
     todo_id: Optional[int] = Query(None, description="按任务ID过滤"),
     db: Session = Depends(get_db_session)
@@ -46,8 +52,9 @@ def get_sessions(
     if todo_id is not None:
         query = query.where(PomodoroSession.todo_id == todo_id)
     
-    query = query.offset(skip).limit(limit).order_by(PomodoroSession.started_at.desc())
-    sessions = db.exec(query).all()
+    query = SESSIONS_KEYSET.apply(query, cursor=cursor, skip=skip, limit=limit)
+    sessions, next_cursor = SESSIONS_KEYSET.page(db.exec(query).all(), limit)
+    set_next_cursor(response, next_cursor)
     return sessions
 
 # 先定义具体路径的路由
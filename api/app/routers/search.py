@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
+
+from app.database import get_async_session
+from app.models.search import SearchResponse, SearchResult
+from app.services.search import (
+    SEARCH_ENTITIES, make_snippet, parse_query, search_params, search_statement
+)
+
+router = APIRouter()
+
+@router.get("/", response_model=SearchResponse, summary="全文搜索")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="搜索关键词，多个关键词用空格分隔（同时匹配）"),
+    types: Optional[str] = Query(None, description="限定类型（逗号分隔）：note、flashcard、tool、command"),
+    skip: int = Query(0, ge=0, le=1000, description="跳过的记录数"),
+    limit: int = Query(20, ge=1, le=100, description="返回的记录数"),
+    session: AsyncSession = Depends(get_async_session)
+) -> SearchResponse:
+    """在笔记、记忆卡片、工具、命令中搜索，按相关度排序并返回匹配片段"""
+    entity_types = [t.strip() for t in types.split(",") if t.strip()] if types else []
+    unknown = [t for t in entity_types if t not in SEARCH_ENTITIES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的搜索类型: {', '.join(unknown)}")
+
+    terms = parse_query(q)
+    statement, fallback = search_statement(terms, entity_types)
+    params = {**search_params(q, terms, fallback), "limit": limit, "offset": skip}
+    if entity_types:
+        params["entity_types"] = entity_types
+
+    rows = (await session.exec(statement, params=params)).all()
+    return SearchResponse(
+        query=q,
+        fallback=fallback,
+        results=[
+            SearchResult(
+                type=row.entity_type,
+                id=row.entity_id,
+                title=row.title,
+                snippet=make_snippet(row.body, q),
+                score=round(float(row.score), 4),
+            )
+            for row in rows
+        ],
+    )
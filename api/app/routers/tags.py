@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+
+from app.database import get_async_session
+from app.models.tag import TagCountResponse
+from app.services.tags import TAGGED_ENTITIES, tag_counts_query
+
+router = APIRouter()
+
+@router.get("/", response_model=List[TagCountResponse], summary="标签统计")
+async def get_tag_counts(
+    type: Optional[str] = Query(None, description="限定实体类型：note、flashcard、tool、command，不指定为全部合计"),
+    prefix: Optional[str] = Query(None, max_length=100, description="标签前缀（自动补全）"),
+    limit: int = Query(50, ge=1, le=500, description="返回的标签数"),
+    session: AsyncSession = Depends(get_async_session)
+) -> List[TagCountResponse]:
+    """按使用次数倒序返回标签，用于标签云和自动补全"""
+    if type is not None and type not in TAGGED_ENTITIES:
+        raise HTTPException(status_code=400, detail=f"未知的实体类型: {type}")
+
+    rows = (await session.exec(tag_counts_query(type, prefix).limit(limit))).all()
+    return [TagCountResponse(name=row.name, count=row.count) for row in rows]
@@ -1,33 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
-from app.database import get_session
+from app.database import get_async_session
 from app.models.todo import Todo, TodoCreate, TodoUpdate, TodoResponse, TodoPriority
+from app.services.pagination import Keyset, set_next_cursor
 
 router = APIRouter()
 
+# 列表排序：创建时间倒序，id 保证顺序唯一
+TODOS_KEYSET = Keyset((Todo.created_at, True), (Todo.id, True))
+
 @router.post("/", response_model=TodoResponse, summary="创建新的 Todo")
 async def create_todo(
     todo: TodoCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TodoResponse:
     """创建新的 Todo 项"""
     db_todo = Todo.model_validate(todo)
     session.add(db_todo)
-    session.commit()
-    session.refresh(db_todo)
+    await session.commit()
+    await session.refresh(db_todo)
     return TodoResponse.model_validate(db_todo)
 
 @router.get("/", response_model=List[TodoResponse], summary="获取 Todo 列表")
 async def get_todos(
+    response: Response,
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页响应头 X-Next-Cursor），提供时忽略 skip"),
     priority: Optional[TodoPriority] = Query(None, description="按优先级过滤"),
     is_completed: Optional[bool] = Query(None, description="按完成状态过滤"),
     search: Optional[str] = Query(None, description="搜索内容"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> List[TodoResponse]:
     """获取 Todo 列表，支持分页、过滤和搜索"""
     query = select(Todo)
@@ -38,24 +45,22 @@ async def get_todos(
     if is_completed is not None:
         query = query.where(Todo.is_completed == is_completed)
     if search is not None:
-        query = query.where(Todo.content.contains(search))
-    
-    # 按创建时间倒序排列
-    query = query.order_by(Todo.created_at.desc())
+        query = query.where(Todo.content.contains(search, autoescape=True))
     
-    # 应用分页
-    query = query.offset(skip).limit(limit)
+    # 按创建时间倒序排列并分页
+    query = TODOS_KEYSET.apply(query, cursor=cursor, skip=skip, limit=limit)
     
-    todos = session.exec(query).all()
+    todos, next_cursor = TODOS_KEYSET.page((await session.exec(query)).all(), limit)
+    set_next_cursor(response, next_cursor)
     return [TodoResponse.model_validate(todo) for todo in todos]
 
 @router.get("/{todo_id}", response_model=TodoResponse, summary="获取单个 Todo")
 async def get_todo(
     todo_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TodoResponse:
     """根据 ID 获取单个 Todo"""
-    todo = session.get(Todo, todo_id)
+    todo = await session.get(Todo, todo_id)
     if not todo:
         raise HTTPException(status_code=404, detail="Todo 不存在")
     return TodoResponse.model_validate(todo)
@@ -64,10 +69,10 @@ async def get_todo(
 async def update_todo(
     todo_id: int,
     todo_update: TodoUpdate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TodoResponse:
     """更新 Todo 项"""
-    db_todo = session.get(Todo, todo_id)
+    db_todo = await session.get(Todo, todo_id)
     if not db_todo:
         raise HTTPException(status_code=404, detail="Todo 不存在")
     
@@ -80,33 +85,33 @@ async def update_todo(
     db_todo.updated_at = datetime.utcnow()
     
     session.add(db_todo)
-    session.commit()
-    session.refresh(db_todo)
+    await session.commit()
+    await session.refresh(db_todo)
     
     return TodoResponse.model_validate(db_todo)
 
 @router.delete("/{todo_id}", summary="删除 Todo")
 async def delete_todo(
     todo_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> dict:
     """删除 Todo 项"""
-    todo = session.get(Todo, todo_id)
+    todo = await session.get(Todo, todo_id)
     if not todo:
         raise HTTPException(status_code=404, detail="Todo 不存在")
     
-    session.delete(todo)
-    session.commit()
+    await session.delete(todo)
+    await session.commit()
     
     return {"message": "Todo 已删除"}
 
 @router.patch("/{todo_id}/toggle", response_model=TodoResponse, summary="切换 Todo 完成状态")
 async def toggle_todo_completion(
     todo_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TodoResponse:
     """切换 Todo 的完成状态"""
-    db_todo = session.get(Todo, todo_id)
+    db_todo = await session.get(Todo, todo_id)
     if not db_todo:
         raise HTTPException(status_code=404, detail="Todo 不存在")
     
@@ -116,7 +121,7 @@ async def toggle_todo_completion(
     db_todo.updated_at = datetime.utcnow()
     
     session.add(db_todo)
-    session.commit()
-    session.refresh(db_todo)
+    await session.commit()
+    await session.refresh(db_todo)
     
     return TodoResponse.model_validate(db_todo)
\ No newline at end of file
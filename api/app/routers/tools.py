@@ -1,74 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
-from app.database import get_session
+from app.database import get_async_session
 from app.models.tool import Tool, ToolCreate, ToolUpdate, ToolResponse, ToolType
+from app.services.pagination import Keyset, set_next_cursor
+from app.services.search import search_filter
+from app.services.tags import TagMatch, tag_filter, tag_names_query
 
 router = APIRouter()
 
+# 列表排序：更新时间倒序，id 保证顺序唯一
+TOOLS_KEYSET = Keyset((Tool.updated_at, True), (Tool.id, True))
+
 @router.post("/", response_model=ToolResponse, summary="创建新工具")
 async def create_tool(
     tool: ToolCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> ToolResponse:
     """创建新工具"""
     db_tool = Tool.model_validate(tool)
     session.add(db_tool)
-    session.commit()
-    session.refresh(db_tool)
+    await session.commit()
+    await session.refresh(db_tool)
     return ToolResponse.model_validate(db_tool)
 
 @router.get("/", response_model=List[ToolResponse], summary="获取工具列表")
 async def get_tools(
+    response: Response,
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页响应头 X-Next-Cursor），提供时忽略 skip"),
     search: Optional[str] = Query(None, description="搜索关键词（标题或描述）"),
     tags: Optional[str] = Query(None, description="标签过滤（逗号分隔）"),
+    tags_mode: TagMatch = Query(TagMatch.ALL, description="多个标签的匹配方式：all 全部包含，any 包含任一"),
     tool_type: Optional[ToolType] = Query(None, description="工具类型过滤"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> List[ToolResponse]:
     """获取工具列表，支持搜索和过滤"""
     query = select(Tool)
     
     # 搜索功能
     if search:
-        search_term = f"%{search}%"
         query = query.where(
-            or_(
-                Tool.title.ilike(search_term),
-                Tool.description.ilike(search_term),
-                Tool.system_prompt.ilike(search_term)
-            )
+            search_filter("tool", search, [Tool.title, Tool.description, Tool.system_prompt])
         )
     
     # 标签过滤
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
-        for tag in tag_list:
-            query = query.where(Tool.tags.ilike(f"%{tag}%"))
+    tag_condition = tag_filter("tool", tags, match_all=tags_mode == TagMatch.ALL)
+    if tag_condition is not None:
+        query = query.where(tag_condition)
     
     # 工具类型过滤
     if tool_type is not None:
         query = query.where(Tool.type == tool_type)
     
-    # 按更新时间倒序排列
-    query = query.order_by(Tool.updated_at.desc())
-    
-    # 应用分页
-    query = query.offset(skip).limit(limit)
+    # 按更新时间倒序排列并分页
+    query = TOOLS_KEYSET.apply(query, cursor=cursor, skip=skip, limit=limit)
     
-    tools = session.exec(query).all()
+    tools, next_cursor = TOOLS_KEYSET.page((await session.exec(query)).all(), limit)
+    set_next_cursor(response, next_cursor)
     return [ToolResponse.model_validate(tool) for tool in tools]
 
 @router.get("/{tool_id}", response_model=ToolResponse, summary="获取单个工具")
 async def get_tool(
     tool_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> ToolResponse:
     """根据ID获取单个工具"""
-    tool = session.get(Tool, tool_id)
+    tool = await session.get(Tool, tool_id)
     if not tool:
         raise HTTPException(status_code=404, detail="工具不存在")
     return ToolResponse.model_validate(tool)
@@ -77,10 +79,10 @@ async def get_tool(
 async def update_tool(
     tool_id: int,
     tool_update: ToolUpdate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> ToolResponse:
     """更新工具"""
-    db_tool = session.get(Tool, tool_id)
+    db_tool = await session.get(Tool, tool_id)
     if not db_tool:
         raise HTTPException(status_code=404, detail="工具不存在")
     
@@ -93,42 +95,32 @@ async def update_tool(
     db_tool.updated_at = datetime.utcnow()
     
     session.add(db_tool)
-    session.commit()
-    session.refresh(db_tool)
+    await session.commit()
+    await session.refresh(db_tool)
     
     return ToolResponse.model_validate(db_tool)
 
 @router.delete("/{tool_id}", summary="删除工具")
 async def delete_tool(
     tool_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> dict:
     """删除工具"""
-    tool = session.get(Tool, tool_id)
+    tool = await session.get(Tool, tool_id)
     if not tool:
         raise HTTPException(status_code=404, detail="工具不存在")
     
-    session.delete(tool)
-    session.commit()
+    await session.delete(tool)
+    await session.commit()
     
     return {"message": "工具已删除"}
 
 @router.get("/tags/", response_model=List[str], summary="获取所有标签")
 async def get_all_tags(
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> List[str]:
     """获取所有已使用的标签"""
-    tools = session.exec(select(Tool.tags)).all()
-    tags = set()
-    
-    for tool_tags in tools:
-        if tool_tags:
-            for tag in tool_tags.split(","):
-                tag = tag.strip()
-                if tag:
-                    tags.add(tag)
-    
-    return sorted(list(tags))
+    return list((await session.exec(tag_names_query("tool"))).all())
 
 @router.get("/types/", response_model=List[str], summary="获取所有工具类型")
 async def get_tool_types() -> List[str]:
@@ -0,0 +1,342 @@
+"""
+批量调度引擎
+
+SpacedRepetitionAlgorithm 的 NumPy 向量化版本：对一组卡片同时计算复习后的难易度、
+间隔、重复次数、Leitner 盒子、到期时间和统计字段，结果与逐张调用
+update_flashcard_after_review 完全一致。
+
+用于修改 DIFFICULTY_MULTIPLIERS / LEITNER_INTERVALS 后重新排程，以及数据损坏后
+按 review_records 重放全部复习历史重建卡片状态（见 replay_review_histories）。
+常量在每次计算时从 SpacedRepetitionAlgorithm 读取。
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from ..models.flashcard import (
+    Flashcard, FlashcardDifficulty, FlashcardStatus, LeitnerBox, ReviewRecord
+)
+from .flashcard_counters import rebuild_counters
+from .spaced_repetition import SpacedRepetitionAlgorithm
+
+logger = logging.getLogger(__name__)
+
+# 枚举 <-> 整数编码（按枚举定义顺序）
+DIFFICULTIES: List[FlashcardDifficulty] = list(FlashcardDifficulty)
+STATUSES: List[FlashcardStatus] = list(FlashcardStatus)
+BOXES: List[LeitnerBox] = list(LeitnerBox)
+
+_AGAIN = DIFFICULTIES.index(FlashcardDifficulty.AGAIN)
+_HARD = DIFFICULTIES.index(FlashcardDifficulty.HARD)
+_GOOD = DIFFICULTIES.index(FlashcardDifficulty.GOOD)
+_EASY = DIFFICULTIES.index(FlashcardDifficulty.EASY)
+
+_NEW = STATUSES.index(FlashcardStatus.NEW)
+_LEARNING = STATUSES.index(FlashcardStatus.LEARNING)
+_REVIEWING = STATUSES.index(FlashcardStatus.REVIEWING)
+_RELEARNING = STATUSES.index(FlashcardStatus.RELEARNING)
+
+# 人工设置的状态，重建时保留
+MANUAL_STATUSES = (FlashcardStatus.SUSPENDED, FlashcardStatus.BURIED)
+
+_DAY = np.timedelta64(1, "D").astype("timedelta64[us]")
+
+
+def encode(members: Sequence, values: Iterable) -> np.ndarray:
+    """枚举序列 -> 整数编码数组"""
+    codes = {member: code for code, member in enumerate(members)}
+    return np.fromiter((codes[value] for value in values), dtype=np.int8)
+
+
+def to_datetime64(values: Iterable[Optional[datetime]]) -> np.ndarray:
+    """datetime 序列 -> datetime64[us]（UTC，None 为 NaT）"""
+    def naive_utc(value):
+        if value is None:
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    return np.array([naive_utc(value) for value in values], dtype="datetime64[us]")
+
+
+def from_datetime64(values: np.ndarray) -> List[Optional[datetime]]:
+    """datetime64[us] -> 带 UTC 时区的 datetime 列表（NaT 为 None）"""
+    return [
+        None if value is None else value.replace(tzinfo=timezone.utc)
+        for value in values.astype("datetime64[us]").tolist()
+    ]
+
+
+class CardStates:
+    """一组卡片的调度状态（按列保存，枚举字段为整数编码）"""
+
+    INT_FIELDS = (
+        "interval", "repetitions", "leitner_box", "status",
+        "total_reviews", "correct_reviews", "streak", "max_streak",
+    )
+    FIELDS = ("ease_factor",) + INT_FIELDS + ("due_date", "last_review")
+
+    def __init__(self, **arrays: np.ndarray):
+        self.ease_factor = np.asarray(arrays["ease_factor"], dtype=np.float64)
+        for field in self.INT_FIELDS:
+            setattr(self, field, np.asarray(arrays[field], dtype=np.int64))
+        self.due_date = np.asarray(arrays["due_date"], dtype="datetime64[us]")
+        self.last_review = np.asarray(arrays["last_review"], dtype="datetime64[us]")
+
+    def __len__(self) -> int:
+        return len(self.ease_factor)
+
+    @classmethod
+    def new(cls, n: int) -> "CardStates":
+        """n 张新卡片（与 Flashcard 的字段默认值一致，到期时间未设置）"""
+        return cls(
+            ease_factor=np.full(n, 2.5),
+            interval=np.ones(n),
+            repetitions=np.zeros(n),
+            leitner_box=np.full(n, BOXES.index(LeitnerBox.BOX_1)),
+            status=np.full(n, _NEW),
+            total_reviews=np.zeros(n),
+            correct_reviews=np.zeros(n),
+            streak=np.zeros(n),
+            max_streak=np.zeros(n),
+            due_date=np.full(n, np.datetime64("NaT", "us")),
+            last_review=np.full(n, np.datetime64("NaT", "us")),
+        )
+
+    @classmethod
+    def from_cards(cls, cards: Sequence) -> "CardStates":
+        """由卡片对象（或带同名属性的行）构建"""
+        arrays = {
+            field: [getattr(card, field) for card in cards]
+            for field in ("ease_factor", "interval", "repetitions", "total_reviews",
+                          "correct_reviews", "streak", "max_streak")
+        }
+        return cls(
+            **arrays,
+            leitner_box=encode(BOXES, (card.leitner_box for card in cards)),
+            status=encode(STATUSES, (card.status for card in cards)),
+            due_date=to_datetime64(card.due_date for card in cards),
+            last_review=to_datetime64(card.last_review for card in cards),
+        )
+
+    def copy(self) -> "CardStates":
+        return CardStates(**{field: getattr(self, field).copy() for field in self.FIELDS})
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """转为字段字典列表（枚举字段还原为枚举，时间带 UTC 时区）"""
+        columns = {
+            field: getattr(self, field)[start:stop].tolist()
+            for field in ("ease_factor",) + self.INT_FIELDS
+        }
+        columns["leitner_box"] = [BOXES[code] for code in columns["leitner_box"]]
+        columns["status"] = [STATUSES[code] for code in columns["status"]]
+        columns["due_date"] = from_datetime64(self.due_date[start:stop])
+        columns["last_review"] = from_datetime64(self.last_review[start:stop])
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def review(states: CardStates, index: np.ndarray, difficulty: np.ndarray, reviewed_at: np.ndarray) -> None:
+    """
+    对 states 中位于 index 的卡片各应用一次复习（原地更新）
+
+    Args:
+        index: 卡片位置数组（不能重复）或切片
+        difficulty: 难度编码（DIFFICULTIES 中的位置）
+        reviewed_at: 复习时间 datetime64[us]
+    """
+    multipliers = np.array([SpacedRepetitionAlgorithm.DIFFICULTY_MULTIPLIERS[d] for d in DIFFICULTIES])
+    leitner_days = np.array([SpacedRepetitionAlgorithm.LEITNER_INTERVALS[b] for b in BOXES], dtype=np.int64)
+    top_box = len(BOXES) - 1
+
+    ease_factor = states.ease_factor[index]
+    interval = states.interval[index]
+    repetitions = states.repetitions[index]
+    box = states.leitner_box[index]
+    status = states.status[index]
+
+    again = difficulty == _AGAIN
+    hard = difficulty == _HARD
+    good = difficulty == _GOOD
+    easy = difficulty == _EASY
+
+    # calculate_ebbinghaus_schedule
+    new_ease_factor = np.maximum(1.3, ease_factor + multipliers[difficulty])
+    new_repetitions = np.where(again, 0, repetitions + 1)
+    sm2 = np.ceil(interval * new_ease_factor)
+    sm2 = np.where(hard, np.maximum(1, np.ceil(sm2 * 0.8)), sm2)
+    sm2 = np.where(easy, np.ceil(sm2 * 1.3), sm2)
+    new_interval = np.where(
+        again | (new_repetitions == 1), 1,
+        np.where(new_repetitions == 2, 6, sm2)
+    )
+    new_interval = np.minimum(new_interval, 365).astype(np.int64)
+
+    # calculate_leitner_box（使用复习前的重复次数）
+    new_box = np.where(
+        again, 0,
+        np.where(
+            hard, np.where((box > 0) & (repetitions < 3), box - 1, box),
+            np.minimum(box + np.where(good, 1, 2), top_box)
+        )
+    )
+
+    # 取两种算法中较长的间隔
+    final_interval = np.maximum(new_interval, leitner_days[new_box])
+
+    streak = np.where(again, 0, states.streak[index] + 1)
+
+    # 状态转换
+    new_status = status.copy()
+    new_status[status == _NEW] = _LEARNING
+    new_status[again & (status == _REVIEWING)] = _RELEARNING
+    new_status[(status == _LEARNING) & (new_repetitions >= 2)] = _REVIEWING
+    new_status[(status == _RELEARNING) & (new_repetitions >= 1)] = _REVIEWING
+
+    states.ease_factor[index] = new_ease_factor
+    states.interval[index] = final_interval
+    states.repetitions[index] = new_repetitions
+    states.leitner_box[index] = new_box
+    states.status[index] = new_status
+    states.due_date[index] = reviewed_at + final_interval * _DAY
+    states.last_review[index] = reviewed_at
+    states.total_reviews[index] += 1
+    states.correct_reviews[index] += ~again
+    states.streak[index] = streak
+    states.max_streak[index] = np.maximum(states.max_streak[index], streak)
+
+
+def _is_chronological(card_index: np.ndarray, reviewed_at: np.ndarray) -> bool:
+    """记录是否已按卡片、时间排序"""
+    same_card = card_index[1:] == card_index[:-1]
+    return bool(
+        np.all(card_index[1:] >= card_index[:-1])
+        and np.all(reviewed_at[1:][same_card] >= reviewed_at[:-1][same_card])
+    )
+
+
+def replay(states: CardStates, card_index: np.ndarray, difficulty: np.ndarray, reviewed_at: np.ndarray) -> None:
+    """
+    按时间顺序把复习历史重放到 states 上（原地更新）
+
+    第 k 轮同时处理每张卡片的第 k 次复习，轮数等于单张卡片的最大复习次数。
+
+    Args:
+        card_index: 每条复习记录对应的卡片位置
+        difficulty: 难度编码
+        reviewed_at: 复习时间 datetime64[us]；同一卡片同一时间的记录按输入顺序
+    """
+    if len(card_index) == 0:
+        return
+    # 按卡片、时间排序（已排好序时跳过，如 load_review_history 的结果），
+    # 算出每条记录是所属卡片的第几次复习
+    if _is_chronological(card_index, reviewed_at):
+        order = np.arange(len(card_index))
+    else:
+        order = np.lexsort((reviewed_at, card_index))
+    sorted_cards = card_index[order]
+    counts = np.bincount(sorted_cards, minlength=len(states))
+    rank = np.arange(len(order)) - (np.cumsum(counts) - counts)[sorted_cards]
+
+    # 卡片按复习次数倒序重排后，第 k 轮要处理的正好是前 n_k 张卡片，
+    # 每轮只对连续切片做运算，不需要逐轮按下标收集和写回；
+    # 记录在第 k 轮中的位置就是卡片重排后的位置，直接计算，无需再排序
+    card_order = np.argsort(-counts, kind="stable")
+    position = np.empty_like(card_order)
+    position[card_order] = np.arange(len(card_order))
+    per_round = np.bincount(rank)
+    destination = (np.cumsum(per_round) - per_round)[rank] + position[sorted_cards]
+    by_round = np.empty_like(order)
+    by_round[destination] = order
+    difficulty = difficulty[by_round]
+    reviewed_at = reviewed_at[by_round]
+
+    permuted = CardStates(**{field: getattr(states, field)[card_order] for field in CardStates.FIELDS})
+    offset = 0
+    for cards in per_round.tolist():
+        review(
+            permuted, slice(0, cards),
+            difficulty[offset:offset + cards], reviewed_at[offset:offset + cards]
+        )
+        offset += cards
+    for field in CardStates.FIELDS:
+        getattr(states, field)[card_order] = getattr(permuted, field)
+
+
+# ==================== 数据库 ====================
+
+def load_review_history(session: Session, batch_size: int = 100_000) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """读取全部复习记录，返回 (flashcard_id, 难度编码, 复习时间)，按卡片、时间、记录ID排序"""
+    query = select(ReviewRecord.flashcard_id, ReviewRecord.difficulty, ReviewRecord.reviewed_at).order_by(
+        ReviewRecord.flashcard_id, ReviewRecord.reviewed_at, ReviewRecord.id
+    ).execution_options(yield_per=batch_size)
+
+    card_ids: List[np.ndarray] = []
+    difficulties: List[np.ndarray] = []
+    reviewed_at: List[np.ndarray] = []
+    for rows in session.exec(query).partitions():
+        ids, difficulty, times = zip(*rows)
+        card_ids.append(np.array(ids, dtype=np.int64))
+        difficulties.append(encode(DIFFICULTIES, difficulty))
+        reviewed_at.append(to_datetime64(times))
+    if not card_ids:
+        return np.empty(0, np.int64), np.empty(0, np.int8), np.empty(0, "datetime64[us]")
+    return np.concatenate(card_ids), np.concatenate(difficulties), np.concatenate(reviewed_at)
+
+
+def write_card_states(session: Session, card_ids: np.ndarray, states: CardStates, chunk_size: int = 5000) -> None:
+    """按卡片ID分块批量 UPDATE 调度字段（在调用方的事务中执行，不维护计数表）"""
+    table = Flashcard.__table__
+    statement = update(table).where(table.c.id == bindparam("_id")).values(
+        **{field: bindparam(field) for field in CardStates.FIELDS},
+        updated_at=bindparam("updated_at")
+    )
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(card_ids), chunk_size):
+        rows = states.rows(start, start + chunk_size)
+        for card_id, row in zip(card_ids[start:start + chunk_size].tolist(), rows):
+            row["_id"] = card_id
+            row["updated_at"] = now
+        session.execute(statement, rows)
+
+
+def replay_review_histories(session: Session, chunk_size: int = 5000) -> int:
+    """
+    按 review_records 重放全部复习历史，重建有复习记录的卡片的调度状态
+
+    卡片从新卡片的默认状态开始依次应用每次复习；暂停 / 搁置的卡片保留原状态。
+    写回后重建计数表，不提交事务。返回更新的卡片数量。
+    """
+    history_ids, difficulty, reviewed_at = load_review_history(session)
+    card_ids, card_index = np.unique(history_ids, return_inverse=True)
+    if len(card_ids) == 0:
+        return 0
+
+    states = CardStates.new(len(card_ids))
+    replay(states, card_index, difficulty, reviewed_at)
+
+    manual = session.exec(
+        select(Flashcard.id, Flashcard.status).where(Flashcard.status.in_(MANUAL_STATUSES))
+    ).all()
+    if manual:
+        manual_ids = np.array([row.id for row in manual], dtype=np.int64)
+        positions = np.searchsorted(card_ids, manual_ids)
+        found = (positions < len(card_ids)) & (card_ids[np.minimum(positions, len(card_ids) - 1)] == manual_ids)
+        states.status[positions[found]] = encode(STATUSES, (row.status for row in manual))[found]
+
+    # 复习记录可能引用已删除的卡片（删除卡片时会一并删除其记录，这里只是防御）
+    existing = np.array(session.exec(select(Flashcard.id).order_by(Flashcard.id)).all(), dtype=np.int64)
+    keep = np.isin(card_ids, existing)
+    if not keep.all():
+        logger.warning("跳过 %d 张不存在的卡片的复习记录", int((~keep).sum()))
+        card_ids = card_ids[keep]
+        states = CardStates(**{field: getattr(states, field)[keep] for field in CardStates.FIELDS})
+
+    write_card_states(session, card_ids, states, chunk_size)
+    rebuild_counters(session)
+    return len(card_ids)
@@ -0,0 +1,202 @@
+"""
+卡片计数维护
+
+卡片数量按状态、Leitner 盒子等维度保存在 flashcard_counters 表中（见 FlashcardCounter）。
+ORM 写入（创建、修改、复习、删除）在 flush 前由会话事件计算增量，并在同一事务中累加到计数表；
+绕过 ORM 的批量写入需要自行调用 apply_counter_deltas。
+
+修改和删除的增量以写事务中锁定后读到的数据库当前值为基准，而不是请求早先读到的值：
+同一张卡片的并发复习各自只减去提交时数据库中的旧值，计数不会漂移。
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import Session
+from sqlmodel import select, text
+
+from ..models.flashcard import Flashcard, FlashcardCounter, FlashcardStatus, LeitnerBox
+
+logger = logging.getLogger(__name__)
+
+CounterKey = Tuple[str, str]
+# 计数键 -> [数量增量, 累加值增量]
+CounterDeltas = Dict[CounterKey, list]
+
+TOTAL_KEY = ("total", "all")
+RETENTION_KEY = ("retention", "reviewed")
+
+# 影响计数的字段
+COUNTER_FIELDS = ("status", "leitner_box", "total_reviews", "correct_reviews")
+
+_UPSERT_COUNTER_SQL = text("""
+    INSERT INTO flashcard_counters (dimension, value, count, amount)
+    VALUES (:dimension, :value, :count, :amount)
+    ON CONFLICT (dimension, value) DO UPDATE SET
+        count = flashcard_counters.count + :count,
+        amount = flashcard_counters.amount + :amount
+""")
+
+
+def _enum_value(value: Any) -> str:
+    return getattr(value, "value", value)
+
+
+def _column_value(enum_cls, raw: str) -> str:
+    """原生 SQL 读到的枚举列（数据库中保存的是枚举名，如 NEW / BOX_1）转为枚举值"""
+    try:
+        return enum_cls[raw].value
+    except KeyError:
+        return enum_cls(raw).value
+
+
+def card_contribution(
+    status: Any,
+    leitner_box: Any,
+    total_reviews: int,
+    correct_reviews: int
+) -> Dict[CounterKey, Tuple[int, float]]:
+    """一张卡片对各计数的贡献"""
+    contribution = {
+        TOTAL_KEY: (1, 0.0),
+        ("status", _enum_value(status)): (1, 0.0),
+        ("leitner_box", _enum_value(leitner_box)): (1, 0.0),
+    }
+    if total_reviews:
+        contribution[RETENTION_KEY] = (1, correct_reviews * 100.0 / total_reviews)
+    return contribution
+
+
+def add_contribution(
+    deltas: CounterDeltas,
+    contribution: Dict[CounterKey, Tuple[int, float]],
+    sign: int = 1
+) -> None:
+    """把一张卡片的贡献按 sign（+1 / -1）累加到增量中"""
+    for key, (count, amount) in contribution.items():
+        delta = deltas.setdefault(key, [0, 0.0])
+        delta[0] += sign * count
+        delta[1] += sign * amount
+
+
+def apply_counter_deltas(session: Session, deltas: CounterDeltas) -> None:
+    """在当前事务中累加计数增量（按键排序，多个事务并发更新时加锁顺序一致）"""
+    params = [
+        {"dimension": dimension, "value": value, "count": count, "amount": amount}
+        for (dimension, value), (count, amount) in sorted(deltas.items())
+        if count or amount
+    ]
+    if params:
+        session.connection().execute(_UPSERT_COUNTER_SQL, params)
+
+
+def read_counters(session: Session) -> Dict[CounterKey, Tuple[int, float]]:
+    """读取全部计数"""
+    rows = session.exec(select(FlashcardCounter)).all()
+    return {(row.dimension, row.value): (row.count, row.amount) for row in rows}
+
+
+def rebuild_counters(session: Session) -> None:
+    """按 flashcards 表重建计数（全表扫描，只在初始化或校正时使用）"""
+    session.exec(text("DELETE FROM flashcard_counters"))
+    deltas: CounterDeltas = {}
+    rows = session.exec(text("""
+        SELECT status, leitner_box, COUNT(*) AS cards,
+               SUM(CASE WHEN total_reviews > 0 THEN 1 ELSE 0 END) AS reviewed,
+               SUM(CASE WHEN total_reviews > 0 THEN correct_reviews * 100.0 / total_reviews ELSE 0 END) AS retention
+        FROM flashcards
+        GROUP BY status, leitner_box
+    """)).all()
+    # 写入全部维度（包括数量为 0 的），计数表非空即表示已初始化
+    for key in [TOTAL_KEY, RETENTION_KEY] + [("status", s.value) for s in FlashcardStatus] + [
+        ("leitner_box", b.value) for b in LeitnerBox
+    ]:
+        deltas[key] = [0, 0.0]
+    for row in rows:
+        keys = (
+            TOTAL_KEY,
+            ("status", _column_value(FlashcardStatus, row.status)),
+            ("leitner_box", _column_value(LeitnerBox, row.leitner_box)),
+        )
+        for key in keys:
+            deltas.setdefault(key, [0, 0.0])[0] += row.cards
+        deltas[RETENTION_KEY][0] += row.reviewed or 0
+        deltas[RETENTION_KEY][1] += row.retention or 0.0
+    session.connection().execute(_UPSERT_COUNTER_SQL, [
+        {"dimension": dimension, "value": value, "count": count, "amount": amount}
+        for (dimension, value), (count, amount) in sorted(deltas.items())
+    ])
+
+
+def ensure_counters(session: Session) -> None:
+    """计数表为空时（首次部署或新增该表后）按现有卡片初始化"""
+    initialized = session.exec(
+        select(FlashcardCounter.count).where(
+            FlashcardCounter.dimension == TOTAL_KEY[0],
+            FlashcardCounter.value == TOTAL_KEY[1]
+        )
+    ).first()
+    if initialized is None:
+        logger.info("初始化卡片计数表")
+        rebuild_counters(session)
+        session.commit()
+
+
+def _current_values(card: Flashcard) -> Iterable[Any]:
+    return [getattr(card, field) for field in COUNTER_FIELDS]
+
+
+def _locked_values(session: Session, cards: List[Flashcard]) -> Dict[int, Tuple[Any, ...]]:
+    """
+    卡片在数据库中的当前字段值，并在当前写事务中锁定这些行直到提交
+
+    用不改变数据的 UPDATE ... RETURNING 代替 SELECT ... FOR UPDATE：PostgreSQL 上锁定对应行，
+    SQLite 上开始写事务，读到的值在本事务提交前不会被其他事务修改。已被删除的卡片不在结果中。
+    """
+    ids = sorted({inspect(card).identity[0] for card in cards})
+    if not ids:
+        return {}
+    table = Flashcard.__table__
+    rows = session.connection().execute(
+        update(table).where(table.c.id.in_(ids)).values(status=table.c.status).returning(
+            table.c.id, *(table.c[field] for field in COUNTER_FIELDS)
+        )
+    ).all()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    deltas: CounterDeltas = {}
+    for obj in session.new:
+        if isinstance(obj, Flashcard):
+            add_contribution(deltas, card_contribution(*_current_values(obj)))
+
+    deleted = [obj for obj in session.deleted if isinstance(obj, Flashcard)]
+    changed = [
+        obj for obj in session.dirty
+        if isinstance(obj, Flashcard) and obj not in session.deleted and any(
+            inspect(obj).attrs[field].history.has_changes() for field in COUNTER_FIELDS
+        )
+    ]
+    persisted = _locked_values(session, deleted + changed)
+    for obj in deleted + changed:
+        values = persisted.get(inspect(obj).identity[0])
+        if values is not None:
+            add_contribution(deltas, card_contribution(*values), -1)
+    for obj in changed:
+        add_contribution(deltas, card_contribution(*_current_values(obj)))
+    if deltas:
+        apply_counter_deltas(session, deltas)
+
+
+_installed = False
+
+
+def track_flashcard_counters() -> None:
+    """为所有会话安装计数维护（重复调用无副作用）"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, "before_flush", _before_flush)
+    _installed = True
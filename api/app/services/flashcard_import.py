@@ -0,0 +1,311 @@
+"""
+记忆卡片流式导入
+
+请求体按 NDJSON（每行一个 JSON 对象）或 CSV（首行为表头）边接收边解析，逐行校验后
+每 chunk_size 张卡片用一条 Core 批量 INSERT 写入并单独提交，内存占用只与块大小有关，
+与导入总量无关。
+
+- 校验失败的行跳过，记录行号和原因（最多保留 IMPORT_MAX_ERRORS 条），不影响其他行
+- 请求体格式错误（编码、单行过长、CSV 表头缺列）或数据库写入失败时任务终止，已提交的块保留
+- Core 写入不经过 ORM 的 flush 事件，计数表、搜索索引和标签索引在同一事务中显式更新；
+  INSERT 通过 session.execute 执行，数据版本号（ETag）照常随提交递增
+- 任务进度保存在进程内存中，导入过程中可通过任务列表查询
+"""
+
+import codecs
+import csv
+import json
+import logging
+import os
+import secrets
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import anyio
+import anyio.from_thread
+import anyio.to_thread
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..database import create_session
+from ..middleware.cache_engine import TTLLRUCache
+from ..models.flashcard import (
+    Flashcard, FlashcardCreate, ImportFormat, ImportJobResponse, ImportRowError, ImportStatus
+)
+from .flashcard_counters import CounterDeltas, add_contribution, apply_counter_deltas, card_contribution
+from .search import build_document, index_documents
+from .tags import sync_entity_tags
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("FLASHCARD_IMPORT_CHUNK_SIZE", "2000"))
+# 每个任务保留的校验失败记录数
+IMPORT_MAX_ERRORS = 100
+# 单行（NDJSON 的一条记录）最大字符数
+IMPORT_MAX_LINE_CHARS = 1_000_000
+# 接收请求体与解析写入之间缓冲的数据块数，写入跟不上时暂停接收
+IMPORT_BUFFER_CHUNKS = 16
+
+IMPORT_JOB_TTL = int(os.getenv("FLASHCARD_IMPORT_JOB_TTL", "3600"))
+IMPORT_JOB_MAX = 50
+
+# Content-Type -> 格式
+CONTENT_TYPES = {
+    "application/x-ndjson": ImportFormat.NDJSON,
+    "application/ndjson": ImportFormat.NDJSON,
+    "application/jsonl": ImportFormat.NDJSON,
+    "text/csv": ImportFormat.CSV,
+}
+
+_table = Flashcard.__table__
+# 索引维护需要的列
+_RETURNING_COLUMNS = ("id", "front", "back", "category", "tags")
+
+
+class ImportFileError(ValueError):
+    """请求体无法继续解析，导入终止"""
+
+
+class ImportJob:
+    """一次导入的进度"""
+
+    def __init__(self, import_format: ImportFormat):
+        self.id = secrets.token_urlsafe(8)
+        self.format = import_format
+        self.status = ImportStatus.RUNNING
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[ImportRowError] = []
+        self.message: Optional[str] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+
+    def add_error(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(ImportRowError(line=line, error=error))
+
+    def finish(self, status: ImportStatus, message: Optional[str] = None) -> None:
+        self.status = status
+        self.message = message
+        self.finished_at = datetime.now(timezone.utc)
+
+    def to_response(self) -> ImportJobResponse:
+        return ImportJobResponse(
+            id=self.id,
+            format=self.format,
+            status=self.status,
+            rows=self.rows,
+            imported=self.imported,
+            failed=self.failed,
+            errors=list(self.errors),
+            message=self.message,
+            started_at=self.started_at,
+            finished_at=self.finished_at
+        )
+
+
+# 任务ID -> ImportJob；只按条数淘汰
+_jobs = TTLLRUCache(max_entries=IMPORT_JOB_MAX, default_ttl=IMPORT_JOB_TTL)
+
+
+def create_import_job(import_format: ImportFormat) -> ImportJob:
+    job = ImportJob(import_format)
+    _jobs.set(job.id, job, size=0)
+    return job
+
+
+def get_import_job(job_id: str) -> Optional[ImportJob]:
+    return _jobs.get(job_id)
+
+
+def list_import_jobs() -> List[ImportJob]:
+    """全部任务（最近开始的在前）"""
+    return sorted((entry.value for _, entry in _jobs.entries()), key=lambda job: job.started_at, reverse=True)
+
+
+def detect_import_format(content_type: Optional[str]) -> Optional[ImportFormat]:
+    """按 Content-Type 判断请求体格式"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPES.get(media_type)
+
+
+# ==================== 解析 ====================
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """字节块 -> 文本行（保留换行符，CSV 引号内的换行交给 csv 模块拼接）"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
+        if len(pending) > IMPORT_MAX_LINE_CHARS:
+            raise ImportFileError(f"单行超过 {IMPORT_MAX_LINE_CHARS} 个字符")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _ndjson_records(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """(行号, 行文本)，跳过空行；JSON 在校验时解析，格式错误只影响该行"""
+    for line_no, line in enumerate(lines, 1):
+        if line.strip():
+            yield line_no, line
+
+
+def _csv_records(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """(行号, 字段字典)，空单元格视为未填写（使用默认值），多余的列忽略"""
+    reader = csv.DictReader(lines)
+    missing = {"front", "back"} - set(reader.fieldnames or ())
+    if missing:
+        raise ImportFileError(f"CSV 表头缺少列: {', '.join(sorted(missing))}")
+    for record in reader:
+        yield reader.line_num, {
+            key: value for key, value in record.items()
+            if key is not None and value not in (None, "")
+        }
+
+
+_RECORD_READERS: Dict[ImportFormat, Callable[[Iterable[str]], Iterator[Tuple[int, Any]]]] = {
+    ImportFormat.NDJSON: _ndjson_records,
+    ImportFormat.CSV: _csv_records,
+}
+
+
+def _card_params(record: Any, now: datetime) -> Dict[str, Any]:
+    """校验一条记录，返回 INSERT 参数（校验失败抛出 ValueError）"""
+    if isinstance(record, str):
+        record = json.loads(record)
+        if not isinstance(record, dict):
+            raise ValueError("每行应为一个 JSON 对象")
+    card = FlashcardCreate.model_validate(record)
+    return {**card.model_dump(), "created_at": now, "updated_at": now}
+
+
+def _error_message(exc: ValueError) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors()
+        )
+    return str(exc)
+
+
+# ==================== 写入 ====================
+
+def _insert_cards(session: Session, params: List[Dict[str, Any]]) -> list:
+    """写入一块卡片，返回新卡片的 id / front / back / category / tags"""
+    # 多行 INSERT ... RETURNING（insertmanyvalues），返回列自带内容，不依赖行顺序
+    return session.execute(
+        insert(_table).returning(*(_table.c[column] for column in _RETURNING_COLUMNS)),
+        params
+    ).all()
+
+
+def _write_chunk(session: Session, params: List[Dict[str, Any]]) -> int:
+    """在一个事务中写入卡片并更新计数表、搜索索引和标签索引"""
+    rows = _insert_cards(session, params)
+
+    deltas: CounterDeltas = {}
+    for card in params:
+        add_contribution(deltas, card_contribution(
+            card["status"], card["leitner_box"], card["total_reviews"], card["correct_reviews"]
+        ))
+    apply_counter_deltas(session, deltas)
+
+    connection = session.connection()
+    index_documents(connection, [build_document("flashcard", row) for row in rows])
+    sync_entity_tags(connection, "flashcard", {row.id: row.tags for row in rows if row.tags})
+    session.commit()
+    return len(rows)
+
+
+def run_import(
+    job: ImportJob,
+    chunks: Iterable[bytes],
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    on_commit: Optional[Callable[[], None]] = None
+) -> ImportJob:
+    """
+    解析并写入请求体（同步执行，在工作线程中调用）
+
+    Args:
+        chunks: 请求体字节块
+        on_commit: 每块提交后的回调（如清除缓存）
+    """
+    now = datetime.now(timezone.utc)
+    pending: List[Dict[str, Any]] = []
+    try:
+        with create_session() as session:
+            for line_no, record in _RECORD_READERS[job.format](_iter_lines(chunks)):
+                job.rows += 1
+                try:
+                    pending.append(_card_params(record, now))
+                except ValueError as exc:
+                    job.add_error(line_no, _error_message(exc))
+                    continue
+                if len(pending) >= chunk_size:
+                    job.imported += _write_chunk(session, pending)
+                    pending = []
+                    if on_commit:
+                        on_commit()
+            if pending:
+                job.imported += _write_chunk(session, pending)
+                if on_commit:
+                    on_commit()
+    except (ImportFileError, UnicodeDecodeError, csv.Error) as exc:
+        job.finish(ImportStatus.FAILED, f"第 {job.rows + 1} 条记录附近格式错误，导入终止: {exc}")
+    except SQLAlchemyError:
+        logger.exception("卡片导入写入失败 (任务 %s)", job.id)
+        job.finish(ImportStatus.FAILED, "数据库写入失败，导入终止")
+    else:
+        job.finish(ImportStatus.COMPLETED)
+    return job
+
+
+async def import_stream(
+    job: ImportJob,
+    body: AsyncIterator[bytes],
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    on_commit: Optional[Callable[[], None]] = None
+) -> ImportJob:
+    """
+    边接收请求体边在工作线程中解析写入
+
+    两者之间只缓冲 IMPORT_BUFFER_CHUNKS 个数据块，写入跟不上时暂停接收（背压）；
+    请求体没有接收完整（客户端断开）时任务以失败结束。
+    """
+    send, receive = anyio.create_memory_object_stream(IMPORT_BUFFER_CHUNKS)
+    truncated = False
+
+    async def feed() -> None:
+        nonlocal truncated
+        async with send:
+            try:
+                async for chunk in body:
+                    if chunk:
+                        await send.send(chunk)
+            except anyio.BrokenResourceError:
+                pass  # 导入已终止，不再接收
+            except Exception:
+                truncated = True
+                raise
+
+    def chunks() -> Iterator[bytes]:
+        while True:
+            try:
+                yield anyio.from_thread.run(receive.receive)
+            except anyio.EndOfStream:
+                if truncated:
+                    raise ImportFileError("请求体没有接收完整")
+                return
+
+    async with anyio.create_task_group() as group:
+        group.start_soon(feed)
+        await anyio.to_thread.run_sync(run_import, job, chunks(), chunk_size, on_commit)
+        # 导入提前终止时让 feed 停止等待
+        receive.close()
+    return job
@@ -0,0 +1,209 @@
+"""
+复习负载预测
+
+从当前卡片状态出发逐日模拟：每天到期的卡片按该卡片历史上各答案的比例随机作答，
+用批量调度引擎（batch_scheduler.review）更新状态并排到之后的日期，多次模拟取平均，
+得到未来每天的预计复习数量、新卡片数量和用时。
+
+- 答案比例：卡片自己的复习记录加上 FORECAST_PRIOR_WEIGHT 次按全局比例计的伪记录，
+  复习次数少或没有复习过的卡片接近全局比例
+- 用时：卡片历史平均响应时间，没有记录时用全局平均
+- 新卡片每天最多引入 new_per_day 张（按到期时间、ID 顺序），暂停 / 搁置的卡片不参与
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlmodel import func, select
+
+from ..models.flashcard import Flashcard, FlashcardStatus, ReviewRecord
+from .batch_scheduler import DIFFICULTIES, MANUAL_STATUSES, STATUSES, CardStates, encode, review
+
+# 卡片答案比例向全局比例收缩的伪记录数
+FORECAST_PRIOR_WEIGHT = 5
+# 没有任何复习记录时使用的答案比例（again / hard / good / easy）与单次用时
+DEFAULT_ANSWER_DISTRIBUTION = (0.15, 0.15, 0.5, 0.2)
+DEFAULT_RESPONSE_TIME_MS = 8000
+# 自动选择模拟次数时，卡片数 × 次数的目标值与次数上限
+FORECAST_SAMPLE_CARDS = 100_000
+FORECAST_MAX_RUNS = 20
+
+_NEW = STATUSES.index(FlashcardStatus.NEW)
+_DAY = np.timedelta64(1, "D").astype("timedelta64[us]")
+
+
+class ForecastInputs:
+    """模拟所需的卡片状态、答案比例与平均用时"""
+
+    def __init__(self, states: CardStates, probabilities: np.ndarray, response_ms: np.ndarray):
+        self.states = states
+        self.probabilities = probabilities
+        self.response_ms = response_ms
+        # 新卡片的引入顺序（非新卡片为 -1）
+        is_new = states.status == _NEW
+        new_order = np.lexsort((np.arange(len(states)), states.due_date))
+        new_order = new_order[is_new[new_order]]
+        self.new_rank = np.full(len(states), -1, dtype=np.int64)
+        self.new_rank[new_order] = np.arange(len(new_order))
+
+
+def load_forecast_inputs(session: Session) -> ForecastInputs:
+    """读取参与预测的卡片及其复习统计"""
+    cards = session.exec(
+        select(
+            Flashcard.id, Flashcard.ease_factor, Flashcard.interval, Flashcard.repetitions,
+            Flashcard.leitner_box, Flashcard.status, Flashcard.total_reviews, Flashcard.correct_reviews,
+            Flashcard.streak, Flashcard.max_streak, Flashcard.due_date, Flashcard.last_review
+        ).where(Flashcard.status.not_in(MANUAL_STATUSES)).order_by(Flashcard.id)
+    ).all()
+    states = CardStates.from_cards(cards)
+    card_ids = np.array([card.id for card in cards], dtype=np.int64)
+
+    counts = np.zeros((len(cards), len(DIFFICULTIES)))
+    response_sum = np.zeros(len(cards))
+    global_counts = np.zeros(len(DIFFICULTIES))
+    global_response = 0.0
+    rows = session.exec(
+        select(
+            ReviewRecord.flashcard_id, ReviewRecord.difficulty,
+            func.count(), func.sum(ReviewRecord.response_time)
+        ).group_by(ReviewRecord.flashcard_id, ReviewRecord.difficulty)
+    ).all()
+    if rows:
+        flashcard_ids, difficulties, review_counts, response_times = zip(*rows)
+        codes = encode(DIFFICULTIES, difficulties)
+        review_counts = np.array(review_counts, dtype=np.float64)
+        response_times = np.array(response_times, dtype=np.float64)
+        np.add.at(global_counts, codes, review_counts)
+        global_response = response_times.sum()
+
+        # 只统计参与预测的卡片
+        flashcard_ids = np.array(flashcard_ids, dtype=np.int64)
+        positions = np.searchsorted(card_ids, flashcard_ids)
+        found = positions < len(card_ids)
+        found[found] = card_ids[positions[found]] == flashcard_ids[found]
+        np.add.at(counts, (positions[found], codes[found]), review_counts[found])
+        np.add.at(response_sum, positions[found], response_times[found])
+
+    total_reviews = global_counts.sum()
+    if total_reviews:
+        prior = global_counts / total_reviews
+        default_response = global_response / total_reviews
+    else:
+        prior = np.array(DEFAULT_ANSWER_DISTRIBUTION)
+        default_response = DEFAULT_RESPONSE_TIME_MS
+
+    smoothed = counts + FORECAST_PRIOR_WEIGHT * prior
+    probabilities = smoothed / smoothed.sum(axis=1, keepdims=True)
+
+    card_reviews = counts.sum(axis=1)
+    response_ms = np.full(len(cards), float(default_response))
+    reviewed = card_reviews > 0
+    response_ms[reviewed] = response_sum[reviewed] / card_reviews[reviewed]
+    return ForecastInputs(states, probabilities, response_ms)
+
+
+def default_runs(cards: int) -> int:
+    """
+    模拟次数：每天的复习数是大量卡片之和，单次模拟的相对波动约为 1/sqrt(卡片数 × 次数)，
+    卡片多时一次就足够，卡片少时多模拟几次
+    """
+    return int(np.clip(FORECAST_SAMPLE_CARDS // max(cards, 1), 1, FORECAST_MAX_RUNS))
+
+
+def _initial_days(inputs: ForecastInputs, day_start: np.datetime64, days: int, new_per_day: int) -> np.ndarray:
+    """每张卡片第一次到期是第几天（已过期为 0，新卡片推迟到按引入顺序轮到它的那天，days 表示超出预测范围）"""
+    states = inputs.states
+    # 没有到期时间的卡片视为已到期；先替换 NaT 再相除，避免对 NaT 做整除
+    due_date = np.where(np.isnat(states.due_date), day_start, states.due_date)
+    due_day = np.clip((due_date - day_start) // _DAY, 0, days)
+    is_new = inputs.new_rank >= 0
+    if new_per_day > 0:
+        due_day[is_new] = np.maximum(due_day[is_new], inputs.new_rank[is_new] // new_per_day)
+    else:
+        due_day[is_new] = days
+    return np.minimum(due_day, days)
+
+
+def _schedule(calendar: List[List[np.ndarray]], index: np.ndarray, due_day: np.ndarray) -> None:
+    """把卡片按到期日放进日程（超出预测范围的丢弃）"""
+    order = np.argsort(due_day, kind="stable")
+    index, due_day = index[order], due_day[order]
+    days = len(calendar)
+    bounds = np.searchsorted(due_day, np.arange(days + 1))
+    for day in np.flatnonzero(bounds[1:] > bounds[:-1]).tolist():
+        calendar[day].append(index[bounds[day]:bounds[day + 1]])
+
+
+def simulate(
+    inputs: ForecastInputs,
+    days: int,
+    new_per_day: int,
+    runs: Optional[int] = None,
+    now: Optional[datetime] = None,
+    seed: int = 0
+) -> Dict[str, np.ndarray]:
+    """
+    逐日模拟复习负载
+
+    第 0 天为今天（UTC），包含所有已过期的卡片；卡片按到期日放进日程，每天只处理当天到期的卡片。
+    随机数种子固定，相同输入结果相同。
+
+    Args:
+        runs: 模拟次数，None 按卡片数自动选择（见 default_runs）
+
+    Returns:
+        {"reviews": 每天平均复习数, "new_cards": 每天平均新卡片数, "minutes": 每天平均用时（分钟）}
+    """
+    runs = runs or default_runs(len(inputs.states))
+    now = now or datetime.now(timezone.utc)
+    now64 = np.datetime64(now.astimezone(timezone.utc).replace(tzinfo=None), "us")
+    day_start = now64.astype("datetime64[D]").astype("datetime64[us]")
+    rng = np.random.default_rng(seed)
+    thresholds = np.cumsum(inputs.probabilities, axis=1)[:, :-1]
+    first_days = _initial_days(inputs, day_start, days, new_per_day)
+
+    reviews = np.zeros(days)
+    new_cards = np.zeros(days)
+    response_ms = np.zeros(days)
+    for _ in range(runs):
+        states = inputs.states.copy()
+        calendar: List[List[np.ndarray]] = [[] for _ in range(days)]
+        _schedule(calendar, np.arange(len(states)), first_days)
+        for day in range(days):
+            if not calendar[day]:
+                continue
+            index = np.concatenate(calendar[day])
+            calendar[day] = []
+            new_cards[day] += np.count_nonzero(states.status[index] == _NEW)
+            reviews[day] += len(index)
+            response_ms[day] += inputs.response_ms[index].sum()
+
+            answers = (rng.random((len(index), 1)) >= thresholds[index]).sum(axis=1)
+            review(states, index, answers, np.full(len(index), now64 + day * _DAY))
+            # 复习时间取当天同一时刻，间隔 n 天即第 day + n 天到期
+            _schedule(calendar, index, day + states.interval[index])
+
+    return {
+        "reviews": reviews / runs,
+        "new_cards": new_cards / runs,
+        "minutes": response_ms / runs / 60000,
+    }
+
+
+def forecast_days(result: Dict[str, np.ndarray], start: Optional[datetime] = None) -> List[dict]:
+    """模拟结果转为按天的列表"""
+    start = (start or datetime.now(timezone.utc)).date()
+    return [
+        {
+            "date": (start + timedelta(days=day)).isoformat(),
+            "reviews": round(float(reviews), 2),
+            "new_cards": round(float(new_cards), 2),
+            "minutes": round(float(minutes), 1),
+        }
+        for day, (reviews, new_cards, minutes) in enumerate(
+            zip(result["reviews"], result["new_cards"], result["minutes"])
+        )
+    ]
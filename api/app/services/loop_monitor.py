@@ -0,0 +1,241 @@
+"""
+事件循环阻塞监控
+
+- 探测协程按固定间隔 sleep，实际醒来时间与预期之差即事件循环延迟（lag）
+- 看门狗线程检查探测协程的心跳，事件循环被占用超过阈值时抓取事件循环线程的调用栈，
+  并从栈帧中的 ASGI scope 找出正在执行的路由
+- 按（路由, 阻塞位置）汇总，记录次数、总阻塞时间和最长阻塞时间
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import Histogram, register_collector, render_histogram, render_metric
+
+logger = logging.getLogger(__name__)
+
+# 延迟分桶（秒）
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 项目代码所在目录，用于在调用栈中定位阻塞位置
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _find_route(frame) -> str:
+    """从调用栈中的 ASGI scope 提取路由（由内向外查找）"""
+    while frame is not None:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") in ("http", "websocket"):
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope.get("path", "?")
+            return f"{scope.get('method', 'WS')} {path}"
+        frame = frame.f_back
+    return "<no request>"
+
+
+def _blocking_location(stack: traceback.StackSummary) -> str:
+    """调用栈中最内层的项目代码位置，没有则取最内层帧"""
+    for entry in reversed(stack):
+        if entry.filename.startswith(_APP_DIR) and not entry.filename.endswith("loop_monitor.py"):
+            return f"{os.path.relpath(entry.filename, os.path.dirname(_APP_DIR))}:{entry.lineno} in {entry.name}"
+    entry = stack[-1]
+    return f"{entry.filename}:{entry.lineno} in {entry.name}"
+
+
+class _Offender:
+    __slots__ = ("route", "location", "count", "total", "max", "stack", "last_seen")
+
+    def __init__(self, route: str, location: str):
+        self.route = route
+        self.location = location
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.stack = ""
+        self.last_seen = 0.0
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控"""
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        threshold: float = 0.1,
+        max_offenders: int = 100,
+        stack_limit: int = 30
+    ):
+        """
+        Args:
+            interval: 探测间隔（秒）
+            threshold: 阻塞阈值（秒），超过后抓取调用栈
+            max_offenders: 保留的（路由, 阻塞位置）组合上限
+            stack_limit: 保存的调用栈帧数
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.max_offenders = max_offenders
+        self.stack_limit = stack_limit
+
+        self.lag = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.stalls = 0
+
+        self._lock = threading.Lock()
+        self._offenders: Dict[Tuple[str, str], _Offender] = {}
+        self._heartbeat = time.monotonic()
+        self._pending: Optional[_Offender] = None  # 正在进行的阻塞
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """在运行中的事件循环上启动监控"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+            self._heartbeat = time.monotonic()
+            self.lag.observe(lag)
+            with self._lock:
+                self.max_lag = max(self.max_lag, lag)
+                offender = self._pending
+                self._pending = None
+                if offender is not None:
+                    # 阻塞结束，以本次延迟作为阻塞时长（下界）
+                    offender.total += lag
+                    offender.max = max(offender.max, lag)
+
+    def _watch(self) -> None:
+        check_interval = max(self.threshold / 4, 0.005)
+        while not self._stopped.wait(check_interval):
+            blocked = time.monotonic() - self._heartbeat - self.interval
+            if blocked < self.threshold:
+                continue
+            with self._lock:
+                if self._pending is not None:
+                    continue
+            self._capture(blocked)
+
+    def _capture(self, blocked: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame, limit=self.stack_limit)
+        route = _find_route(frame)
+        location = _blocking_location(stack)
+        del frame
+
+        with self._lock:
+            self.stalls += 1
+            key = (route, location)
+            offender = self._offenders.get(key)
+            if offender is None:
+                if len(self._offenders) >= self.max_offenders:
+                    # 丢弃累计阻塞时间最少的组合
+                    weakest = min(self._offenders, key=lambda k: self._offenders[k].total)
+                    del self._offenders[weakest]
+                offender = self._offenders[key] = _Offender(route, location)
+            offender.count += 1
+            offender.stack = "".join(stack.format())
+            offender.last_seen = time.time()
+            self._pending = offender
+
+        logger.warning(
+            f"事件循环被阻塞超过 {blocked * 1000:.0f}ms: {route} @ {location}"
+        )
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        """延迟分位数与阻塞最严重的路由"""
+        with self._lock:
+            offenders = sorted(self._offenders.values(), key=lambda o: o.total, reverse=True)[:top]
+            result_offenders = [
+                {
+                    "route": offender.route,
+                    "location": offender.location,
+                    "count": offender.count,
+                    "total_blocked_ms": round(offender.total * 1000, 1),
+                    "max_blocked_ms": round(offender.max * 1000, 1),
+                    "last_seen": offender.last_seen,
+                    "stack": offender.stack,
+                }
+                for offender in offenders
+            ]
+            max_lag = self.max_lag
+            stalls = self.stalls
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            # 分位数按分桶上界估算，不超过实际观测到的最大值
+            return round(min(value, max_lag) * 1000, 2) if value is not None else None
+
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "samples": self.lag.count,
+            "lag_ms": {
+                "p50": ms(self.lag.percentile(0.5)),
+                "p95": ms(self.lag.percentile(0.95)),
+                "p99": ms(self.lag.percentile(0.99)),
+                "max": round(max_lag * 1000, 2),
+            },
+            "stalls": stalls,
+            "top_offenders": result_offenders,
+        }
+
+    def prometheus_lines(self) -> List[str]:
+        with self._lock:
+            by_route: Dict[str, int] = {}
+            for offender in self._offenders.values():
+                by_route[offender.route] = by_route.get(offender.route, 0) + offender.count
+        lines = render_histogram(
+            "api_event_loop_lag_seconds", "Event loop scheduling lag", [({}, self.lag)]
+        )
+        lines += render_metric(
+            "api_event_loop_stalls_total", "counter", "Event loop stalls above the threshold by route",
+            [({"route": route}, count) for route, count in by_route.items()]
+        )
+        return lines
+
+
+# 全局事件循环监控
+loop_monitor = LoopLagMonitor(
+    interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", "50")) / 1000,
+    threshold=float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100")) / 1000,
+)
+register_collector("event_loop", loop_monitor.prometheus_lines)
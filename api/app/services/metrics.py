@@ -0,0 +1,135 @@
+"""
+指标工具
+
+提供轻量的直方图、Prometheus 文本格式渲染以及采集器注册表，
+各模块注册自己的采集函数，由 /admin/metrics 统一输出
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """固定分桶直方图（线程安全）"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """返回 (上界, 累计计数) 列表，含 +Inf"""
+        with self._lock:
+            counts = list(self._counts)
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+    def percentile(self, q: float) -> Optional[float]:
+        """按分桶上界估算分位数，无数据时返回 None"""
+        with self._lock:
+            counts = list(self._counts)
+            count = self._count
+        if count == 0:
+            return None
+        rank = q * count
+        total = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            total += bucket_count
+            if total >= rank:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self._count,
+            "sum": round(self._sum, 6),
+            "avg": round(self._sum / self._count, 6) if self._count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_metric(
+    name: str,
+    metric_type: str,
+    help_text: str,
+    samples: Iterable[Tuple[Dict[str, str], float]]
+) -> List[str]:
+    """渲染 counter / gauge 指标"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(labels)} {value}")
+    return lines
+
+
+def render_histogram(
+    name: str,
+    help_text: str,
+    samples: Iterable[Tuple[Dict[str, str], Histogram]]
+) -> List[str]:
+    """渲染直方图指标"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in samples:
+        for bound, count in histogram.cumulative():
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+    return lines
+
+
+# 采集器：返回 Prometheus 文本行
+Collector = Callable[[], List[str]]
+
+_collectors: Dict[str, Collector] = {}
+
+
+def register_collector(name: str, collector: Collector) -> None:
+    """注册采集器，同名覆盖"""
+    _collectors[name] = collector
+
+
+def render_all() -> str:
+    """输出所有已注册采集器的 Prometheus 文本"""
+    lines: List[str] = []
+    for collector in list(_collectors.values()):
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
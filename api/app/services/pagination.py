@@ -0,0 +1,160 @@
+"""
+游标（keyset）分页
+
+按列表接口的排序列（最后一列为 id，保证顺序唯一）记录上一页最后一行的值，
+下一页用 WHERE (排序列) 在该值之后 代替 OFFSET，配合以排序列开头的索引，
+任意一页的代价都与第一页相同。
+
+游标是排序列取值的 base64 编码，对客户端不透明；同时记录排序方式，
+排序参数与游标不一致时拒绝请求。
+"""
+
+import base64
+import json
+import logging
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 返回下一页游标的响应头（列表直接作为响应体的接口）
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class TotalMode(str, Enum):
+    """列表总数的计算方式"""
+    EXACT = "exact"        # COUNT(*)，与过滤条件完全一致
+    ESTIMATE = "estimate"  # 计数表或查询计划器的估计值，无法估计时退回 exact
+    NONE = "none"          # 不计算总数，是否有下一页由多取的一行判断
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Enum):
+        # 枚举列在数据库中保存的是枚举名
+        return value.name
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        raise ValueError("unknown cursor value")
+    return value
+
+
+class Keyset:
+    """
+    一个列表接口的排序方式
+
+    用法：
+        keyset = Keyset((Note.updated_at, True), (Note.id, False))
+        query = keyset.apply(query, cursor=cursor, skip=skip, limit=limit)
+        rows, next_cursor = keyset.page((await session.exec(query)).all(), limit)
+    """
+
+    def __init__(self, *keys: Tuple[Any, bool]):
+        """
+        Args:
+            keys: (列, 是否降序)，最后一列必须唯一（通常为主键）
+        """
+        self.keys = keys
+        self.signature = ",".join(
+            f"{column.key}:{'desc' if descending else 'asc'}" for column, descending in keys
+        )
+
+    def encode(self, row: Any) -> str:
+        payload = {
+            "k": self.signature,
+            "v": [_encode_value(getattr(row, column.key)) for column, _ in self.keys],
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> List[Any]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            if payload["k"] != self.signature or len(payload["v"]) != len(self.keys):
+                raise ValueError("cursor does not match sort order")
+            return [_decode_value(value) for value in payload["v"]]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+
+    def after(self, values: Sequence[Any]):
+        """排在 values 之后的行的条件"""
+        clauses = []
+        for index, ((column, descending), value) in enumerate(zip(self.keys, values)):
+            equal_prefix = [
+                prefix_column == prefix_value
+                for (prefix_column, _), prefix_value in zip(self.keys[:index], values[:index])
+            ]
+            clauses.append(and_(*equal_prefix, column < value if descending else column > value))
+        # 首列的范围条件冗余，但便于数据库直接在索引上定位起点
+        first_column, first_descending = self.keys[0]
+        bound = first_column <= values[0] if first_descending else first_column >= values[0]
+        return and_(bound, or_(*clauses))
+
+    def apply(self, query, cursor: Optional[str] = None, skip: int = 0, limit: int = 100):
+        """
+        排序并分页
+
+        提供游标时按游标定位（忽略 skip），否则沿用 OFFSET。多取一行用于判断是否还有下一页。
+        """
+        if cursor:
+            query = query.where(self.after(self.decode(cursor)))
+        elif skip:
+            query = query.offset(skip)
+        order = [column.desc() if descending else column.asc() for column, descending in self.keys]
+        return query.order_by(*order).limit(limit + 1)
+
+    def page(self, rows: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+        """截取本页数据，还有下一页时返回下一页游标"""
+        rows = list(rows)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.encode(rows[-1])
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """通过响应头返回下一页游标"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+def planner_row_estimate(session: Session, query) -> Optional[int]:
+    """
+    PostgreSQL 查询计划器估计的结果行数（EXPLAIN，不执行查询）
+
+    非 PostgreSQL 或无法获取时返回 None。
+    """
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+    try:
+        compiled = query.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+        # 在保存点中执行：EXPLAIN 失败时只回滚到保存点，不会让外层事务进入 aborted 状态
+        with session.begin_nested():
+            plan = session.connection().exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {compiled}",
+                # 语句中没有参数，避免驱动把 LIKE 模式中的 % 当作占位符
+                execution_options={"no_parameters": True}
+            ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.debug(f"获取查询计划估计行数失败: {e}")
+        return None
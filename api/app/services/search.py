@@ -0,0 +1,392 @@
+"""
+全文搜索
+
+笔记、记忆卡片、工具、命令的可搜索文本同步到 search_documents 表（见 SearchDocument），
+写入时由会话事件在同一事务中更新。索引后端：
+- SQLite: FTS5 外部内容表 search_fts，由触发器与 search_documents 保持一致
+- PostgreSQL: search_documents 上的 tsvector 表达式 GIN 索引
+
+分词：中日韩文字没有空格分隔，按相邻两字切分（"机器学习" -> 机器 器学 学习），
+查询词同样切分后按短语匹配，等价于子串匹配；其他文字按单词切分并转小写，
+查询词的最后一个单词按前缀匹配。单个汉字无法用二字索引匹配，退回 ILIKE 子串匹配。
+"""
+
+import html
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, event, func, inspect, literal_column, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlmodel import select, text
+
+from ..models.command import Command
+from ..models.flashcard import Flashcard
+from ..models.note import Note
+from ..models.search import SearchDocument
+from ..models.tool import Tool
+
+logger = logging.getLogger(__name__)
+
+# 实体类型 -> (模型, 标题字段, 正文字段)
+SEARCH_ENTITIES: Dict[str, Tuple[Any, Tuple[str, ...], Tuple[str, ...]]] = {
+    "note": (Note, ("title",), ("content", "tags")),
+    "flashcard": (Flashcard, ("front",), ("back", "category", "tags")),
+    "tool": (Tool, ("title",), ("description", "system_prompt", "tags")),
+    "command": (Command, ("name",), ("command", "description", "tags")),
+}
+_ENTITY_TYPES = {model: entity_type for entity_type, (model, _, _) in SEARCH_ENTITIES.items()}
+
+# 中日韩文字（假名、CJK 统一表意文字及扩展 A、兼容表意文字、谚文）
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_PATTERN = re.compile(rf"(?P<cjk>[{_CJK}]+)|(?P<word>[^\W_{_CJK}]+)")
+
+# 标题与正文的权重
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+# 与 PostgreSQL 表达式索引完全一致的 tsvector 表达式
+_PG_VECTOR_SQL = (
+    "(setweight(to_tsvector('simple', search_documents.title_tokens), 'A') || "
+    "setweight(to_tsvector('simple', search_documents.body_tokens), 'B'))"
+)
+
+_UPSERT_DOCUMENT_SQL = text("""
+    INSERT INTO search_documents (entity_type, entity_id, title, body, title_tokens, body_tokens)
+    VALUES (:entity_type, :entity_id, :title, :body, :title_tokens, :body_tokens)
+    ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+        title = excluded.title,
+        body = excluded.body,
+        title_tokens = excluded.title_tokens,
+        body_tokens = excluded.body_tokens
+""")
+
+_DELETE_DOCUMENT_SQL = text(
+    "DELETE FROM search_documents WHERE entity_type = :entity_type AND entity_id = :entity_id"
+)
+
+_SQLITE_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE search_fts USING fts5(
+        title_tokens, body_tokens,
+        content='search_documents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_fts(rowid, title_tokens, body_tokens)
+        VALUES (new.id, new.title_tokens, new.body_tokens);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title_tokens, body_tokens)
+        VALUES ('delete', old.id, old.title_tokens, old.body_tokens);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title_tokens, body_tokens)
+        VALUES ('delete', old.id, old.title_tokens, old.body_tokens);
+        INSERT INTO search_fts(rowid, title_tokens, body_tokens)
+        VALUES (new.id, new.title_tokens, new.body_tokens);
+    END
+    """,
+    # 按 search_documents 现有内容重建索引
+    "INSERT INTO search_fts(search_fts) VALUES ('rebuild')",
+)
+
+# 当前使用的索引后端：fts5 / postgresql，未安装时为 None（搜索退回 ILIKE）
+_backend: Optional[str] = None
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """分词：中日韩文字按相邻二字切分，其他文字按单词切分并转小写"""
+    tokens: List[str] = []
+    for match in _TOKEN_PATTERN.finditer(value or ""):
+        run = match.group("cjk")
+        if run is None:
+            tokens.append(match.group("word").lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def parse_query(query: str) -> Optional[List[List[str]]]:
+    """
+    把查询拆成词组（按空白分隔，每个词组内的分词按短语匹配）
+
+    Returns:
+        词组列表；包含单个汉字等无法用索引匹配的片段时返回 None
+    """
+    terms = []
+    for raw in query.split():
+        for match in _TOKEN_PATTERN.finditer(raw):
+            run = match.group("cjk")
+            if run is not None and len(run) == 1:
+                return None
+        tokens = tokenize(raw)
+        if tokens:
+            terms.append(tokens)
+    return terms or None
+
+
+def _fts5_query(terms: List[List[str]]) -> str:
+    # 词组之间为 AND，每个词组是一个短语，最后一个分词按前缀匹配
+    return " ".join('"' + " ".join(tokens) + '"*' for tokens in terms)
+
+
+def _tsquery(terms: List[List[str]]) -> str:
+    return " & ".join(
+        " <-> ".join(f"'{token}'" for token in tokens[:-1]) +
+        (" <-> " if len(tokens) > 1 else "") + f"'{tokens[-1]}':*"
+        for tokens in terms
+    )
+
+
+# ==================== 索引维护 ====================
+
+def build_document(entity_type: str, obj: Any) -> Dict[str, Any]:
+    """实体对应的搜索文档"""
+    _, title_fields, body_fields = SEARCH_ENTITIES[entity_type]
+    title = " ".join(str(getattr(obj, field) or "") for field in title_fields).strip()
+    body = "\n".join(str(value) for value in (getattr(obj, field) for field in body_fields) if value)
+    return {
+        "entity_type": entity_type,
+        "entity_id": obj.id,
+        "title": title,
+        "body": body,
+        "title_tokens": " ".join(tokenize(title)),
+        "body_tokens": " ".join(tokenize(body)),
+    }
+
+
+def index_documents(executor, documents: Sequence[Dict[str, Any]]) -> None:
+    """写入或更新搜索文档（executor 为会话或连接，在调用方的事务中执行）"""
+    if documents:
+        executor.execute(_UPSERT_DOCUMENT_SQL, list(documents))
+
+
+def remove_documents(executor, keys: Sequence[Tuple[str, int]]) -> None:
+    """删除搜索文档，keys 为 (实体类型, 实体ID)"""
+    if keys:
+        executor.execute(_DELETE_DOCUMENT_SQL, [
+            {"entity_type": entity_type, "entity_id": entity_id} for entity_type, entity_id in keys
+        ])
+
+
+def _search_fields_changed(obj: Any, entity_type: str) -> bool:
+    _, title_fields, body_fields = SEARCH_ENTITIES[entity_type]
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in title_fields + body_fields)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    """把本次 flush 中实体的增删改同步到搜索文档"""
+    documents = []
+    for obj in list(session.new) + list(session.dirty):
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type is None:
+            continue
+        if obj in session.new or _search_fields_changed(obj, entity_type):
+            documents.append(build_document(entity_type, obj))
+    removed = [
+        (_ENTITY_TYPES[type(obj)], inspect(obj).identity[0])
+        for obj in session.deleted if type(obj) in _ENTITY_TYPES
+    ]
+    if documents or removed:
+        connection = session.connection()
+        index_documents(connection, documents)
+        remove_documents(connection, removed)
+
+
+_installed = False
+
+
+def track_search_documents() -> None:
+    """为所有会话安装搜索文档同步（重复调用无副作用）"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    _installed = True
+
+
+def install_search_schema(engine: Engine) -> Optional[str]:
+    """
+    创建全文索引（已存在时跳过），返回使用的后端
+
+    SQLite 缺少 FTS5 扩展或其他数据库时返回 None，搜索退回 ILIKE。
+    """
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as connection:
+            if dialect == "sqlite":
+                exists = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_fts'"
+                )).first()
+                if not exists:
+                    for statement in _SQLITE_SCHEMA:
+                        connection.execute(text(statement))
+                _backend = "fts5"
+            elif dialect == "postgresql":
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS idx_search_documents_fts "
+                    f"ON search_documents USING gin ({_PG_VECTOR_SQL.replace('search_documents.', '')})"
+                ))
+                _backend = "postgresql"
+            else:
+                _backend = None
+    except Exception as e:
+        logger.warning(f"全文索引不可用，搜索将使用 ILIKE: {e}")
+        _backend = None
+    return _backend
+
+
+def rebuild_search_index(session: Session, batch_size: int = 1000) -> int:
+    """按实体表重建全部搜索文档，返回文档数量"""
+    session.exec(text("DELETE FROM search_documents"))
+    total = 0
+    for entity_type, (model, _, _) in SEARCH_ENTITIES.items():
+        last_id = 0
+        while True:
+            rows = session.exec(
+                select(model).where(model.id > last_id).order_by(model.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            index_documents(session, [build_document(entity_type, row) for row in rows])
+            total += len(rows)
+            last_id = rows[-1].id
+            session.expunge_all()
+    return total
+
+
+def ensure_search_index(session: Session) -> None:
+    """搜索文档表为空而实体表有数据时（首次部署）建立索引"""
+    if session.exec(select(SearchDocument.id).limit(1)).first() is not None:
+        return
+    for model, _, _ in SEARCH_ENTITIES.values():
+        if session.exec(select(model.id).limit(1)).first() is not None:
+            break
+    else:
+        return
+    total = rebuild_search_index(session)
+    session.commit()
+    logger.info(f"已建立搜索索引: {total} 个文档")
+
+
+# ==================== 查询 ====================
+
+def _matching_document_ids(terms: List[List[str]]):
+    """匹配查询的 search_documents.id 子查询"""
+    if _backend == "fts5":
+        return text("SELECT rowid FROM search_fts WHERE search_fts MATCH :fts_query").bindparams(
+            fts_query=_fts5_query(terms)
+        ).columns(SearchDocument.id)
+    return select(SearchDocument.id).where(
+        literal_column(_PG_VECTOR_SQL).op("@@")(
+            func.to_tsquery(literal_column("'simple'"), _tsquery(terms))
+        )
+    )
+
+
+def like_pattern(value: str) -> str:
+    """子串匹配的 LIKE 模式：转义 % _ \\，配合 ESCAPE '\\' 使用，用户输入只按字面匹配"""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_filter(entity_type: str, search: str, fallback_columns: Sequence[Any]):
+    """
+    列表接口 search= 参数的过滤条件
+
+    能用全文索引时按实体 ID 过滤，否则退回对 fallback_columns 的 ILIKE 子串匹配。
+    """
+    terms = parse_query(search)
+    if terms is None or _backend is None:
+        search_term = like_pattern(search)
+        return or_(*(column.ilike(search_term, escape="\\") for column in fallback_columns))
+    model = SEARCH_ENTITIES[entity_type][0]
+    return model.id.in_(
+        select(SearchDocument.entity_id).where(
+            SearchDocument.entity_type == entity_type,
+            SearchDocument.id.in_(_matching_document_ids(terms))
+        )
+    )
+
+
+def make_snippet(body: str, query: str, width: int = 80) -> str:
+    """正文中第一个匹配位置附近的片段，HTML 转义后用 <mark> 标出匹配词"""
+    needles = sorted({term for term in query.split() if term}, key=len, reverse=True)
+    if not body:
+        return ""
+    pattern = re.compile("|".join(re.escape(needle) for needle in needles), re.IGNORECASE) if needles else None
+    match = pattern.search(body) if pattern else None
+    start = max(0, match.start() - width // 3) if match else 0
+    end = min(len(body), start + width)
+    window = body[start:end]
+
+    parts = []
+    position = 0
+    for found in (pattern.finditer(window) if pattern else ()):
+        parts.append(html.escape(window[position:found.start()]))
+        parts.append(f"<mark>{html.escape(found.group())}</mark>")
+        position = found.end()
+    parts.append(html.escape(window[position:]))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(body) else "")
+
+
+def search_statement(terms: Optional[List[List[str]]], entity_types: Sequence[str]):
+    """
+    统一搜索语句，返回 (语句, 是否退回 ILIKE)
+
+    结果列：entity_type, entity_id, title, body, score（越大越相关）
+    """
+    type_filter = "AND d.entity_type IN :entity_types" if entity_types else ""
+    if terms is None or _backend is None:
+        statement = text(f"""
+            SELECT d.entity_type, d.entity_id, d.title, d.body,
+                   CASE WHEN LOWER(d.title) LIKE :pattern ESCAPE '\\' THEN 2.0 ELSE 1.0 END AS score
+            FROM search_documents d
+            WHERE (LOWER(d.title) LIKE :pattern ESCAPE '\\' OR LOWER(d.body) LIKE :pattern ESCAPE '\\') {type_filter}
+            ORDER BY score DESC, d.id DESC
+            LIMIT :limit OFFSET :offset
+        """)
+        fallback = True
+    elif _backend == "fts5":
+        statement = text(f"""
+            SELECT d.entity_type, d.entity_id, d.title, d.body,
+                   -bm25(search_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score
+            FROM search_fts JOIN search_documents d ON d.id = search_fts.rowid
+            WHERE search_fts MATCH :fts_query {type_filter}
+            ORDER BY bm25(search_fts, {TITLE_WEIGHT}, {BODY_WEIGHT})
+            LIMIT :limit OFFSET :offset
+        """)
+        fallback = False
+    else:
+        statement = text(f"""
+            SELECT d.entity_type, d.entity_id, d.title, d.body,
+                   ts_rank({_PG_VECTOR_SQL.replace('search_documents.', 'd.')}, to_tsquery('simple', :ts_query)) AS score
+            FROM search_documents d
+            WHERE {_PG_VECTOR_SQL.replace('search_documents.', 'd.')} @@ to_tsquery('simple', :ts_query) {type_filter}
+            ORDER BY score DESC
+            LIMIT :limit OFFSET :offset
+        """)
+        fallback = False
+    if entity_types:
+        statement = statement.bindparams(bindparam("entity_types", expanding=True))
+    return statement, fallback
+
+
+def search_params(query: str, terms: Optional[List[List[str]]], fallback: bool) -> Dict[str, Any]:
+    if fallback:
+        return {"pattern": like_pattern(query.lower())}
+    if _backend == "fts5":
+        return {"fts_query": _fts5_query(terms)}
+    return {"ts_query": _tsquery(terms)}
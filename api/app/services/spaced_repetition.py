@@ -149,7 +149,8 @@ class SpacedRepetitionAlgorithm:
     def update_flashcard_after_review(
         flashcard: Flashcard,
         difficulty: FlashcardDifficulty,
-        response_time: int
+        response_time: int,
+        reviewed_at: datetime = None
     ) -> Flashcard:
         """
         复习后更新卡片状态
@@ -158,6 +159,7 @@ class SpacedRepetitionAlgorithm:
             flashcard: 要更新的卡片
             difficulty: 用户评价的难度
             response_time: 响应时间（毫秒）
+            reviewed_at: 复习时间（离线复习回放时由客户端提供），默认为当前时间
             
         Returns:
             更新后的卡片
@@ -179,10 +181,14 @@ class SpacedRepetitionAlgorithm:
             flashcard.repetitions
         )
         
+        now = datetime.now(timezone.utc)
+        if reviewed_at is None:
+            reviewed_at = now
+        
         # 计算下次复习时间（取两种算法的较大值）
-        ebbinghaus_due = SpacedRepetitionAlgorithm.calculate_next_due_date(new_interval)
+        ebbinghaus_due = SpacedRepetitionAlgorithm.calculate_next_due_date(new_interval, reviewed_at)
         leitner_interval = SpacedRepetitionAlgorithm.get_leitner_interval(new_box)
-        leitner_due = SpacedRepetitionAlgorithm.calculate_next_due_date(leitner_interval)
+        leitner_due = SpacedRepetitionAlgorithm.calculate_next_due_date(leitner_interval, reviewed_at)
         
         # 使用较长的间隔，确保不会过于频繁
         next_due = max(ebbinghaus_due, leitner_due)
@@ -193,8 +199,8 @@ class SpacedRepetitionAlgorithm:
         flashcard.repetitions = new_repetitions
         flashcard.leitner_box = new_box
         flashcard.due_date = next_due
-        flashcard.last_review = datetime.now(timezone.utc)
-        flashcard.updated_at = datetime.now(timezone.utc)
+        flashcard.last_review = reviewed_at
+        flashcard.updated_at = now
         
         # 更新统计信息
         flashcard.total_reviews += 1
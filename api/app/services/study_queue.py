@@ -0,0 +1,173 @@
+"""
+学习队列
+
+创建学习会话时按 get_review_distribution 的新卡片/复习上限一次性取出到期卡片的ID，
+之后取下一张卡片只按主键读取队首的几张卡片，不再扫描和排序整张表。
+队首卡片每次都重新读取：被修改过的卡片按最新状态计算预览，已不再到期或已删除的卡片移出队列。
+
+队列状态（卡片ID列表与计数）保存在缓存后端中：
+- 配置了共享后端（API_CACHE_BACKEND=sqlite）时与 API 缓存共用，多个 worker / 实例都能访问同一会话
+- 否则保存在进程内；Vercel 等多实例的 Serverless 环境中不可用（见 STUDY_SESSIONS_AVAILABLE）
+每次访问会话都会写回状态并重新计算有效期，STUDY_SESSION_TTL 是闲置有效期。
+同一会话的并发答题按后写入者为准，被覆盖的出队操作会在下次取卡时由到期检查补上。
+"""
+
+import os
+import secrets
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from ..middleware.cache import api_cache
+from ..middleware.cache_backends import CacheBackend, MemoryCacheBackend
+from ..models.flashcard import (
+    AnswerPreview, Flashcard, FlashcardDifficulty, FlashcardResponse, FlashcardStatus, StudyCard
+)
+from .flashcard_counters import TOTAL_KEY, read_counters
+from .spaced_repetition import SpacedRepetitionAlgorithm
+
+STUDY_SESSION_TTL = int(os.getenv("STUDY_SESSION_TTL", "7200"))
+STUDY_SESSION_MAX = int(os.getenv("STUDY_SESSION_MAX", "100"))
+
+# 缓存后端中学习队列的键前缀
+_KEY_PREFIX = "study_queue:"
+
+REVIEW_STATUSES = (FlashcardStatus.LEARNING, FlashcardStatus.REVIEWING, FlashcardStatus.RELEARNING)
+
+
+def _create_store() -> CacheBackend:
+    """共享后端直接复用 API 缓存；进程内时单独建一个，避免会话被 API 缓存的淘汰挤出"""
+    if api_cache.backend.name != "memory":
+        return api_cache.backend
+    return MemoryCacheBackend(default_ttl=STUDY_SESSION_TTL, max_entries=STUDY_SESSION_MAX)
+
+
+_store = _create_store()
+
+# 进程内队列在多实例的 Serverless 环境中会落到不同实例上，此时不提供学习会话
+STUDY_SESSIONS_AVAILABLE = _store.name != "memory" or not os.getenv("VERCEL")
+
+
+def preview_answers(card: Flashcard) -> Dict[str, AnswerPreview]:
+    """四种答案各自的下次间隔与盒子（与 update_flashcard_after_review 的计算一致）"""
+    previews = {}
+    for difficulty in FlashcardDifficulty:
+        _, interval, _ = SpacedRepetitionAlgorithm.calculate_ebbinghaus_schedule(
+            card.ease_factor, card.interval, card.repetitions, difficulty
+        )
+        box = SpacedRepetitionAlgorithm.calculate_leitner_box(card.leitner_box, difficulty, card.repetitions)
+        previews[difficulty.value] = AnswerPreview(
+            interval=max(interval, SpacedRepetitionAlgorithm.get_leitner_interval(box)),
+            leitner_box=box
+        )
+    return previews
+
+
+def _study_card(card: Flashcard) -> StudyCard:
+    return StudyCard(flashcard=FlashcardResponse.model_validate(card), previews=preview_answers(card))
+
+
+def _due_query(now: datetime):
+    return select(Flashcard).where(Flashcard.due_date <= now)
+
+
+class StudyQueue:
+    """一次学习会话的卡片队列"""
+
+    def __init__(self, session_id: str, card_ids: Iterable[int], new_cards: int, review_cards: int):
+        self.session_id = session_id
+        self.new_cards = new_cards
+        self.review_cards = review_cards
+        self.card_ids: List[int] = list(card_ids)
+
+    @property
+    def remaining(self) -> int:
+        return len(self.card_ids)
+
+    def __contains__(self, card_id: int) -> bool:
+        return card_id in self.card_ids
+
+    def peek(self, session: Session, count: int = 1) -> List[StudyCard]:
+        """队首的 count 张卡片（不出队），按最新状态读取，已不再到期的卡片移出队列"""
+        now = datetime.now(timezone.utc)
+        result: List[StudyCard] = []
+        position = 0
+        while len(result) < count and position < len(self.card_ids):
+            batch = self.card_ids[position:position + count - len(result)]
+            cards = {
+                card.id: card
+                for card in session.exec(
+                    _due_query(now).where(
+                        Flashcard.id.in_(batch),
+                        Flashcard.status.in_((FlashcardStatus.NEW,) + REVIEW_STATUSES)
+                    )
+                ).all()
+            }
+            kept = [card_id for card_id in batch if card_id in cards]
+            self.card_ids[position:position + len(batch)] = kept
+            result.extend(_study_card(cards[card_id]) for card_id in kept)
+            position += len(kept)
+        return result
+
+    def discard(self, card_id: int) -> None:
+        """卡片已答完，移出队列"""
+        if card_id in self.card_ids:
+            self.card_ids.remove(card_id)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "card_ids": list(self.card_ids),
+            "new_cards": self.new_cards,
+            "review_cards": self.review_cards,
+        }
+
+
+def create_study_queue(session: Session, max_new: int = 20, max_review: int = 100) -> StudyQueue:
+    """按今日复习分布取出到期卡片（复习卡片在前，新卡片在后），创建学习会话"""
+    total_cards = read_counters(session).get(TOTAL_KEY, (0, 0.0))[0]
+    distribution = SpacedRepetitionAlgorithm.get_review_distribution(total_cards, max_new, max_review)
+    now = datetime.now(timezone.utc)
+
+    review_ids = session.exec(
+        select(Flashcard.id).where(
+            Flashcard.due_date <= now, Flashcard.status.in_(REVIEW_STATUSES)
+        ).order_by(
+            Flashcard.due_date.asc(),
+            Flashcard.leitner_box.desc()  # 高级盒子优先，与 /due 一致
+        ).limit(distribution["max_review_cards"])
+    ).all()
+    new_ids = session.exec(
+        select(Flashcard.id).where(
+            Flashcard.due_date <= now, Flashcard.status == FlashcardStatus.NEW
+        ).order_by(
+            Flashcard.due_date.asc(),
+            Flashcard.id.asc()
+        ).limit(distribution["max_new_cards"])
+    ).all()
+
+    queue = StudyQueue(
+        secrets.token_urlsafe(16),
+        list(review_ids) + list(new_ids),
+        new_cards=len(new_ids),
+        review_cards=len(review_ids)
+    )
+    save_study_queue(queue)
+    return queue
+
+
+def get_study_queue(session_id: str) -> Optional[StudyQueue]:
+    state = _store.get(_KEY_PREFIX + session_id)
+    if state is None:
+        return None
+    return StudyQueue(session_id, state["card_ids"], state["new_cards"], state["review_cards"])
+
+
+def save_study_queue(queue: StudyQueue) -> None:
+    """写回队列状态，有效期从本次访问重新计算"""
+    _store.set(_KEY_PREFIX + queue.session_id, queue.to_state(), ttl=STUDY_SESSION_TTL)
+
+
+def delete_study_queue(session_id: str) -> bool:
+    return _store.delete(_KEY_PREFIX + session_id)
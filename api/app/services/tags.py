@@ -0,0 +1,258 @@
+"""
+标签索引
+
+笔记、记忆卡片、工具、命令的 tags 字段（逗号分隔字符串）在写入时同步到规范化的
+tags / entity_tags 表，并增量维护 tag_counts 中每种实体类型下各标签的数量：
+- 标签过滤走 entity_tags 上的索引，精确匹配（不区分大小写），支持 AND / OR
+- 标签列表与标签云直接读 tag_counts，不再逐行拆分 tags 字段
+"""
+
+import logging
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, event, func, inspect
+from sqlalchemy.orm import Session
+from sqlmodel import select, text
+
+from ..models.command import Command
+from ..models.flashcard import Flashcard
+from ..models.note import Note
+from ..models.tag import EntityTag, Tag, TagCount
+from ..models.tool import Tool
+
+logger = logging.getLogger(__name__)
+
+# 实体类型 -> 模型（模型都有 tags 字段）
+TAGGED_ENTITIES: Dict[str, Any] = {
+    "note": Note,
+    "flashcard": Flashcard,
+    "tool": Tool,
+    "command": Command,
+}
+_ENTITY_TYPES = {model: entity_type for entity_type, model in TAGGED_ENTITIES.items()}
+
+_INSERT_TAG_SQL = text("INSERT INTO tags (key, name) VALUES (:key, :name) ON CONFLICT (key) DO NOTHING")
+
+_SELECT_TAG_IDS_SQL = text("SELECT id, key FROM tags WHERE key IN :keys").bindparams(
+    bindparam("keys", expanding=True)
+)
+
+_SELECT_ENTITY_TAGS_SQL = text(
+    "SELECT entity_id, tag_id FROM entity_tags WHERE entity_type = :entity_type AND entity_id IN :entity_ids"
+).bindparams(bindparam("entity_ids", expanding=True))
+
+_INSERT_ENTITY_TAG_SQL = text(
+    "INSERT INTO entity_tags (entity_type, entity_id, tag_id) VALUES (:entity_type, :entity_id, :tag_id)"
+)
+
+_DELETE_ENTITY_TAG_SQL = text(
+    "DELETE FROM entity_tags WHERE entity_type = :entity_type AND entity_id = :entity_id AND tag_id = :tag_id"
+)
+
+_UPSERT_TAG_COUNT_SQL = text("""
+    INSERT INTO tag_counts (tag_id, entity_type, count)
+    VALUES (:tag_id, :entity_type, :count)
+    ON CONFLICT (tag_id, entity_type) DO UPDATE SET
+        count = tag_counts.count + excluded.count
+""")
+
+
+def parse_tags(value: Optional[str]) -> Dict[str, str]:
+    """拆分 tags 字段，返回 {匹配键: 显示名称}（同一标签不区分大小写只保留第一次出现）"""
+    tags: Dict[str, str] = {}
+    for name in (value or "").split(","):
+        name = name.strip()
+        if name:
+            tags.setdefault(name.casefold(), name)
+    return tags
+
+
+def _ensure_tag_ids(executor, tags: Dict[str, str]) -> Dict[str, int]:
+    """按需创建标签，返回 {匹配键: 标签ID}"""
+    if not tags:
+        return {}
+    executor.execute(_INSERT_TAG_SQL, [{"key": key, "name": name} for key, name in sorted(tags.items())])
+    rows = executor.execute(_SELECT_TAG_IDS_SQL, {"keys": list(tags)}).all()
+    return {row.key: row.id for row in rows}
+
+
+def sync_entity_tags(executor, entity_type: str, entity_tags: Dict[int, Optional[str]]) -> None:
+    """
+    把实体的 tags 字段同步到 entity_tags / tag_counts（在调用方的事务中执行）
+
+    Args:
+        executor: 会话或连接
+        entity_type: 实体类型
+        entity_tags: {实体ID: tags 字段}，值为 None 表示实体已删除
+    """
+    if not entity_tags:
+        return
+    desired_tags = {entity_id: parse_tags(value) for entity_id, value in entity_tags.items()}
+    all_tags: Dict[str, str] = {}
+    for tags in desired_tags.values():
+        for key, name in tags.items():
+            all_tags.setdefault(key, name)
+    tag_ids = _ensure_tag_ids(executor, all_tags)
+
+    existing: Dict[int, set] = {}
+    for row in executor.execute(_SELECT_ENTITY_TAGS_SQL, {
+        "entity_type": entity_type, "entity_ids": list(entity_tags)
+    }).all():
+        existing.setdefault(row.entity_id, set()).add(row.tag_id)
+
+    added: List[Dict[str, Any]] = []
+    removed: List[Dict[str, Any]] = []
+    count_deltas: Dict[int, int] = {}
+    for entity_id, tags in desired_tags.items():
+        desired = {tag_ids[key] for key in tags}
+        current = existing.get(entity_id, set())
+        for tag_id in desired - current:
+            added.append({"entity_type": entity_type, "entity_id": entity_id, "tag_id": tag_id})
+            count_deltas[tag_id] = count_deltas.get(tag_id, 0) + 1
+        for tag_id in current - desired:
+            removed.append({"entity_type": entity_type, "entity_id": entity_id, "tag_id": tag_id})
+            count_deltas[tag_id] = count_deltas.get(tag_id, 0) - 1
+
+    if removed:
+        executor.execute(_DELETE_ENTITY_TAG_SQL, removed)
+    if added:
+        executor.execute(_INSERT_ENTITY_TAG_SQL, added)
+    deltas = [
+        {"tag_id": tag_id, "entity_type": entity_type, "count": delta}
+        for tag_id, delta in sorted(count_deltas.items()) if delta
+    ]
+    if deltas:
+        executor.execute(_UPSERT_TAG_COUNT_SQL, deltas)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    """把本次 flush 中实体 tags 字段的变化同步到标签索引"""
+    changes: Dict[str, Dict[int, Optional[str]]] = {}
+    for obj in session.new:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type is not None and obj.tags:
+            changes.setdefault(entity_type, {})[obj.id] = obj.tags
+    for obj in session.dirty:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type is not None and inspect(obj).attrs.tags.history.has_changes():
+            changes.setdefault(entity_type, {})[obj.id] = obj.tags
+    for obj in session.deleted:
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type is not None:
+            changes.setdefault(entity_type, {})[inspect(obj).identity[0]] = None
+    if changes:
+        connection = session.connection()
+        for entity_type, entity_tags in sorted(changes.items()):
+            sync_entity_tags(connection, entity_type, entity_tags)
+
+
+_installed = False
+
+
+def track_entity_tags() -> None:
+    """为所有会话安装标签索引同步（重复调用无副作用）"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    _installed = True
+
+
+def rebuild_tag_index(session: Session, batch_size: int = 1000) -> None:
+    """按实体表重建标签关联与计数（标签本身保留）"""
+    session.exec(text("DELETE FROM entity_tags"))
+    session.exec(text("DELETE FROM tag_counts"))
+    for entity_type, model in TAGGED_ENTITIES.items():
+        last_id = 0
+        while True:
+            rows = session.exec(
+                select(model.id, model.tags).where(model.id > last_id).order_by(model.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            sync_entity_tags(session, entity_type, {row.id: row.tags for row in rows if row.tags})
+            last_id = rows[-1].id
+
+
+def ensure_tag_index(session: Session) -> None:
+    """标签表为空而实体已有标签时（首次部署）建立标签索引"""
+    if session.exec(select(Tag.id).limit(1)).first() is not None:
+        return
+    for model in TAGGED_ENTITIES.values():
+        if session.exec(select(model.id).where(model.tags != "").limit(1)).first() is not None:
+            break
+    else:
+        return
+    rebuild_tag_index(session)
+    session.commit()
+    logger.info("已建立标签索引")
+
+
+# ==================== 查询 ====================
+
+class TagMatch(str, Enum):
+    """多个标签的匹配方式"""
+    ALL = "all"  # 包含全部标签
+    ANY = "any"  # 包含任一标签
+
+
+def tag_filter(entity_type: str, tags: Optional[str], match_all: bool = True):
+    """
+    列表接口 tags= 参数的过滤条件
+
+    Args:
+        tags: 逗号分隔的标签
+        match_all: True 要求包含全部标签（AND），False 包含任一标签即可（OR）
+
+    Returns:
+        过滤条件；没有有效标签（如 "," 或只有空白）时返回 None，调用方不应过滤
+    """
+    keys = list(parse_tags(tags))
+    if not keys:
+        return None
+    model = TAGGED_ENTITIES[entity_type]
+    matching = select(EntityTag.entity_id).join(Tag, Tag.id == EntityTag.tag_id).where(
+        EntityTag.entity_type == entity_type,
+        Tag.key.in_(keys)
+    )
+    if match_all and len(keys) > 1:
+        matching = matching.group_by(EntityTag.entity_id).having(
+            func.count(EntityTag.tag_id) == len(keys)
+        )
+    return model.id.in_(matching)
+
+
+def tag_counts_query(
+    entity_type: Optional[str] = None,
+    prefix: Optional[str] = None,
+    order_by_count: bool = True
+):
+    """
+    标签及使用次数查询，结果列：name, count
+
+    Args:
+        entity_type: 只统计某种实体，None 为全部实体合计
+        prefix: 按标签前缀过滤（自动补全）
+        order_by_count: 按次数倒序，否则按名称排序
+    """
+    count = func.sum(TagCount.count).label("count")
+    query = select(Tag.name, count).join(TagCount, TagCount.tag_id == Tag.id)
+    if entity_type:
+        query = query.where(TagCount.entity_type == entity_type)
+    if prefix:
+        key = prefix.strip().casefold()
+        # 范围条件可以使用 key 的唯一索引
+        query = query.where(Tag.key >= key, Tag.key < key + "\U0010ffff")
+    query = query.group_by(Tag.id, Tag.name).having(count > 0)
+    if order_by_count:
+        return query.order_by(count.desc(), Tag.name)
+    return query.order_by(Tag.name)
+
+
+def tag_names_query(entity_type: str):
+    """某种实体使用中的全部标签名称（按名称排序）"""
+    return select(Tag.name).join(TagCount, TagCount.tag_id == Tag.id).where(
+        TagCount.entity_type == entity_type,
+        TagCount.count > 0
+    ).order_by(Tag.name)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+同步会话与异步会话吞吐对比
+
+在同一个 FastAPI 应用上挂载两个等价的列表接口（与 GET /todos/ 相同的查询）：
+- /bench/sync: async 路由中直接调用阻塞的 Session（端口迁移前的写法）
+- /bench/async: AsyncSession + await（迁移后的写法）
+
+--latency-ms 在数据库侧为每次查询加入延迟（SQLite 通过自定义函数，PostgreSQL 通过
+pg_sleep），模拟网络往返：同步写法等待期间阻塞事件循环，异步写法可以重叠多个查询。
+
+并发数不要超过连接池容量（默认 SQLite 读连接池 8 + 溢出 10）：同步写法在事件循环上
+等待连接池时，持有连接的请求无法继续执行，会一直等到 DB_POOL_TIMEOUT。
+
+用法：
+    python benchmarks/bench_async_db.py --requests 2000 --concurrency 16 --latency-ms 5
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import (
+    IS_SQLITE, async_engine, async_read_engine, create_async_session, create_db_and_tables,
+    create_session, engine, get_async_session, read_engine
+)
+from app.models.todo import Todo
+
+
+def _install_sleep_function(sync_engine) -> None:
+    """为 SQLite 连接注册 bench_sleep(ms)，在数据库线程中休眠"""
+    @event.listens_for(sync_engine, "connect")
+    def register(dbapi_connection, connection_record):
+        def bench_sleep(ms):
+            time.sleep(ms / 1000)
+            return 0
+        dbapi_connection.create_function("bench_sleep", 1, bench_sleep)
+
+
+def _latency_clause(latency_ms: float):
+    if IS_SQLITE:
+        # 不相关子查询只求值一次，而不是逐行求值
+        return text(f"(SELECT bench_sleep({float(latency_ms)})) = 0")
+    return text(f"(SELECT 1 FROM pg_sleep({float(latency_ms) / 1000})) = 1")
+
+
+def build_app(latency_ms: float) -> FastAPI:
+    def list_query():
+        query = select(Todo).order_by(Todo.created_at.desc()).limit(100)
+        if latency_ms:
+            query = query.where(_latency_clause(latency_ms))
+        return query
+
+    def get_sync_session():
+        # 迁移前的依赖：同步会话
+        with create_session() as session:
+            yield session
+
+    app = FastAPI()
+
+    @app.get("/bench/sync")
+    async def list_sync(session: Session = Depends(get_sync_session)):
+        return [todo.id for todo in session.exec(list_query()).all()]
+
+    @app.get("/bench/async")
+    async def list_async(session: AsyncSession = Depends(get_async_session)):
+        return [todo.id for todo in (await session.exec(list_query())).all()]
+
+    return app
+
+
+async def seed(rows: int) -> None:
+    async with create_async_session() as session:
+        existing = (await session.exec(select(Todo.id).limit(rows))).all()
+        for i in range(rows - len(existing)):
+            session.add(Todo(content=f"benchmark todo {i}"))
+        await session.commit()
+
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120
+    ) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        # 预热连接池
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        latencies.clear()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="同步 / 异步数据库会话吞吐对比")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="每次查询的数据库侧延迟")
+    parser.add_argument("--rows", type=int, default=100, help="预置的 Todo 数量")
+    args = parser.parse_args()
+
+    if IS_SQLITE:
+        # 必须在任何连接建立之前注册
+        for sync_engine in {engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+            _install_sleep_function(sync_engine)
+    create_db_and_tables()
+    await seed(args.rows)
+    app = build_app(args.latency_ms)
+
+    print(f"数据库: {engine.url.render_as_string(hide_password=True)}")
+    print(f"请求数 {args.requests}，并发 {args.concurrency}，查询延迟 {args.latency_ms}ms")
+    for label, path in (("sync (before)", "/bench/sync"), ("async (after)", "/bench/async")):
+        result = await run(app, path, args.requests, args.concurrency)
+        print(
+            f"{label:>14}: {result['rps']:8.1f} req/s  "
+            f"p50 {result['p50_ms']:7.2f}ms  p95 {result['p95_ms']:7.2f}ms  errors {result['errors']}"
+        )
+
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
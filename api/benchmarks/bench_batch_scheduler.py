@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+批量调度引擎与逐张调度对比
+
+随机生成 --cards 张卡片、--reviews 条复习记录（随机分配到卡片，时间随机；默认与
+load_review_history 一样按卡片、时间排好序，--unsorted 则乱序），然后：
+- 向量化：CardStates + replay 重放全部记录
+- 逐张：对 --sample 张卡片逐条调用 update_flashcard_after_review，按单条耗时推算全量耗时，
+  并逐字段核对两种算法在这些卡片上的结果完全一致
+- 写回：把 --write 张复习过的卡片的结果分块 UPDATE 到临时 SQLite 数据库
+
+用法：
+    python benchmarks/bench_batch_scheduler.py --cards 1000000 --reviews 10000000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlmodel import Session, SQLModel
+
+from app.models.flashcard import Flashcard
+from app.services.batch_scheduler import DIFFICULTIES, CardStates, from_datetime64, replay, write_card_states
+from app.services.spaced_repetition import SpacedRepetitionAlgorithm
+
+
+def generate_history(cards: int, reviews: int, seed: int, presorted: bool = True):
+    """随机复习历史：卡片位置、难度编码（again/hard/good/easy 约 15/15/50/20%）、复习时间"""
+    rng = np.random.default_rng(seed)
+    card_index = rng.integers(0, cards, reviews)
+    difficulty = rng.choice(len(DIFFICULTIES), reviews, p=[0.15, 0.15, 0.5, 0.2]).astype(np.int8)
+    start = np.datetime64("2020-01-01T00:00:00", "us")
+    span_us = np.int64(4 * 365 * 86400) * 1_000_000
+    reviewed_at = start + rng.integers(0, span_us, reviews).astype("timedelta64[us]")
+    if presorted:
+        # 与 load_review_history 一样按卡片、时间排序
+        order = np.lexsort((reviewed_at, card_index))
+        card_index, difficulty, reviewed_at = card_index[order], difficulty[order], reviewed_at[order]
+    return card_index, difficulty, reviewed_at
+
+
+def scalar_replay(sample: np.ndarray, card_index, difficulty, reviewed_at):
+    """逐张调用 update_flashcard_after_review，返回 (卡片列表, 复习次数, 耗时)"""
+    selected = np.flatnonzero(np.isin(card_index, sample))
+    selected = selected[np.lexsort((reviewed_at[selected], card_index[selected]))]
+    cards = {int(position): Flashcard(front="", back="") for position in sample}
+    times = from_datetime64(reviewed_at[selected])
+
+    started = time.perf_counter()
+    for position, code, when in zip(card_index[selected].tolist(), difficulty[selected].tolist(), times):
+        SpacedRepetitionAlgorithm.update_flashcard_after_review(cards[position], DIFFICULTIES[code], 0, when)
+    return [cards[int(position)] for position in sample], len(selected), time.perf_counter() - started
+
+
+def compare(states: CardStates, sample: np.ndarray, cards) -> list:
+    """不一致的字段"""
+    expected = CardStates.from_cards(cards)
+    mismatched = []
+    for field in CardStates.FIELDS:
+        actual = getattr(states, field)[sample]
+        wanted = getattr(expected, field)
+        if actual.dtype.kind == "M":
+            actual, wanted = actual.astype(np.int64), wanted.astype(np.int64)
+        if not np.array_equal(actual, wanted):
+            mismatched.append(field)
+    return mismatched
+
+
+def bench_write(states: CardStates, count: int, chunk_size: int) -> float:
+    """写回 count 张复习过的卡片的耗时"""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{directory}/bench.db")
+        SQLModel.metadata.create_all(engine, tables=[Flashcard.__table__])
+        now = datetime.now(timezone.utc)
+        with Session(engine) as session:
+            session.execute(insert(Flashcard.__table__), [
+                {"front": "", "back": "", "due_date": now, "created_at": now, "updated_at": now}
+                for _ in range(count)
+            ])
+            session.commit()
+
+            # 没有复习记录的卡片没有到期时间，与 replay_review_histories 一样只写回复习过的卡片
+            reviewed = np.flatnonzero(states.total_reviews > 0)[:count]
+            subset = CardStates(**{field: getattr(states, field)[reviewed] for field in CardStates.FIELDS})
+            started = time.perf_counter()
+            write_card_states(session, np.arange(1, len(subset) + 1), subset, chunk_size)
+            session.commit()
+            elapsed = time.perf_counter() - started
+        engine.dispose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量调度引擎基准测试")
+    parser.add_argument("--cards", type=int, default=1_000_000, help="卡片数")
+    parser.add_argument("--reviews", type=int, default=10_000_000, help="复习记录数")
+    parser.add_argument("--sample", type=int, default=2000, help="逐张调度（并核对结果）的卡片数")
+    parser.add_argument("--write", type=int, default=100_000, help="写回测试的卡片数，0 跳过")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="每批 UPDATE 的卡片数")
+    parser.add_argument("--unsorted", action="store_true", help="复习记录乱序（重放时需要先排序）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    card_index, difficulty, reviewed_at = generate_history(args.cards, args.reviews, args.seed, presorted=not args.unsorted)
+    print(f"生成 {args.cards:,} 张卡片 / {args.reviews:,} 条复习记录: {time.perf_counter() - started:.2f}s")
+
+    states = CardStates.new(args.cards)
+    started = time.perf_counter()
+    replay(states, card_index, difficulty, reviewed_at)
+    vector_seconds = time.perf_counter() - started
+    print(f"向量化重放: {vector_seconds:.2f}s（{args.reviews / vector_seconds:,.0f} 条/秒）")
+
+    sample = np.random.default_rng(args.seed + 1).choice(args.cards, min(args.sample, args.cards), replace=False)
+    cards, sample_reviews, scalar_seconds = scalar_replay(sample, card_index, difficulty, reviewed_at)
+    per_review = scalar_seconds / max(sample_reviews, 1)
+    print(
+        f"逐张调度: {sample_reviews:,} 条 {scalar_seconds:.2f}s，"
+        f"推算全量 {per_review * args.reviews:.0f}s（{per_review * args.reviews / vector_seconds:.0f}x）"
+    )
+
+    mismatched = compare(states, sample, cards)
+    print("结果核对: " + ("一致" if not mismatched else f"不一致字段 {', '.join(mismatched)}"))
+
+    if args.write:
+        count = min(args.write, args.cards)
+        write_seconds = bench_write(states, count, args.chunk_size)
+        print(
+            f"写回 {count:,} 张卡片（每批 {args.chunk_size}）: {write_seconds:.2f}s，"
+            f"推算全量 {write_seconds * args.cards / count:.0f}s"
+        )
+
+    if mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+按复习记录重建记忆卡片调度状态
+
+修改 SpacedRepetitionAlgorithm 的 DIFFICULTY_MULTIPLIERS / LEITNER_INTERVALS 后，
+或卡片状态与 review_records 不一致时运行：按时间顺序重放每张卡片的全部复习记录，
+分块批量写回难易度、间隔、重复次数、盒子、到期时间等字段，并重建卡片计数表。
+
+运行中的服务进程内的接口缓存与学习队列不会自动失效，建议在停机维护时运行。
+
+用法：
+    python replay_reviews.py [--chunk-size 5000] [--dry-run]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent
+sys.path.append(str(project_root))
+
+from app.database import create_session
+from app.services.batch_scheduler import replay_review_histories
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按复习记录重建记忆卡片调度状态")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="每批 UPDATE 的卡片数")
+    parser.add_argument("--dry-run", action="store_true", help="只计算不提交")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with create_session() as session:
+        updated = replay_review_histories(session, chunk_size=args.chunk_size)
+        if args.dry_run:
+            session.rollback()
+        else:
+            session.commit()
+
+    action = "计算" if args.dry_run else "更新"
+    print(f"✅ 已{action} {updated} 张卡片，用时 {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
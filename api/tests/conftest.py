@@ -0,0 +1,29 @@
+"""
+测试公共配置
+
+导入 app 之前把数据库指向临时目录中的 SQLite 文件，测试不会读写开发数据库。
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_db_dir = tempfile.mkdtemp(prefix="dashboard-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+for name in ("ASYNC_DATABASE_URL", "POSTGRES_URL", "DATABASE_URL_NON_POOLING", "POSTGRES_URL_NON_POOLING"):
+    os.environ.pop(name, None)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """整个测试会话共用的应用客户端（启动时建表）"""
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,13 @@
+"""管理接口访问控制"""
+
+
+def test_admin_disabled_without_token(client, monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get("/admin/cache").status_code == 404
+
+
+def test_admin_requires_matching_token(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.get("/admin/cache").status_code == 403
+    assert client.get("/admin/cache", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/cache", headers={"X-Admin-Token": "secret"}).status_code == 200
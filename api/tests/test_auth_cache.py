@@ -0,0 +1,74 @@
+"""认证缓存：用户表写入后，用户缓存和令牌 claims 都失效"""
+
+from sqlmodel import select
+
+from app.auth.cache import get_cached_claims, get_cached_user
+from app.database import create_session
+from app.models.user import User
+
+# 测试只写入，不需要可验证的哈希
+OTHER_HASH = "$2b$04$" + "x" * 53
+
+
+def _login(client, username: str) -> str:
+    """注册并登录，访问一次 /auth/me 让用户和令牌进入缓存"""
+    credentials = {"username": username, "password": "secret123"}
+    assert client.post("/auth/register", json=credentials).status_code == 200
+    token = client.post("/auth/login", json=credentials).json()["access_token"]
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert get_cached_user(username) is not None
+    assert get_cached_claims(token) is not None
+    return token
+
+
+def _update_user(current: str, **fields) -> None:
+    with create_session() as session:
+        user = session.exec(select(User).where(User.username == current)).one()
+        for name, value in fields.items():
+            setattr(user, name, value)
+        session.add(user)
+        session.flush()
+        # flush 后立即失效，提交前不会读到旧的缓存
+        assert get_cached_user(current) is None
+        session.commit()
+
+
+def test_password_change_invalidates_user_and_token(client):
+    token = _login(client, "cache-password")
+    _update_user("cache-password", password_hash=OTHER_HASH)
+
+    assert get_cached_user("cache-password") is None
+    assert get_cached_claims(token) is None
+    # 令牌重新校验后再次进入缓存
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert get_cached_claims(token) is not None
+
+
+def test_rename_invalidates_old_username(client):
+    token = _login(client, "cache-rename")
+    _update_user("cache-rename", username="cache-renamed")
+
+    assert get_cached_user("cache-rename") is None
+    assert get_cached_claims(token) is None
+    # 令牌中的用户名已不存在
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 404
+
+
+def test_deleted_user_is_not_served_from_cache(client):
+    token = _login(client, "cache-delete")
+    with create_session() as session:
+        session.delete(session.exec(select(User).where(User.username == "cache-delete")).one())
+        session.commit()
+
+    assert get_cached_user("cache-delete") is None
+    assert get_cached_claims(token) is None
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 404
+
+
+def test_other_users_stay_cached(client):
+    bystander = _login(client, "cache-bystander")
+    _login(client, "cache-updated")
+    _update_user("cache-updated", password_hash=OTHER_HASH)
+
+    assert get_cached_user("cache-bystander") is not None
+    assert get_cached_claims(bystander) is not None
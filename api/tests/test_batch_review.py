@@ -0,0 +1,57 @@
+"""批量复习：复习记录ID与请求顺序对应，拒绝早于最后复习时间的离线记录"""
+
+from datetime import datetime, timedelta, timezone
+
+
+def _card(client, front):
+    response = client.post("/flashcards/", json={"front": front, "back": "back"})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_record_ids_follow_request_order(client):
+    first, second = _card(client, "batch-a"), _card(client, "batch-b")
+    start = datetime.now(timezone.utc) - timedelta(days=3)
+    reviews = [
+        {"flashcard_id": second, "difficulty": "good", "response_time": 1000,
+         "reviewed_at": start.isoformat()},
+        {"flashcard_id": first, "difficulty": "again", "response_time": 2000,
+         "reviewed_at": (start + timedelta(hours=1)).isoformat()},
+        {"flashcard_id": second, "difficulty": "easy", "response_time": 3000,
+         "reviewed_at": (start + timedelta(days=1)).isoformat()},
+    ]
+    response = client.post("/flashcards/reviews/batch", json={"reviews": reviews})
+    assert response.status_code == 200, response.text
+    results = [result["review_record"] for result in response.json()["results"]]
+    assert [(r["flashcard_id"], r["difficulty"], r["response_time"]) for r in results] == [
+        (review["flashcard_id"], review["difficulty"], review["response_time"]) for review in reviews
+    ]
+
+    # 返回的ID与数据库中的记录一致
+    stored = {r["id"]: r for card in (first, second) for r in client.get(f"/flashcards/{card}/reviews").json()}
+    for result in results:
+        assert stored[result["id"]]["response_time"] == result["response_time"]
+        assert stored[result["id"]]["difficulty"] == result["difficulty"]
+
+
+def test_reviews_older_than_last_review_are_rejected(client):
+    card = _card(client, "batch-stale")
+    now = datetime.now(timezone.utc)
+    assert client.post("/flashcards/reviews/batch", json={"reviews": [
+        {"flashcard_id": card, "difficulty": "good", "response_time": 1000,
+         "reviewed_at": (now - timedelta(hours=1)).isoformat()},
+    ]}).status_code == 200
+    before = client.get(f"/flashcards/{card}").json()
+
+    response = client.post("/flashcards/reviews/batch", json={"reviews": [
+        {"flashcard_id": card, "difficulty": "good", "response_time": 1000,
+         "reviewed_at": (now - timedelta(minutes=30)).isoformat()},
+        {"flashcard_id": card, "difficulty": "again", "response_time": 1000,
+         "reviewed_at": (now - timedelta(hours=2)).isoformat()},
+    ]})
+    assert response.status_code == 400
+    assert "第 2 条" in response.json()["detail"]
+
+    # 整批拒绝，卡片和复习记录都没有变化
+    assert client.get(f"/flashcards/{card}").json() == before
+    assert len(client.get(f"/flashcards/{card}/reviews").json()) == 1
@@ -0,0 +1,119 @@
+"""批量调度引擎与逐张调用 update_flashcard_after_review 的结果逐字段一致"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from itertools import product
+
+import numpy as np
+import pytest
+
+from app.models.flashcard import Flashcard, FlashcardDifficulty, FlashcardStatus, LeitnerBox
+from app.services.batch_scheduler import (
+    DIFFICULTIES, CardStates, encode, replay, review, to_datetime64
+)
+from app.services.spaced_repetition import SpacedRepetitionAlgorithm
+
+START = datetime(2024, 3, 1, 8, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def _card(**fields) -> Flashcard:
+    return Flashcard(front="front", back="back", **fields)
+
+
+def _snapshot(card: Flashcard) -> dict:
+    return {field: getattr(card, field) for field in CardStates.FIELDS}
+
+
+def _assert_same(states: CardStates, cards) -> None:
+    for position, (row, card) in enumerate(zip(states.rows(), cards)):
+        assert row == _snapshot(card), f"card {position}"
+
+
+# 复习前的状态：覆盖每种状态、最低和最高盒子、重复次数 3 前后、以及会超过 365 天上限的间隔
+INITIAL_STATES = [
+    dict(),
+    dict(status=FlashcardStatus.LEARNING, repetitions=1, interval=1, leitner_box=LeitnerBox.BOX_2),
+    dict(status=FlashcardStatus.REVIEWING, repetitions=2, interval=6, leitner_box=LeitnerBox.BOX_3),
+    dict(status=FlashcardStatus.REVIEWING, repetitions=5, interval=300, ease_factor=2.8,
+         leitner_box=LeitnerBox.BOX_7, streak=5, max_streak=7),
+    dict(status=FlashcardStatus.RELEARNING, repetitions=0, interval=1, ease_factor=1.3,
+         leitner_box=LeitnerBox.BOX_6),
+    dict(status=FlashcardStatus.REVIEWING, repetitions=8, interval=200, ease_factor=1.4,
+         leitner_box=LeitnerBox.BOX_6, total_reviews=8, correct_reviews=8, streak=8, max_streak=8),
+]
+
+
+def test_single_review_matches_for_every_answer_and_state():
+    cases = list(product(INITIAL_STATES, DIFFICULTIES))
+    cards = [_card(due_date=START, last_review=START - timedelta(days=1), **fields) for fields, _ in cases]
+    states = CardStates.from_cards(cards)
+    difficulty = encode(DIFFICULTIES, (answer for _, answer in cases))
+    reviewed_at = [START + timedelta(minutes=i) for i in range(len(cases))]
+
+    review(states, np.arange(len(cases)), difficulty, to_datetime64(reviewed_at))
+    for card, (_, answer), when in zip(cards, cases, reviewed_at):
+        SpacedRepetitionAlgorithm.update_flashcard_after_review(card, answer, 1000, when)
+
+    _assert_same(states, cards)
+    # 用例确实覆盖了最高盒子与间隔上限
+    assert LeitnerBox.BOX_7 in {card.leitner_box for card in cards}
+    assert any(card.interval == 365 for card in cards)
+
+
+def _replay_both(history, card_count):
+    """history: [(卡片位置, 难度, 复习时间)]，同一卡片同一时间的记录按列表顺序"""
+    # CardStates.new 的到期时间未设置
+    cards = [_card(due_date=None) for _ in range(card_count)]
+    for position, answer, when in sorted(history, key=lambda item: (item[0], item[2])):
+        SpacedRepetitionAlgorithm.update_flashcard_after_review(cards[position], answer, 1000, when)
+
+    states = CardStates.new(card_count)
+    replay(
+        states,
+        np.array([position for position, _, _ in history], dtype=np.int64),
+        encode(DIFFICULTIES, (answer for _, answer, _ in history)),
+        to_datetime64(when for _, _, when in history),
+    )
+    return states, cards
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_replay_matches_sequential_reviews(seed):
+    rng = random.Random(seed)
+    card_count = 40
+    history = []
+    for position in range(card_count):
+        when = START + timedelta(seconds=rng.randrange(86400))
+        # 偏向答对，让部分卡片升到最高盒子并达到间隔上限
+        for _ in range(rng.randrange(0, 25)):
+            answer = rng.choices(DIFFICULTIES, weights=[1, 2, 6, 4])[0]
+            history.append((position, answer, when))
+            when += timedelta(days=rng.randrange(0, 400), microseconds=rng.randrange(1_000_000))
+    rng.shuffle(history)
+
+    states, cards = _replay_both(history, card_count)
+    _assert_same(states, cards)
+    assert any(card.leitner_box == LeitnerBox.BOX_7 for card in cards)
+    assert any(card.interval == 365 for card in cards)
+    assert any(card.status == FlashcardStatus.NEW for card in cards)
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_replay_keeps_input_order_for_equal_timestamps(shuffle):
+    when = START + timedelta(days=3)
+    again, good, easy = FlashcardDifficulty.AGAIN, FlashcardDifficulty.GOOD, FlashcardDifficulty.EASY
+    history = [
+        (0, good, START),
+        (0, again, when), (0, good, when), (0, easy, when),
+        (1, easy, when), (1, again, when),
+        (1, good, START),
+    ]
+    if shuffle:
+        # 打乱不同时间的记录，同一时间的记录保持相对顺序（走排序分支）
+        history = [history[6], history[0], history[4], history[1], history[2], history[5], history[3]]
+
+    states, cards = _replay_both(history, 2)
+    _assert_same(states, cards)
+    # 同一时间的记录按输入顺序回放，顺序不同时连续答对数不同
+    assert (cards[0].streak, cards[0].correct_reviews) == (2, 3)
+    assert (cards[1].streak, cards[1].correct_reviews) == (0, 2)
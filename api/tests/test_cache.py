@@ -0,0 +1,247 @@
+"""APICache：TTL 与标签失效"""
+
+from app.middleware.cache import APICache
+
+
+def test_explicit_zero_ttl_is_not_replaced_by_default():
+    cache = APICache(default_ttl=300)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+
+    cache.set("b", 2)
+    assert cache.get("b") == 2
+
+
+def test_invalidate_tags_removes_tagged_entries_only():
+    cache = APICache()
+    cache.set("a", 1, tags=["notes"])
+    cache.set("b", 2, tags=["todos"])
+    assert cache.invalidate_tags("notes") == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+# ==================== cache_response：合并计算 ====================
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app.middleware.cache import api_cache, cache_response, invalidate_cache_tags
+
+
+def make_request(path: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clear_api_cache():
+    api_cache.clear()
+    yield
+    api_cache.clear()
+
+
+def test_coalesced_compute_survives_leader_cancellation(engine):
+    release = asyncio.Event()
+    used_sessions = []
+
+    @cache_response(ttl=60, tags=["test.coalesce"])
+    async def endpoint(session: Session):
+        await release.wait()
+        used_sessions.append(session)
+        return session.execute(text("SELECT 1")).scalar()
+
+    async def scenario():
+        leader_session = Session(engine)
+        leader = asyncio.ensure_future(endpoint(session=leader_session, _cache_request=make_request("/coalesce")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(endpoint(session=Session(engine), _cache_request=make_request("/coalesce")))
+        await asyncio.sleep(0)
+
+        # 发起者断开，依赖项随即关闭它的会话
+        leader.cancel()
+        leader_session.close()
+        release.set()
+        return leader_session, await follower, leader
+
+    leader_session, follower_result, leader = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert follower_result == 1
+    assert len(used_sessions) == 1
+    assert used_sessions[0] is not leader_session
+
+
+def test_result_is_not_cached_when_tags_invalidated_during_compute(engine):
+    calls = []
+
+    @cache_response(ttl=60, tags=["test.race"])
+    async def endpoint(session: Session):
+        calls.append(1)
+        if len(calls) == 1:
+            # 计算期间发生写入
+            invalidate_cache_tags("test.race")
+        return len(calls)
+
+    async def scenario():
+        first = await endpoint(session=Session(engine), _cache_request=make_request("/race"))
+        second = await endpoint(session=Session(engine), _cache_request=make_request("/race"))
+        third = await endpoint(session=Session(engine), _cache_request=make_request("/race"))
+        return first, second, third
+
+    assert asyncio.run(scenario()) == (1, 2, 2)
+
+
+# ==================== cache_response：stale-while-revalidate ====================
+
+import time
+
+from app.middleware import cache as cache_module
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可拨动的墙钟：fresh_until 按 time.time 判断，条目本身的有效期按 monotonic 计算不受影响"""
+    now = [time.time()]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+async def _drain_background():
+    while cache_module._background_tasks:
+        await asyncio.gather(*cache_module._background_tasks, return_exceptions=True)
+
+
+def test_stale_entry_is_served_once_while_refreshing(clock):
+    calls = []
+
+    @cache_response(ttl=10, stale_ttl=60)
+    async def endpoint():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        request = make_request("/swr")
+        results = [await endpoint(_cache_request=request)]
+        clock[0] += 11
+        # 过期后的并发请求都直接拿到旧值，只触发一次后台刷新
+        results += await asyncio.gather(endpoint(_cache_request=request), endpoint(_cache_request=request))
+        await _drain_background()
+        results.append(await endpoint(_cache_request=request))
+        return results
+
+    assert asyncio.run(scenario()) == [1, 1, 1, 2]
+    assert len(calls) == 2
+    counters = api_cache.metrics.snapshot()["GET:/swr"]
+    assert (counters["misses"], counters["stale_hits"], counters["hits"]) == (1, 2, 1)
+    assert counters["refreshes"] == 1
+
+
+def test_failed_refresh_keeps_stale_value(clock):
+    calls = []
+
+    @cache_response(ttl=10, stale_ttl=60)
+    async def endpoint():
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("backend down")
+        return "original"
+
+    async def scenario():
+        request = make_request("/swr-failure")
+        results = [await endpoint(_cache_request=request)]
+        clock[0] += 11
+        results.append(await endpoint(_cache_request=request))
+        await _drain_background()
+        # 刷新失败不覆盖旧值，下一次请求仍返回旧值并再次尝试刷新
+        results.append(await endpoint(_cache_request=request))
+        await _drain_background()
+        return results
+
+    assert asyncio.run(scenario()) == ["original"] * 3
+    assert len(calls) == 3
+    assert api_cache.metrics.snapshot()["GET:/swr-failure"]["refreshes"] == 2
+
+
+# ==================== cache_response：缓存编码后的响应 ====================
+
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    created_at: datetime
+
+
+def test_encoded_hit_replays_identical_response():
+    calls = []
+
+    @cache_response(ttl=60, encoded=True, response_model=Item)
+    async def endpoint():
+        calls.append(1)
+        # 多余的字段按 response_model 过滤
+        return {"id": 1, "name": "条目", "created_at": datetime(2024, 1, 2, 3, 4, 5), "secret": "x"}
+
+    async def scenario():
+        request = make_request("/encoded")
+        return await endpoint(_cache_request=request), await endpoint(_cache_request=request)
+
+    miss, hit = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert hit is not miss
+    for response in (miss, hit):
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.body == '{"id":1,"name":"条目","created_at":"2024-01-02T03:04:05"}'.encode()
+    assert hit.headers == miss.headers
+
+
+def test_encoded_hit_keeps_status_and_headers_of_returned_response():
+    @cache_response(ttl=60, encoded=True)
+    async def endpoint():
+        return JSONResponse({"created": True}, status_code=201, headers={"X-Total-Count": "3"})
+
+    async def scenario():
+        request = make_request("/encoded-response")
+        return await endpoint(_cache_request=request), await endpoint(_cache_request=request)
+
+    miss, hit = asyncio.run(scenario())
+    for response in (miss, hit):
+        assert response.status_code == 201
+        assert response.headers["x-total-count"] == "3"
+        assert response.headers["content-type"] == "application/json"
+        assert response.body == b'{"created":true}'
+    assert hit.headers == miss.headers
+
+
+def test_response_model_mismatch_is_not_cached():
+    calls = []
+
+    @cache_response(ttl=60, encoded=True, response_model=Item)
+    async def endpoint():
+        calls.append(1)
+        return {"id": "not-a-number", "name": "bad"}
+
+    async def scenario():
+        request = make_request("/encoded-invalid")
+        for _ in range(2):
+            with pytest.raises(ValidationError):
+                await endpoint(_cache_request=request)
+
+    asyncio.run(scenario())
+    # 校验失败的结果没有写入缓存，每次请求都重新执行
+    assert len(calls) == 2
+    assert not [key for key in api_cache.keys() if "/encoded-invalid" in key]
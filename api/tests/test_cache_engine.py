@@ -0,0 +1,73 @@
+"""TTLLRUCache：LRU 驱逐顺序、TTL 过期顺序与字节上限"""
+
+from app.middleware.cache_engine import TTLLRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cache(**kwargs):
+    clock = FakeClock()
+    removed = []
+    cache = TTLLRUCache(clock=clock, on_remove=lambda key, reason, size: removed.append((key, reason)), **kwargs)
+    return cache, clock, removed
+
+
+def test_evicts_least_recently_used():
+    cache, _, removed = make_cache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a 变为最近使用
+    cache.set("c", 3)
+    assert removed == [("b", "evicted")]
+    assert cache.keys() == ["a", "c"]
+
+
+def test_expires_in_expiry_order_not_insertion_order():
+    cache, clock, removed = make_cache()
+    cache.set("long", 1, ttl=30)
+    cache.set("short", 2, ttl=10)
+    cache.set("middle", 3, ttl=20)
+
+    clock.now = 10
+    assert cache.get("short") is None
+    assert cache.get("middle") == 3
+    clock.now = 25
+    assert cache.purge_expired() == 1
+    assert cache.keys() == ["long"]
+    assert removed == [("short", "expired"), ("middle", "expired")]
+
+
+def test_replaced_entry_keeps_new_ttl():
+    cache, clock, removed = make_cache()
+    cache.set("a", 1, ttl=10)
+    cache.set("a", 2, ttl=100)
+    # 旧的过期记录仍在堆中，不能删掉新值
+    clock.now = 50
+    assert cache.purge_expired() == 0
+    assert cache.get("a") == 2
+    assert removed == [("a", "replaced")]
+
+
+def test_zero_ttl_expires_immediately():
+    cache, _, _ = make_cache(default_ttl=300)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+
+
+def test_byte_limit_evicts_lru_and_rejects_oversized_values():
+    cache, _, removed = make_cache(max_bytes=10)
+    cache.set("a", "x", size=4)
+    cache.set("b", "x", size=4)
+    cache.set("c", "x", size=4)
+    assert removed == [("a", "evicted")]
+    assert cache.total_bytes == 8
+
+    assert cache.set("huge", "x", size=11) is False
+    assert "huge" not in cache
+    assert cache.total_bytes == 8
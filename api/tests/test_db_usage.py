@@ -0,0 +1,19 @@
+"""按请求统计连接池检出次数：没有访问数据库的请求为 0"""
+
+from app.middleware import db_usage
+
+
+def test_routes_without_db_access_report_zero_checkouts(client):
+    assert client.get("/health").headers["x-db-checkouts"] == "0"
+
+    # 声明了会话依赖，但缓存命中时不执行查询，会话不会检出连接
+    client.post("/flashcards/", json={"front": "db-usage", "back": "b"})
+    miss = client.get("/flashcards/stats")
+    assert miss.status_code == 200
+    assert int(miss.headers["x-db-checkouts"]) >= 1
+    hit = client.get("/flashcards/stats")
+    assert hit.json() == miss.json()
+    assert hit.headers["x-db-checkouts"] == "0"
+
+    stats = db_usage.snapshot()["/flashcards/stats"]
+    assert stats["requests"] - stats["requests_with_db"] >= 1
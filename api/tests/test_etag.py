@@ -0,0 +1,31 @@
+"""HTTP 条件请求：写入后不再返回 304"""
+
+
+def test_write_changes_etag(client):
+    created = client.post("/notes/", json={"title": "etag", "content": "v1"})
+    assert created.status_code == 200, created.text
+    note_id = created.json()["id"]
+
+    first = client.get("/notes/")
+    etag = first.headers["etag"]
+    assert client.get("/notes/", headers={"If-None-Match": etag}).status_code == 304
+
+    updated = client.put(f"/notes/{note_id}", json={"content": "v2"})
+    assert updated.status_code == 200, updated.text
+
+    after_write = client.get("/notes/", headers={"If-None-Match": etag})
+    assert after_write.status_code == 200
+    assert after_write.headers["etag"] != etag
+    assert client.get("/notes/", headers={"If-None-Match": after_write.headers["etag"]}).status_code == 304
+
+
+def test_raw_sql_write_changes_etag(client):
+    etag = client.get("/notes/").headers["etag"]
+
+    from sqlmodel import text
+    from app.database import create_session
+    with create_session() as session:
+        session.exec(text("UPDATE notes SET content = content || '!'"))
+        session.commit()
+
+    assert client.get("/notes/", headers={"If-None-Match": etag}).status_code == 200
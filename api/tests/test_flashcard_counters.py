@@ -0,0 +1,103 @@
+"""卡片计数表与按 flashcards 表全量统计的结果一致"""
+
+import json
+
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import select, text
+
+from app.models.flashcard import Flashcard, FlashcardDifficulty, FlashcardStatus, LeitnerBox
+from app.services.flashcard_counters import (
+    RETENTION_KEY, TOTAL_KEY, _column_value, read_counters
+)
+from app.services.spaced_repetition import SpacedRepetitionAlgorithm
+
+
+def _expected_counts(session):
+    counts = {TOTAL_KEY: session.exec(text("SELECT COUNT(*) FROM flashcards")).one()[0]}
+    for dimension, enum_cls in (("status", FlashcardStatus), ("leitner_box", LeitnerBox)):
+        rows = session.exec(text(f"SELECT {dimension}, COUNT(*) FROM flashcards GROUP BY {dimension}")).all()
+        for value, count in rows:
+            counts[(dimension, _column_value(enum_cls, value))] = count
+    row = session.exec(text(
+        "SELECT COUNT(*), COALESCE(SUM(correct_reviews * 100.0 / total_reviews), 0) "
+        "FROM flashcards WHERE total_reviews > 0"
+    )).one()
+    return counts, (row[0], row[1])
+
+
+def assert_counters_match():
+    from app.database import create_session
+    with create_session() as session:
+        expected, retention = _expected_counts(session)
+        counters = read_counters(session)
+    actual = {key: count for key, (count, _) in counters.items() if key != RETENTION_KEY and count}
+    assert actual == expected
+    count, amount = counters.get(RETENTION_KEY, (0, 0.0))
+    assert count == retention[0]
+    assert amount == pytest.approx(retention[1])
+
+
+def test_counters_follow_every_write_path(client):
+    created = [
+        client.post("/flashcards/", json={"front": f"counter-{i}", "back": "b"}).json()["id"]
+        for i in range(4)
+    ]
+    assert_counters_match()
+
+    assert client.put(f"/flashcards/{created[0]}", json={"status": "suspended"}).status_code == 200
+    assert_counters_match()
+
+    for difficulty in ("good", "easy", "again"):
+        response = client.post(f"/flashcards/{created[1]}/review", json={
+            "flashcard_id": created[1], "difficulty": difficulty, "response_time": 1000
+        })
+        assert response.status_code == 200, response.text
+    assert_counters_match()
+
+    assert client.post("/flashcards/reviews/batch", json={"reviews": [
+        {"flashcard_id": created[2], "difficulty": "good", "response_time": 1000},
+        {"flashcard_id": created[3], "difficulty": "hard", "response_time": 1000},
+    ]}).status_code == 200
+    assert_counters_match()
+
+    assert client.delete(f"/flashcards/{created[2]}").status_code == 200
+    assert_counters_match()
+
+    body = "\n".join(json.dumps({"front": f"counter-import-{i}", "back": "b", "leitner_box": "box_3"})
+                     for i in range(3))
+    response = client.post("/flashcards/import", content=body.encode(),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["imported"] == 3
+    assert_counters_match()
+
+
+def test_concurrent_reviews_of_the_same_card_do_not_drift(client):
+    from app.database import create_session
+    card_id = client.post("/flashcards/", json={"front": "counter-race", "back": "b"}).json()["id"]
+
+    # 两个请求都在对方提交前读到了同一张卡片（box_1）
+    first, second = create_session(), create_session()
+    try:
+        cards = [s.exec(select(Flashcard).where(Flashcard.id == card_id)).one() for s in (first, second)]
+        for card in cards:
+            SpacedRepetitionAlgorithm.update_flashcard_after_review(card, FlashcardDifficulty.GOOD, 1000)
+        first.commit()
+        second.commit()
+    finally:
+        first.close()
+        second.close()
+    assert_counters_match()
+
+    first, second = create_session(), create_session()
+    try:
+        cards = [s.exec(select(Flashcard).where(Flashcard.id == card_id)).one() for s in (first, second)]
+        first.delete(cards[0])
+        first.commit()
+        SpacedRepetitionAlgorithm.update_flashcard_after_review(cards[1], FlashcardDifficulty.EASY, 1000)
+        with pytest.raises(StaleDataError):
+            second.commit()
+    finally:
+        first.close()
+        second.close()
+    assert_counters_match()
@@ -0,0 +1,82 @@
+"""流式导入：逐行校验失败只跳过该行，导入后 ETag 变化"""
+
+import json
+
+
+def _import(client, body: str, content_type: str):
+    response = client.post(
+        "/flashcards/import", content=body.encode(), headers={"Content-Type": content_type}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _errors(job):
+    return {error["line"]: error["error"] for error in job["errors"]}
+
+
+def test_ndjson_row_errors_are_reported_per_line(client):
+    lines = [
+        json.dumps({"front": "import-ndjson-1", "back": "a"}),
+        "{not json",
+        "",
+        json.dumps(["front", "back"]),
+        json.dumps({"back": "missing front"}),
+        json.dumps({"front": "import-ndjson-bad-status", "back": "b", "status": "unknown"}),
+        json.dumps({"front": "import-ndjson-2", "back": "c", "tags": "导入"}),
+    ]
+    job = _import(client, "\n".join(lines) + "\n", "application/x-ndjson")
+
+    assert job["status"] == "completed"
+    assert (job["rows"], job["imported"], job["failed"]) == (6, 2, 4)
+    errors = _errors(job)
+    assert sorted(errors) == [2, 4, 5, 6]
+    assert errors[4] == "每行应为一个 JSON 对象"
+    assert errors[5].startswith("front:")
+    assert errors[6].startswith("status:")
+
+    fronts = {card["front"] for card in client.get("/flashcards/", params={"tags": "导入"}).json()["data"]}
+    assert fronts == {"import-ndjson-2"}
+
+
+def test_csv_row_errors_use_physical_line_numbers(client):
+    body = (
+        "front,back,leitner_box\n"
+        "import-csv-1,\"多行\n背面\",box_2\n"
+        "import-csv-2,b,box_9\n"
+        ",b,\n"
+        "import-csv-3,c,\n"
+    )
+    job = _import(client, body, "text/csv")
+
+    assert job["status"] == "completed"
+    assert (job["rows"], job["imported"], job["failed"]) == (4, 2, 2)
+    errors = _errors(job)
+    # 引号内的换行属于同一条记录，行号为记录结束的物理行
+    assert sorted(errors) == [4, 5]
+    assert errors[4].startswith("leitner_box:")
+    assert errors[5].startswith("front:")
+
+
+def test_csv_without_required_columns_fails_the_job(client):
+    job = _import(client, "front,category\nx,y\n", "text/csv")
+    assert job["status"] == "failed"
+    assert "back" in job["message"]
+    assert job["imported"] == 0
+
+
+def test_import_changes_flashcards_etag(client):
+    etag = client.get("/flashcards/").headers["etag"]
+    _import(client, json.dumps({"front": "import-etag", "back": "x"}) + "\n", "application/x-ndjson")
+    assert client.get("/flashcards/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_import_jobs_are_not_revalidated(client):
+    listed = client.get("/flashcards/imports")
+    assert "etag" not in listed.headers
+    assert listed.headers["cache-control"] == "no-store"
+
+    job = _import(client, "front\nx\n", "text/csv")
+    response = client.get("/flashcards/imports", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert job["id"] in [item["id"] for item in response.json()]
@@ -0,0 +1,74 @@
+"""卡片列表的总数模式：estimate 在 SQLite 上退回精确计数，none 不计算总数"""
+
+import pytest
+from sqlmodel import func, select
+
+from app.database import create_session
+from app.models.flashcard import Flashcard
+from app.services.pagination import planner_row_estimate
+
+CATEGORY = "total-mode"
+
+
+@pytest.fixture(scope="module")
+def cards(client):
+    return [
+        client.post("/flashcards/", json={"front": f"total-{i}", "back": "b", "category": CATEGORY}).json()["id"]
+        for i in range(5)
+    ]
+
+
+def _list(client, **params):
+    response = client.get("/flashcards/", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_planner_estimate_is_unavailable_on_sqlite():
+    with create_session() as session:
+        assert planner_row_estimate(session, select(Flashcard)) is None
+
+
+def test_estimate_falls_back_to_exact_count(client, cards):
+    # 有过滤条件时走查询计划器估计，SQLite 上退回 COUNT(*)
+    page = _list(client, category=CATEGORY, total="estimate", limit=2)
+    assert (page["total"], page["total_estimated"]) == (len(cards), False)
+    assert page["has_more"] is True
+
+    # 无过滤条件时读计数表，计数表是精确值
+    with create_session() as session:
+        exact = session.exec(select(func.count(Flashcard.id))).one()
+    page = _list(client, total="estimate", limit=1)
+    assert (page["total"], page["total_estimated"]) == (exact, False)
+
+
+def test_estimate_is_marked_when_planner_answers(client, cards, monkeypatch):
+    from app.routers import flashcards
+    monkeypatch.setattr(flashcards, "planner_row_estimate", lambda session, query: 1000)
+
+    page = _list(client, category=CATEGORY, total="estimate")
+    assert (page["total"], page["total_estimated"]) == (1000, True)
+    # 估计值只影响 total，数据和分页不变
+    assert [card["id"] for card in page["data"]] == [card["id"] for card in _list(client, category=CATEGORY)["data"]]
+
+
+def test_none_skips_total_and_pages_by_extra_row(client, cards):
+    seen = []
+    cursor = None
+    while True:
+        params = {"category": CATEGORY, "total": "none", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = _list(client, **params)
+        assert (page["total"], page["total_estimated"]) == (None, False)
+        seen.extend(card["id"] for card in page["data"])
+        assert page["has_more"] is (page["next_cursor"] is not None)
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+    assert sorted(seen) == sorted(cards)
+
+    # 剩余行数恰好等于 limit 时没有下一页
+    page = _list(client, category=CATEGORY, total="none", limit=len(cards))
+    assert len(page["data"]) == len(cards)
+    assert (page["has_more"], page["next_cursor"]) == (False, None)
@@ -0,0 +1,42 @@
+"""复习负载预测：未设置到期时间的卡片与按天缓存"""
+
+import warnings
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from app.services.batch_scheduler import CardStates
+from app.services.forecast import DEFAULT_ANSWER_DISTRIBUTION, ForecastInputs, simulate
+
+
+def test_cards_without_due_date_are_due_today():
+    states = CardStates.new(3)
+    states.status[:] = 1  # 非新卡片，按到期时间进入日程
+    states.due_date[1] = np.datetime64("2024-01-03T12:00", "us")
+    probabilities = np.tile(np.array(DEFAULT_ANSWER_DISTRIBUTION), (3, 1))
+    inputs = ForecastInputs(states, probabilities, np.full(3, 1000.0))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result = simulate(inputs, days=5, new_per_day=0, runs=1, now=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    assert result["reviews"][0] == 2
+    assert result["reviews"][2] >= 1
+
+
+def test_forecast_cache_key_changes_with_utc_date(client):
+    from app.main import app
+    from app.middleware import api_cache
+    from app.routers.flashcards import _utc_today
+
+    def forecast_keys():
+        return {key for key in api_cache.keys() if key.startswith("GET:/flashcards/forecast")}
+
+    before = forecast_keys()
+    try:
+        for day in (date(2024, 1, 1), date(2024, 1, 1), date(2024, 1, 2)):
+            app.dependency_overrides[_utc_today] = lambda day=day: day
+            response = client.get("/flashcards/forecast", params={"days": 3, "runs": 1})
+            assert response.status_code == 200, response.text
+    finally:
+        app.dependency_overrides.pop(_utc_today, None)
+    assert len(forecast_keys() - before) == 2
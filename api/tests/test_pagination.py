@@ -0,0 +1,79 @@
+"""游标分页：游标编解码往返与排序值相同时按 id 定序"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine, insert, select
+
+from app.services.pagination import Keyset
+
+metadata = MetaData()
+items = Table(
+    "items", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("score", Integer),
+    Column("created_at", DateTime),
+)
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with engine.connect() as connection:
+        # 分数大量重复，创建时间也有重复
+        connection.execute(insert(items), [
+            {"id": i, "score": i % 3, "created_at": start + timedelta(hours=i // 4)}
+            for i in range(1, 21)
+        ])
+        yield connection
+    engine.dispose()
+
+
+def fetch_all_pages(connection, keyset: Keyset, limit: int):
+    ids, cursor, pages = [], None, 0
+    while True:
+        rows = connection.execute(keyset.apply(select(items), cursor=cursor, limit=limit)).all()
+        page, cursor = keyset.page(rows, limit)
+        ids.extend(row.id for row in page)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 20])
+def test_pages_cover_every_row_once_in_order(connection, limit):
+    keyset = Keyset((items.c.score, True), (items.c.created_at, False), (items.c.id, False))
+    expected = [
+        row.id for row in connection.execute(
+            select(items).order_by(items.c.score.desc(), items.c.created_at, items.c.id)
+        )
+    ]
+    ids, pages = fetch_all_pages(connection, keyset, limit)
+    assert ids == expected
+    assert pages == -(-len(expected) // limit)
+
+
+def test_cursor_round_trip_preserves_types():
+    keyset = Keyset((items.c.created_at, True), (items.c.id, False))
+    when = datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc)
+
+    class Row:
+        created_at = when
+        id = 42
+
+    assert keyset.decode(keyset.encode(Row())) == [when, 42]
+
+
+def test_cursor_from_another_sort_order_is_rejected():
+    cursor = Keyset((items.c.created_at, True), (items.c.id, False)).encode(
+        type("Row", (), {"created_at": datetime(2024, 1, 1), "id": 1})()
+    )
+    with pytest.raises(HTTPException) as excinfo:
+        Keyset((items.c.created_at, False), (items.c.id, False)).decode(cursor)
+    assert excinfo.value.status_code == 400
+
+    with pytest.raises(HTTPException):
+        Keyset((items.c.id, False)).decode("not-a-cursor")
@@ -0,0 +1,43 @@
+"""密码哈希工作池：工作线程和队列都满时返回 503"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth.hashing import PasswordHashPool
+
+
+def test_saturated_pool_rejects_with_retry_after():
+    pool = PasswordHashPool(workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run(release.wait))
+        queued = asyncio.ensure_future(pool.run(lambda: "queued"))
+        await asyncio.sleep(0)
+        assert (pool.pending, pool.queued) == (2, 1)
+
+        with pytest.raises(HTTPException) as excinfo:
+            await pool.run(lambda: "rejected")
+        release.set()
+        return excinfo.value, await running, await queued
+
+    error, running, queued = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert (running, queued) == (True, "queued")
+    assert (pool.rejected, pool.completed, pool.pending) == (1, 2, 0)
+
+
+def test_register_returns_503_when_pool_is_full(client, monkeypatch):
+    from app.auth import hashing
+    full = PasswordHashPool(workers=1, queue_size=0)
+    monkeypatch.setattr(full, "_pending", 1)
+    monkeypatch.setattr(hashing, "password_pool", full)
+
+    response = client.post("/auth/register", json={"username": "pool-full", "password": "secret123"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert full.rejected == 1
@@ -0,0 +1,88 @@
+"""SQLite 读写分离：写入及其后的读取走写连接，写语句和提交不会到达只读连接"""
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlmodel import SQLModel, select, text
+
+from app.database import RoutingSession, _sqlite_pragma_listener
+from app.models.note import Note
+from app.services.search import install_search_schema
+
+
+@pytest.fixture
+def routing(tmp_path):
+    url = f"sqlite:///{tmp_path / 'routing.db'}"
+    writer = create_engine(url)
+    reader = create_engine(url)
+    event.listen(writer, "connect", _sqlite_pragma_listener(read_only=False))
+    event.listen(reader, "connect", _sqlite_pragma_listener(read_only=True))
+    SQLModel.metadata.create_all(writer)
+    # 笔记写入时同步更新搜索索引
+    install_search_schema(writer)
+
+    statements = {"writer": [], "reader": []}
+    for name, engine in (("writer", writer), ("reader", reader)):
+        event.listen(
+            engine, "before_cursor_execute",
+            lambda conn, cursor, statement, *args, name=name: statements[name].append(statement.split()[0].upper())
+        )
+        event.listen(engine, "commit", lambda conn, name=name: statements[name].append("COMMIT"))
+
+    class TestSession(RoutingSession):
+        writer_bind = writer
+        reader_bind = reader
+
+    yield TestSession, statements
+    writer.dispose()
+    reader.dispose()
+
+
+def test_reads_after_write_use_the_writer(routing):
+    TestSession, statements = routing
+    with TestSession() as session:
+        assert session.exec(select(Note)).all() == []
+        assert statements["reader"] == ["SELECT"]
+
+        session.add(Note(title="routing", content="uncommitted"))
+        session.flush()
+        # 同一事务中写入后的读取能看到未提交的数据
+        assert [note.title for note in session.exec(select(Note)).all()] == ["routing"]
+        session.exec(text("UPDATE notes SET content = 'raw'"))
+        assert session.exec(select(Note.content)).one() == "raw"
+        assert statements["reader"] == ["SELECT"]
+        session.commit()
+        assert statements["writer"][-1] == "COMMIT"
+
+        # 提交后回到只读连接，WAL 下能读到已提交的数据
+        reader_before = len(statements["reader"])
+        assert session.exec(select(Note.content)).one() == "raw"
+        assert len(statements["reader"]) == reader_before + 1
+
+    assert {"INSERT", "UPDATE"} <= set(statements["writer"])
+    # 写入前开启的读事务随会话一起结束，只读连接上除此之外只有查询
+    assert set(statements["reader"]) <= {"SELECT", "COMMIT"}
+
+
+def test_commit_is_written_through_the_writer(routing):
+    TestSession, statements = routing
+    with TestSession() as session:
+        session.add(Note(title="committed", content="x"))
+        session.commit()
+        # 没有读取过的会话，flush 和提交都不会检出只读连接
+        assert statements["reader"] == []
+    assert statements["writer"][-2:] == ["INSERT", "COMMIT"]
+    # 提交后数据对只读连接上的新读事务可见
+    with TestSession() as session:
+        assert session.exec(select(Note.title)).all() == ["committed"]
+
+
+def test_raw_write_before_any_flush_goes_to_the_writer(routing):
+    TestSession, statements = routing
+    with TestSession() as session:
+        session.exec(text("INSERT INTO notes (title, content, tags, is_reflection, created_at, updated_at) "
+                          "VALUES ('raw', 'x', '', 0, '2024-01-01', '2024-01-01')"))
+        assert session.exec(select(Note.title)).all() == ["raw"]
+        session.rollback()
+        assert session.exec(select(Note.title)).all() == []
+    assert statements["reader"] == ["SELECT"]
+    assert "INSERT" in statements["writer"] and "COMMIT" not in statements["writer"]
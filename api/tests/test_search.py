@@ -0,0 +1,71 @@
+"""全文搜索：中日韩文字的二字切分与单字退回"""
+
+from app.services.search import parse_query, tokenize
+
+
+def test_cjk_runs_split_into_bigrams():
+    assert tokenize("机器学习 Deep-Learning") == ["机器", "器学", "学习", "deep", "learning"]
+    assert tokenize("学") == ["学"]
+    assert parse_query("机器学习 入门") == [["机器", "器学", "学习"], ["入门"]]
+
+
+def test_single_cjk_char_cannot_use_index():
+    assert parse_query("学") is None
+    assert parse_query("机器 学") is None
+
+
+def _note(client, title, content):
+    response = client.post("/notes/", json={"title": title, "content": content})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _search(client, q):
+    response = client.get("/search/", params={"q": q, "types": "note"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_cjk_bigram_search_matches_substrings(client):
+    first = _note(client, "鲸鲨观察笔记", "记录鲸鲨迁徙路线")
+    second = _note(client, "鲨鱼图鉴", "常见鲨鱼种类")
+
+    body = _search(client, "鲸鲨迁徙")
+    assert body["fallback"] is False
+    assert [result["id"] for result in body["results"]] == [first]
+
+    # 跨越两个二字词的子串同样按短语匹配
+    assert {result["id"] for result in _search(client, "鲨观")["results"]} == {first}
+    assert {result["id"] for result in _search(client, "鲨鱼")["results"]} == {second}
+
+    # 列表接口的 search= 参数使用同一索引
+    listed = client.get("/notes/", params={"search": "鲸鲨"}).json()
+    assert [note["id"] for note in listed] == [first]
+
+
+def test_single_cjk_char_falls_back_to_substring_match(client):
+    first = _note(client, "貘的习性", "夜行")
+    second = _note(client, "动物园", "看到了马来貘")
+
+    body = _search(client, "貘")
+    assert body["fallback"] is True
+    assert {result["id"] for result in body["results"]} == {first, second}
+
+    listed = client.get("/notes/", params={"search": "貘"}).json()
+    assert {note["id"] for note in listed} == {first, second}
+
+
+def test_fallback_treats_like_wildcards_literally(client):
+    literal = _note(client, "折扣 100%_off", "满减")
+    _note(client, "折扣 100 off", "另一条")
+
+    for query in ("%", "_", "扣 100%", "%_"):
+        listed = client.get("/notes/", params={"search": query}).json()
+        assert [note["id"] for note in listed] == [literal], query
+        body = _search(client, query)
+        assert [result["id"] for result in body["results"]] == [literal], query
+
+    client.post("/todos/", json={"content": "todo 50%"})
+    client.post("/todos/", json={"content": "todo 50 percent"})
+    todos = client.get("/todos/", params={"search": "50%"}).json()
+    assert [todo["content"] for todo in todos] == ["todo 50%"]
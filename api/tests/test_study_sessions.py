@@ -0,0 +1,76 @@
+"""学习会话：队列状态、非队列卡片的答案与卡片变更后的刷新"""
+
+from datetime import datetime, timedelta, timezone
+
+
+def _due_card(client, front):
+    response = client.post("/flashcards/", json={
+        "front": front,
+        "back": "back",
+        "due_date": (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _start(client):
+    response = client.post("/flashcards/study-sessions", json={"max_new": 500, "max_review": 500})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _queued_ids(client, session_id, remaining):
+    response = client.get(f"/flashcards/study-sessions/{session_id}/next", params={"count": min(max(remaining, 1), 50)})
+    assert response.status_code == 200, response.text
+    return [card["flashcard"]["id"] for card in response.json()["cards"]]
+
+
+def test_answer_for_card_outside_queue_is_rejected(client):
+    queued = _due_card(client, "study-queued")
+    started = _start(client)
+    session_id = started["session_id"]
+    assert queued in _queued_ids(client, session_id, started["remaining"])
+
+    # 会话创建后才加入的卡片不在队列中
+    outsider = _due_card(client, "study-outsider")
+    response = client.post(f"/flashcards/study-sessions/{session_id}/answer", json={
+        "flashcard_id": outsider, "difficulty": "good", "response_time": 1000
+    })
+    assert response.status_code == 400
+    assert client.get(f"/flashcards/{outsider}/reviews").json() == []
+
+    response = client.post(f"/flashcards/study-sessions/{session_id}/answer", json={
+        "flashcard_id": queued, "difficulty": "good", "response_time": 1000
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["remaining"] == started["remaining"] - 1
+    assert queued not in _queued_ids(client, session_id, started["remaining"])
+
+
+def test_cards_reviewed_elsewhere_leave_the_queue(client):
+    card = _due_card(client, "study-elsewhere")
+    started = _start(client)
+    session_id = started["session_id"]
+
+    # 在会话之外复习后卡片不再到期，取卡时移出队列
+    assert client.post(f"/flashcards/{card}/review", json={
+        "flashcard_id": card, "difficulty": "easy", "response_time": 1000
+    }).status_code == 200
+    assert card not in _queued_ids(client, session_id, started["remaining"])
+    assert client.delete(f"/flashcards/study-sessions/{session_id}").status_code == 200
+    assert client.get(f"/flashcards/study-sessions/{session_id}/next").status_code == 404
+
+
+def test_deleted_session_is_not_revalidated(client):
+    _due_card(client, "study-etag")
+    session_id = _start(client)["session_id"]
+    first = client.get(f"/flashcards/study-sessions/{session_id}/next")
+    assert first.status_code == 200
+    assert "etag" not in first.headers
+    assert first.headers["cache-control"] == "no-store"
+
+    assert client.delete(f"/flashcards/study-sessions/{session_id}").status_code == 200
+    response = client.get(
+        f"/flashcards/study-sessions/{session_id}/next", headers={"If-None-Match": "*"}
+    )
+    assert response.status_code == 404
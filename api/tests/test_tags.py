@@ -0,0 +1,24 @@
+"""标签过滤：tags= 只有分隔符或空白时不过滤"""
+
+import pytest
+
+
+def test_tag_filter_matches_exact_tags(client):
+    tagged = client.post("/notes/", json={"title": "tagged", "content": "x", "tags": "Rust, 编译器"}).json()["id"]
+    client.post("/notes/", json={"title": "untagged", "content": "x"})
+
+    ids = [note["id"] for note in client.get("/notes/", params={"tags": "rust,编译器"}).json()]
+    assert ids == [tagged]
+    assert client.get("/notes/", params={"tags": "rust,java"}).json() == []
+    any_ids = [note["id"] for note in client.get("/notes/", params={"tags": "rust,java", "tags_mode": "any"}).json()]
+    assert any_ids == [tagged]
+
+
+@pytest.mark.parametrize("path", ["/notes/", "/tools/", "/commands/", "/flashcards/"])
+@pytest.mark.parametrize("tags", [",", " ", " , ,"])
+def test_empty_tags_do_not_filter(client, path, tags):
+    unfiltered = client.get(path)
+    assert unfiltered.status_code == 200, unfiltered.text
+    filtered = client.get(path, params={"tags": tags})
+    assert filtered.status_code == 200, filtered.text
+    assert filtered.json() == unfiltered.json()